@@ -1,67 +1,68 @@
 import os
 import json
-import requests
-import base64
 import matplotlib
-import subprocess
 import re
-import datetime
 from google import genai
-from google.genai.types import Tool, FunctionDeclaration, Content, Part
+from google.genai.types import Content, Part
 from google.genai.errors import APIError
 import google.auth 
 import google.auth.transport.requests
 
+import analytics
+import report_render
+import speculative_chart
+import tiering
+import tools
+import tracing
+import usage
+
 # --- parameters ---
 PROJECT_ID = "eighth-pen-476811-f3" 
 REGION = "asia-northeast1" 
 # Cloud URL
 CUSTOMER_DATA_SERVICE_URL = "https://get-customer-data-func-ldthooojxq-an.a.run.app" 
-
-# --- 1-3. Function Declaration (Report Agent 1 Tool)---
-customer_data_tool_declaration = FunctionDeclaration(
-    # names and description
-    name="getCustomerData", 
-    description="Retrieves comprehensive customer negotiation data, including purchase history, negotiation style, and pricing targets, needed to prepare a sales strategy.",
-    parameters={
-        "type": "OBJECT",
-        "properties": {
-            "customer_name": {
-                "type": "STRING",
-                "description": "The full name of the customer for whom the negotiation data is needed (e.g., 'Customer A')."
-            }
-        },
-        "required": ["customer_name"]
-    },
-)
-
-
-negotiation_tool = Tool(function_declarations=[customer_data_tool_declaration])
-
-# --- 4. logic based on models (get Cloud Run) ---
-def call_customer_data_service(customer_name: str) -> dict:
-   
-    url = f"{CUSTOMER_DATA_SERVICE_URL}?customer_name={customer_name}"
-    print(f"\n[Tool Execution: Calling Cloud Function at: {url}]")
-    try:
-        # usually we need extra headers like API Key，
-        # but we authorized allUsers, so not necessary now
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        
-        data = response.json() 
-        return data
-    except requests.exceptions.HTTPError as err:
-        print(f"HTTP Error: {err.response.status_code}")
-        return {"error": f"Tool execution failed with HTTP status {err.response.status_code}. Response: {err.response.text}"}
-    except Exception as e:
-        return {"error": f"Tool execution failed with unknown error: {str(e)}"}
+MODEL_NAME = "gemini-2.5-flash"
+
+# Agent 1 system prompt (batch_reports.py fingerprints it to detect prompt changes)
+SYSTEM_INSTRUCTION = ("You are a professional Sales Negotiation Strategy Expert. "
+                      "You MUST perform all analysis and generate the FINAL report entirely IN ENGLISH. "
+                      "Your primary task is to help the user prepare for negotiations. "
+                      "You MUST use the 'getCustomerData' tool to retrieve customer data. "
+                      "After retrieving the data, you must analyze the last deal's outcome and price targets "
+                      "to generate a structured negotiation strategy focused on maximizing profit margin. "
+                      "You MUST also give a 'Predicted Deal Price' (a single numerical value) based on the purchase history, "
+                      "current targets and negotiation style, on its own line in the report: 'Predicted Deal Price: $XXXXX' "
+                      "(the chart plots this value). "
+                      "The tool result includes 'precomputed_features' (trend slope, volatility, discount vs target, "
+                      "margin vs cost, baseline predicted price) computed locally; use these figures instead of "
+                      "recomputing them from 'purchase_history'. "
+                      "When present, 'portfolio_summary' holds portfolio-level aggregates (win rate, margin headroom, style category). "
+                      "If the tool execution fails, you must inform the user and stop.")
+
+# --- 1-4. Tools (Report Agent 1) ---
+# getCustomerData lives in tools.py (shared with streamlit_app / async_agent). This default
+# registry goes over HTTP to Cloud Run; callers holding a Firestore client pass their own
+# registry (tools.customer_data_registry(db_client=...)) to skip the HTTP hop.
+TOOLS = tools.customer_data_registry(service_url=CUSTOMER_DATA_SERVICE_URL)
+negotiation_tool = TOOLS.tool()
 
 # --- 5. Core Report Agent 1 Logic ---
-def run_agent_chat(client: genai.Client, prompt: str):
+@tracing.traced("agent1.run")
+def run_agent_chat(client: genai.Client, prompt: str, tool_results: list = None, registry: tools.ToolRegistry = None,
+                   prerender: list = None, policy: tiering.TieringPolicy = None, tiers: list = None):
     """
     logics for running Report Agent 1 conversation。
+    tool_results: optional list, receives every tool payload (with precomputed features)
+    prerender: optional list, receives a speculative_chart.SpeculativeChart per tool payload,
+               drawn while the model is still writing the report
+    registry: tools.ToolRegistry executing the tool calls (default: TOOLS, HTTP to Cloud Run)
+    policy: tiering.TieringPolicy choosing the models from the tool payload (default: tiering.ACTIVE_POLICY)
+    tiers: optional list, receives a tiering.TierDecision per tool payload (pass the last one to Agent 2)
+    A "not found" tool result returns the policy's templated report without another model call.
     """
+    registry = registry or TOOLS
+    policy = policy or tiering.ACTIVE_POLICY
+    negotiation_tool = registry.tool()
 
     # try:
     #     # use GOOGLE_APPLICATION_CREDENTIALS
@@ -80,13 +81,7 @@ def run_agent_chat(client: genai.Client, prompt: str):
     #     return
     
     
-    system_instruction = ("You are a professional Sales Negotiation Strategy Expert. "
-                          "You MUST perform all analysis and generate the FINAL report entirely IN ENGLISH. "
-                          "Your primary task is to help the user prepare for negotiations. "
-                          "You MUST use the 'getCustomerData' tool to retrieve customer data. "
-                          "After retrieving the data, you must analyze the last deal's outcome and price targets "
-                          "to generate a structured negotiation strategy focused on maximizing profit margin. "
-                          "If the tool execution fails, you must inform the user and stop.")
+    system_instruction = SYSTEM_INSTRUCTION
     
    
    # Part
@@ -102,15 +97,18 @@ def run_agent_chat(client: genai.Client, prompt: str):
     
     # --- 1st round：model decides to use tools ---
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=initial_content,
-            config={
-                'tools': [negotiation_tool],
-                'system_instruction': system_instruction
-                },
-            
-        )
+        with tracing.span("model.generate_content", stage="agent1.plan") as model_span:
+            response = client.models.generate_content(
+                model=policy.plan_model,
+                contents=initial_content,
+                config={
+                    'tools': [negotiation_tool],
+                    'system_instruction': system_instruction
+                    },
+                
+            )
+            usage.record(model_span, response, policy.plan_model, {
+                "system_instruction": system_instruction, "user_prompt": prompt, "tool_declarations": negotiation_tool})
     except APIError as e:
         print(f"\n❌ Report Agent 1 API Error: {e}")
         return None
@@ -126,8 +124,27 @@ def run_agent_chat(client: genai.Client, prompt: str):
         args = dict(tool_call.args)
         customer_name = args.get('customer_name')
         
-        # call Cloud Run Services
-        tool_response_data = call_customer_data_service(customer_name)
+        # cache / Firestore / Cloud Run, whichever path the registry has available
+        with tracing.span("tool.call", tool=function_name, customer_name=customer_name):
+            tool_result = registry.call(function_name, args)
+        tool_response_data = tool_result.response
+        print(f"[Tool result via {tool_result.path} in {tool_result.seconds * 1000:.0f} ms]")
+        if tool_results is not None:
+            tool_results.append(tool_response_data)
+
+        # tier from the customer document: models for the rest of the pipeline, chart or not
+        decision = policy.decide(tool_response_data, customer_name)
+        tiering.tag_span(decision)
+        if tiers is not None:
+            tiers.append(decision)
+        if decision.template is not None:
+            print(f"[Tier: {decision.tier} - templated report, no further model calls]")
+            return decision.template
+        print(f"[Tier: {decision.tier} - report on {decision.models['report']}, chart {'on' if decision.chart else 'off'}]")
+        if prerender is not None and decision.chart:
+            chart = speculative_chart.start(tool_response_data)
+            if chart is not None:
+                prerender.append(chart)
         
         # --- 2nd round：return results to model ---
         
@@ -143,11 +160,15 @@ def run_agent_chat(client: genai.Client, prompt: str):
         ]
 
         # call model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=contents_with_response,
-            config={'tools': [negotiation_tool]},
-        )
+        with tracing.span("model.generate_content", stage="agent1.answer") as model_span:
+            response = client.models.generate_content(
+                model=decision.models["report"],
+                contents=contents_with_response,
+                config={'tools': [negotiation_tool]},
+            )
+            usage.record(model_span, response, decision.models["report"], {
+                "user_prompt": prompt, "tool_declarations": negotiation_tool,
+                "tool_call": contents_with_response[-2], "tool_payload": tool_response_data})
         
     # --- Reort ---
     print("\n--- Report Agent Final Report ---")
@@ -158,90 +179,23 @@ def run_agent_chat(client: genai.Client, prompt: str):
 
 
 # --- 6. HTML generation function ---
-def generate_html_report(customer_name: str, report_html: str, image_base64: str):
-    """Generate Visualized HTML documents"""
+@tracing.traced("report.render_html")
+def generate_html_report(customer_name: str, report_html: str, chart_png: bytes = None, sink=None, asset_mode: str = "inline") -> str:
+    """Generate Visualized HTML documents into `sink` (default: current directory), returns the location"""
+    html_content, assets = report_render.render_html(customer_name, report_html, chart_png, asset_mode)
+    location = report_render.publish(sink or report_render.DirectorySink("."), customer_name, html_content, assets)
     
-    # Get current time
-    generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-    # HTML template
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <title>Negotiation Strategy Report: {customer_name}</title>
-        <style>
-            body {{ font-family: 'Arial', sans-serif; line-height: 1.6; padding: 20px; background-color: #f9f9f9; }}
-            .container {{ max-width: 900px; margin: 0 auto; background: #fff; padding: 30px; border-radius: 8px; box-shadow: 0 0 20px rgba(0,0,0,0.1); }}
-            # time template
-            .timestamp {{
-                position: absolute;
-                top: 10px;
-                right: 30px;
-                font-size: 0.9em;
-                color: #777;
-            }}
-            
-            h1 {{ color: #1a73e8; border-bottom: 2px solid #eee; padding-bottom: 10px; }}
-            h2 {{ color: #333; margin-top: 30px; }}
-
-            .report-content {{ 
-                background: #fdfdfd; 
-                padding: 15px; 
-                border: 1px solid #eee; 
-                boder-radius: 5px;
-                white-space: normal;
-                }}
-            .report-content ul {{ padding-left: 20px; }}
-            .report-content mark {{ background-color: #fcf8e3; padding: 2px 4px; border-radius: 3px; }}
-            .visualization {{ text-align: center; margin-top: 20px; border: 1px solid #ddd; padding: 10px; border-radius: 5px; }}
-            .visualization img {{ max-width: 100%; height: auto; border-radius: 5px; }}
-            .footer {{ margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; color: #777; font-size: 0.9em; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="timestamp">Generated: {generation_time}</div>
-
-            <h1>📊 Negotiation Strategy Report: {customer_name}</h1>
-            
-            <h2>✅ AI Text Analysis (Agent 1 & 2)</h2>
-            {report_html}
-            
-            <h2>🖼️ Data Visualization (Agent 2)</h2>
-            <div class="visualization">
-                <img src="data:image/png;base64,{image_base64}" alt="Data Visualization Chart (Generation failed or not supported)">
-                <p>Generated by Visualization Agent based on the strategy report.</p>
-            </div>
-
-            <div class="footer">
-                Report generated by Gemini Agent System.
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    file_name = f"Negotiation_Report_{customer_name}.html"
-    with open(file_name, "w", encoding="utf-8") as f:
-        f.write(html_content)
-    
-    print(f"\n🎉 Successfully Generated Report: {file_name}")
+    print(f"\n🎉 Successfully Generated Report: {location}")
     print("Please double click the file，and select 'print' -> 'Save it as PDF' to local file")
+    return location
 
-# --- 7. Visual Agent 2 logic ---
-def run_visualization_agent(client: genai.Client, customer_name: str, report_text: str):
-    """
-    Run Agent 2 (Visualization Agent) and generate HTML
-    two missions:
-    1. generates charts
-    2. change text result to html with highlights
-    """
-    print("\n[Agent 2: Data Visualization (Model: gemini-2.5-flash)]")
-    
-    # --- Mission 1: Generate Charts ---
-    visualization_prompt = f"""
+# --- Agent 2 prompts (shared with async_agent.py) ---
+CHART_CODE_RE = re.compile(r"```python\n(.*?)\n```", re.DOTALL)
+
+
+def build_visualization_prompt(report_text: str, features: dict = None) -> str:
+    """Mission 1 prompt: report (+ precomputed features) -> matplotlib script"""
+    return f"""
         Take the following raw negotiation strategy report. Your task is to generate a self-contained Python script using 'matplotlib.pyplot' to create ONE clear, professional data visualization (e.g., bar chart, line chart) that summarizes the key numerical data.
 
         Your task is to generate a self-contained Python script using 'matplotlib.pyplot' to create ONE clear, professional **line and area chart** that visualizes the negotiation strategy.
@@ -262,85 +216,17 @@ def run_visualization_agent(client: genai.Client, customer_name: str, report_tex
         4.  Clarity: Include a title, axis labels, and a legend.
         5.  No Display: Do not use `plt.show()`.
 
+        {analytics.features_prompt_section(features)}
         **Input Report:**
         ---
         {report_text}
         ---
         """
 
-    try:
-        #  Gemini
-        vis_response = client.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=[Content(role="user", parts=[Part(text=visualization_prompt)])],
-            config={
-                'temperature': 0.1 
-            }
-        )
-        
-        # 1. get code
-        code_match = re.search(r"```python\n(.*?)\n```", vis_response.text, re.DOTALL)
-        if not code_match:
-            print("\n⚠️ Visualization Agent Failed: Did not generate valid Python code block.")
-            generate_html_report(customer_name, report_text, "") # generate report without graph
-            return
-
-        python_code = code_match.group(1)
-        # 调试：打印出 AI 生成的代码
-        print("\n[Agent 2: Generated Code (Saving to generate_chart.py)]")
-        print("--------------------------------------------------")
-        print(python_code)
-        print("--------------------------------------------------")
-
-        # 
-        # --- 这是关键的修复 ---
-        # 1. 强制使用 'Agg' 后端 (必须在 import pyplot 之前)
-        # 2. 强行移除 plt.show()
-        #
-        fixed_python_code = "import matplotlib\nmatplotlib.use('Agg')\n" + python_code
-        fixed_python_code = fixed_python_code.replace("plt.show()", "")
-
-        # 2. 将 *修复后* 的代码写入临时文件
-        with open("generate_chart.py", "w", encoding="utf-8") as f:
-            f.write(fixed_python_code)
-        
-            
-        # 3. run script
-        print("\n[Agent 2: Executing generated Python code...]")
-        # make sure matplotlib available
-        # matplotlib.use('Agg') 
-        
-        #  subprocess script
-        process = subprocess.run(['python', 'generate_chart.py'], capture_output=True, text=True, timeout=15)
-        
-        if process.returncode != 0:
-            print("\n⚠️ Visualization Agent Error during code execution:")
-            print(process.stderr)
-            generate_html_report(customer_name, report_text, "")
-            return
-
-        print("\n[Agent 2: Code execution successful, 'chart.png' created.]")
-
-        # 4. read image and code into Base64
-        image_base64 = "" 
 
-        try:
-            with open("chart.png", "rb") as img_file:
-                image_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-            print("\n✅ Visualization Agent Success: Image encoded for HTML.")
-        except FileNotFoundError:
-            print("\n⚠️ Visualization Agent Failed: 'chart.png' was not created by the script.")
-    
-    except Exception as e:
-            print(f"\n❌ Visualization Agent Error: {e}")
-            
-            image_base64 = "" # if error, use null
-
-    # --- Mission 2 : text -> HTML ---
-    print("\n[Agent 2: Mission 2 convert text begins...]")
-    
-    
-    styling_prompt = f"""
+def build_styling_prompt(report_text: str) -> str:
+    """Mission 2 prompt: Markdown report -> HTML block"""
+    return f"""
     Take the following raw negotiation strategy report (written in Markdown). 
     Your task is to convert it into a clean, professional HTML block.
 
@@ -356,15 +242,101 @@ def run_visualization_agent(client: genai.Client, customer_name: str, report_tex
     {report_text}
     ---
     """
+
+
+# --- 7. Visual Agent 2 logic ---
+@tracing.traced("agent2.run")
+def run_visualization_agent(client: genai.Client, customer_name: str, report_text: str, features: dict = None,
+                            sink=None, asset_mode: str = "inline", chart: speculative_chart.SpeculativeChart = None,
+                            tier: tiering.TierDecision = None) -> str:
+    """
+    Run Agent 2 (Visualization Agent) and generate HTML
+    two missions:
+    1. generates charts (features: optional analytics.compute_features output); with `chart`
+       (from run_agent_chat's prerender) the pre-rendered chart is finished instead of asking the model for code
+    2. change text result to html with highlights
+    tier: run_agent_chat's tiering.TierDecision - models per mission, no chart for small histories,
+          templated reports are published as they are (default: MODEL_NAME, always a chart)
+    The report goes to `sink` (report_render sinks, default: current directory); returns its location.
+    """
+    if tier is not None and tier.template_html is not None:
+        print(f"\n[Agent 2: skipped ({tier.tier}), publishing the templated report]")
+        return generate_html_report(customer_name, tier.template_html, None, sink, asset_mode)
+    models = tier.models if tier is not None else dict.fromkeys(tiering.STAGES, MODEL_NAME)
+    print(f"\n[Agent 2: Data Visualization (Models: chart {models['chart']}, styling {models['styling']})]")
+    
+    # --- Mission 1: Generate Charts ---
+    # speculative chart (started at the tool call): only the predicted line is left to draw
+    chart_png = chart.finish(report_text, features) if chart is not None else None
+    if chart_png is not None:
+        print("\n✅ Visualization Agent Success: pre-rendered chart finished with the predicted price.")
+    elif tier is not None and not tier.chart:
+        print(f"\n[Agent 2: no chart for the {tier.tier} tier (too few data points)]")
+    else:
+        visualization_prompt = build_visualization_prompt(report_text, features)
+
+        try:
+            #  Gemini
+            with tracing.span("model.generate_content", stage="agent2.chart_code") as model_span:
+                vis_response = client.models.generate_content(
+                    model=models["chart"], 
+                    contents=[Content(role="user", parts=[Part(text=visualization_prompt)])],
+                    config={
+                        'temperature': 0.1 
+                    }
+                )
+                usage.record(model_span, vis_response, models["chart"], usage.prompt_sections(
+                    visualization_prompt, features=analytics.features_prompt_section(features), report_text=report_text))
+        
+            # 1. get code
+            code_match = CHART_CODE_RE.search(vis_response.text)
+            if not code_match:
+                print("\n⚠️ Visualization Agent Failed: Did not generate valid Python code block.")
+                return generate_html_report(customer_name, report_text, None, sink, asset_mode) # generate report without graph
+
+            python_code = code_match.group(1)
+            # 调试：打印出 AI 生成的代码
+            print("\n[Agent 2: Generated Code]")
+            print("--------------------------------------------------")
+            print(python_code)
+            print("--------------------------------------------------")
+
+            # 2. run script in a subprocess (Agg forced, plt.show() removed);
+            #    the PNG comes back in memory, nothing is written to the CWD
+            print("\n[Agent 2: Executing generated Python code...]")
+            try:
+                with tracing.span("chart.execute") as chart_span:
+                    chart_png = report_render.run_chart_code(python_code)
+                    chart_span.set_attribute("png_bytes", len(chart_png))
+            except report_render.ChartExecutionError as e:
+                print(f"\n⚠️ Visualization Agent Error during code execution: {e}")
+                print(e.stderr)
+                return generate_html_report(customer_name, report_text, None, sink, asset_mode)
+
+            print("\n✅ Visualization Agent Success: chart rendered in memory.")
+    
+        except Exception as e:
+                print(f"\n❌ Visualization Agent Error: {e}")
+            
+                chart_png = None # if error, use null
+
+    # --- Mission 2 : text -> HTML ---
+    print("\n[Agent 2: Mission 2 convert text begins...]")
+    
+    
+    styling_prompt = build_styling_prompt(report_text)
         
     styled_report_html = f"<div class='report-content'><pre>{report_text}</pre></div>" # 默认值，以防出错
 
     try:
-        style_response = client.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=[Content(role="user", parts=[Part(text=styling_prompt)])],
-            config={'temperature': 0.1} 
-        )
+        with tracing.span("model.generate_content", stage="agent2.styling") as model_span:
+            style_response = client.models.generate_content(
+                model=models["styling"], 
+                contents=[Content(role="user", parts=[Part(text=styling_prompt)])],
+                config={'temperature': 0.1} 
+            )
+            usage.record(model_span, style_response, models["styling"],
+                         usage.prompt_sections(styling_prompt, report_text=report_text))
         styled_report_html = style_response.text
         print("\n✅ Visualization Agent (convert text) succeed")
 
@@ -372,7 +344,7 @@ def run_visualization_agent(client: genai.Client, customer_name: str, report_tex
         print(f"\n❌ Visualization Agent (convert text) failed: {e}")
         
     # --- output： HTML  ---
-    generate_html_report(customer_name, styled_report_html, image_base64)
+    return generate_html_report(customer_name, styled_report_html, chart_png, sink, asset_mode)
 
 
 if __name__ == "__main__":
@@ -395,12 +367,17 @@ if __name__ == "__main__":
     customer_name_1 = "Customer C"
     test_prompt_1 = "Generate a negotiation strategy report for Customer C, focusing on profit maximization."
     
-    # 1. Run Agent 1
-    report_text_1 = run_agent_chat(client, test_prompt_1)
-    
-    # 2. If Agent 1 succeeded，run Agent 2
-    if report_text_1:
-        run_visualization_agent(client, customer_name_1, report_text_1)
+    with tracing.span("report", customer_name=customer_name_1), usage.collect(customer_name_1) as usage_1:
+        # 1. Run Agent 1
+        tool_results_1, charts_1, tiers_1 = [], [], []
+        report_text_1 = run_agent_chat(client, test_prompt_1, tool_results_1, prerender=charts_1, tiers=tiers_1)
+        
+        # 2. If Agent 1 succeeded，run Agent 2
+        if report_text_1:
+            features_1 = tool_results_1[-1].get("precomputed_features") if tool_results_1 else None
+            run_visualization_agent(client, customer_name_1, report_text_1, features_1,
+                                    chart=charts_1[-1] if charts_1 else None, tier=tiers_1[-1] if tiers_1 else None)
+    print(usage.format_report(usage_1.to_dict()))
     
     print("\n" + "="*50 + "\n")
     
@@ -408,9 +385,14 @@ if __name__ == "__main__":
     customer_name_2 = "ACME TECH"
     test_prompt_2 = "I need to prepare for ACME TECH negotiation"
     
-    # 1. Run Agent 1
-    report_text_2 = run_agent_chat(client, test_prompt_2)
-    
-    # 2. If Agent 1 succeeded，run Agent 2
-    if report_text_2:
-        run_visualization_agent(client, customer_name_2, report_text_2)
\ No newline at end of file
+    with tracing.span("report", customer_name=customer_name_2), usage.collect(customer_name_2) as usage_2:
+        # 1. Run Agent 1
+        tool_results_2, charts_2, tiers_2 = [], [], []
+        report_text_2 = run_agent_chat(client, test_prompt_2, tool_results_2, prerender=charts_2, tiers=tiers_2)
+        
+        # 2. If Agent 1 succeeded，run Agent 2
+        if report_text_2:
+            features_2 = tool_results_2[-1].get("precomputed_features") if tool_results_2 else None
+            run_visualization_agent(client, customer_name_2, report_text_2, features_2,
+                                    chart=charts_2[-1] if charts_2 else None, tier=tiers_2[-1] if tiers_2 else None)
+    print(usage.format_report(usage_2.to_dict()))
@@ -0,0 +1,225 @@
+"""
+Local price analytics on `purchase_history`, so the model gets numbers instead
+of having to derive them from raw JSON rows.
+
+Histories are packed into flat NumPy columns (one array of dates, one of
+`price_achieved`, plus per-customer offsets), and every feature is computed
+with segment reductions (`np.bincount`) across all customers at once:
+
+    trend_slope_per_30d, volatility, last/mean price, discount_vs_target,
+    margin_vs_cost, baseline_predicted_price
+"""
+import datetime
+import email.utils
+import json
+import warnings
+
+import numpy as np
+
+TARGET_PRICE_KEYS = ("current_target_price", "Target_Price_USD")
+COST_PRICE_KEYS = ("current_cost_price", "Baseline_Price_USD")
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def _first_number(doc: dict, keys) -> float:
+    for key in keys:
+        value = doc.get(key)
+        if isinstance(value, (int, float)):
+            return float(value)
+    return np.nan
+
+
+def _to_days(value) -> float:
+    """Days since epoch for ISO strings, RFC 822 strings (Flask jsonify) and datetimes."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return (value - _EPOCH).total_seconds() / 86400
+    if isinstance(value, datetime.date):
+        return float((value - _EPOCH.date()).days)
+    if isinstance(value, str):
+        try:
+            return _to_days(datetime.datetime.fromisoformat(value.replace("Z", "+00:00")))
+        except ValueError:
+            parsed = email.utils.parsedate_to_datetime(value)
+            return _to_days(parsed)
+    raise ValueError(f"Unsupported date value: {value!r}")
+
+
+def _dates_to_days(values: list) -> np.ndarray:
+    """Vectorized ISO parse for the common case, per-row fallback (NaN on failure) otherwise."""
+    try:
+        with warnings.catch_warnings():
+            # offsets ("+00:00" from str(Firestore timestamp)) are converted to UTC correctly,
+            # numpy just warns about it on every call
+            warnings.filterwarnings("ignore", message="no explicit representation of timezones", category=UserWarning)
+            return np.array(values, dtype="datetime64[s]").astype(np.int64) / 86400.0
+    except (ValueError, TypeError):
+        pass
+    days = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            days[i] = _to_days(value)
+        except (TypeError, ValueError):
+            days[i] = np.nan
+    return days
+
+
+def _to_float_array(values: list) -> np.ndarray:
+    try:
+        return np.array(values, dtype=np.float64)
+    except (ValueError, TypeError):
+        pass
+    result = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(value)
+        except (TypeError, ValueError):
+            result[i] = np.nan
+    return result
+
+
+class PurchaseHistoryColumns:
+    """Columnar view of many customers' purchase histories, each segment sorted by date."""
+
+    def __init__(self, names: list, offsets: np.ndarray, days: np.ndarray, prices: np.ndarray,
+                 target: np.ndarray, cost: np.ndarray):
+        self.names = names
+        self.offsets = offsets
+        self.days = days
+        self.prices = prices
+        self.target = target
+        self.cost = cost
+
+    @classmethod
+    def from_docs(cls, docs: list, names: list = None):
+        names = names or [doc.get("customer_name", str(i)) for i, doc in enumerate(docs)]
+        raw_dates, raw_prices, raw_seg = [], [], []
+        for i, doc in enumerate(docs):
+            for entry in doc.get("purchase_history") or []:
+                if isinstance(entry, dict) and entry.get("date") is not None and entry.get("price_achieved") is not None:
+                    raw_dates.append(entry["date"])
+                    raw_prices.append(entry["price_achieved"])
+                    raw_seg.append(i)
+
+        days = _dates_to_days(raw_dates)
+        prices = _to_float_array(raw_prices)
+        seg = np.asarray(raw_seg, dtype=np.int64)
+
+        # drop malformed rows rather than failing the whole report, then sort by (customer, date)
+        valid = ~(np.isnan(days) | np.isnan(prices))
+        days, prices, seg = days[valid], prices[valid], seg[valid]
+        order = np.lexsort((days, seg))
+        counts = np.bincount(seg, minlength=len(docs))
+        return cls(
+            names,
+            np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            days[order],
+            prices[order],
+            np.array([_first_number(doc, TARGET_PRICE_KEYS) for doc in docs], dtype=np.float64),
+            np.array([_first_number(doc, COST_PRICE_KEYS) for doc in docs], dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def segment_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.names)), np.diff(self.offsets))
+
+
+def _pick(values: np.ndarray, idx: np.ndarray, valid: np.ndarray, fill: float) -> np.ndarray:
+    """values[idx] where valid, else fill (safe when some segments are empty)."""
+    if not len(values):
+        return np.full(len(idx), fill)
+    return np.where(valid, values[np.minimum(idx, len(values) - 1)], fill)
+
+
+def compute_feature_arrays(cols: PurchaseHistoryColumns) -> dict:
+    """Per-customer feature arrays (NaN where a feature is undefined)."""
+    n_customers = len(cols)
+    seg = cols.segment_ids()
+    counts = np.diff(cols.offsets).astype(np.float64)
+    has_rows = counts > 0
+    safe_counts = np.where(has_rows, counts, 1.0)
+
+    def seg_sum(values):
+        return np.bincount(seg, weights=values, minlength=n_customers)
+
+    # shift dates per customer so the regression works on small numbers
+    x = cols.days - _pick(cols.days, cols.offsets[:-1], has_rows, 0.0)[seg]
+    y = cols.prices
+
+    mean_x = seg_sum(x) / safe_counts
+    mean_y = seg_sum(y) / safe_counts
+    dx = x - mean_x[seg]
+    dy = y - mean_y[seg]
+    sxx = seg_sum(dx * dx)
+    sxy = seg_sum(dx * dy)
+    slope = np.divide(sxy, sxx, out=np.zeros(n_customers), where=sxx > 0)
+    std_y = np.sqrt(seg_sum(dy * dy) / safe_counts)
+
+    last_idx = np.maximum(cols.offsets[1:] - 1, 0)
+    last_price = _pick(y, last_idx, has_rows, np.nan)
+    last_x = _pick(x, last_idx, has_rows, 0.0)  # = days between first and last deal
+    avg_gap = np.divide(last_x, counts - 1, out=np.zeros(n_customers), where=counts > 1)
+
+    # linear baseline, one average gap after the last deal
+    intercept = mean_y - slope * mean_x
+    predicted = np.where(counts > 1, intercept + slope * (last_x + avg_gap), last_price)
+
+    mean_y = np.where(has_rows, mean_y, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "deal_count": counts.astype(np.int64),
+            "last_price": last_price,
+            "mean_price": mean_y,
+            "trend_slope_per_30d": np.where(has_rows, slope * 30, np.nan),
+            "volatility": np.where(has_rows, std_y / mean_y, np.nan),
+            "discount_vs_target": (cols.target - last_price) / cols.target,
+            "mean_discount_vs_target": (cols.target - mean_y) / cols.target,
+            "margin_vs_cost": (last_price - cols.cost) / last_price,
+            "baseline_predicted_price": predicted,
+            "target_price": cols.target,
+            "cost_price": cols.cost,
+        }
+
+
+def _clean(value):
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    value = float(value)
+    return None if np.isnan(value) or np.isinf(value) else round(value, 4)
+
+
+def compute_features_batch(docs: list, names: list = None) -> list:
+    """JSON-ready feature dicts, one per document, computed in a single vectorized pass."""
+    cols = PurchaseHistoryColumns.from_docs(docs, names)
+    arrays = compute_feature_arrays(cols)
+    return [
+        {"customer_name": name, **{key: _clean(values[i]) for key, values in arrays.items()}}
+        for i, name in enumerate(cols.names)
+    ]
+
+
+def compute_features(doc: dict) -> dict:
+    return compute_features_batch([doc])[0]
+
+
+def attach_features(payload: dict) -> dict:
+    """Add `precomputed_features` to a getCustomerData tool result (no-op on errors)."""
+    if not isinstance(payload, dict) or "error" in payload:
+        return payload
+    try:
+        payload["precomputed_features"] = compute_features(payload)
+    except Exception as e:
+        print(f"Feature computation skipped: {e}")
+    return payload
+
+
+def features_prompt_section(features: dict) -> str:
+    """Prompt snippet handing precomputed numbers to the chart agent."""
+    if not features:
+        return ""
+    return ("**Precomputed Features (use these exact numbers, do not recompute):**\n"
+            f"{json.dumps(features)}\n"
+            "If the report has no 'Predicted Deal Price', use 'baseline_predicted_price' for the predicted line.\n")
@@ -1,10 +1,19 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from google.cloud import firestore
 import os
+import time
+import threading
 import traceback
 
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+
+import feature_store
+import tracing
+from customer_index import CustomerIndex, DOCUMENT_ID, get_documents
+
 PROJECT_ID = "eighth-pen-476811-f3"
 DATABASE_ID = "customers"
+MAX_BATCH_SIZE = 100  # customers per /batch request
 app = Flask(__name__)
 
 # db = firestore.Client(project=PROJECT_ID)
@@ -20,6 +29,9 @@ except Exception as e:
     # 强制退出，避免继续运行一个有问题的应用
     exit(1)
 
+# ID-only index behind /customers (prefix search + pagination for the sidebar)
+customer_index = CustomerIndex(db)
+
 # def get_firestore_client():
 #     """惰性初始化 Firestore 客户端，只在第一次调用时创建。"""
 #     global _firestore_client
@@ -31,43 +43,281 @@ except Exception as e:
 CORS_HEADERS = {
     'Access-Control-Allow-Origin': '*',
     'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-    'Access-Control-Allow-Headers': 'Content-Type',
+    'Access-Control-Allow-Headers': 'Content-Type, traceparent',
     'Access-Control-Max-Age': '3600'
 }
 
+# --- Metrics (Prometheus text format on /metrics) ---
+# With PROMETHEUS_MULTIPROC_DIR set (Dockerfile), every gunicorn worker writes its samples
+# there and /metrics aggregates all workers; gunicorn.conf.py resets the directory on start
+# and drops exited workers. Without it (local runs) the in-process registry is used.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+REQUEST_COUNT = Counter("customer_data_requests_total", "HTTP requests", ["endpoint", "method", "status"])
+REQUEST_LATENCY = Histogram("customer_data_request_seconds", "End-to-end request latency", ["endpoint"])
+FIRESTORE_READ_LATENCY = Histogram("customer_data_firestore_read_seconds", "Firestore document read time")
+SERIALIZATION_LATENCY = Histogram("customer_data_serialization_seconds", "Document to JSON response time")
+IN_FLIGHT = Gauge("customer_data_in_flight_requests", "Requests currently being served", multiprocess_mode="livesum")
+RESPONSE_SIZE = Histogram(
+    "customer_data_response_size_bytes", "Response body size", ["endpoint"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+)
+# set on every request rather than set_function(), which multiprocess mode cannot export
+INDEX_SIZE = Gauge("customer_index_size", "Customer IDs held by the /customers index (largest worker)",
+                   multiprocess_mode="max")
+INDEX_REFRESHES = Gauge("customer_index_refreshes", "Full keys-only rescans of the customer index (all workers)",
+                        multiprocess_mode="livesum")
+
+
+def _update_index_gauges():
+    INDEX_SIZE.set(len(customer_index))
+    INDEX_REFRESHES.set(customer_index.refresh_count)
+
+
+@app.before_request
+def _start_request_metrics():
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    REQUEST_COUNT.labels(endpoint, request.method, str(response.status_code)).inc()
+    REQUEST_LATENCY.labels(endpoint).observe(time.perf_counter() - g.request_start)
+    if not response.is_streamed:
+        RESPONSE_SIZE.labels(endpoint).observe(response.calculate_content_length() or 0)
+    _update_index_gauges()
+    return response
+
+
+@app.teardown_request
+def _finish_request_metrics(error=None):
+    # teardown also runs when the view raised, so the gauge cannot leak
+    if "request_start" in g:
+        IN_FLIGHT.dec()
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    _update_index_gauges()
+    registry = REGISTRY
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return (generate_latest(registry), 200, {"Content-Type": CONTENT_TYPE_LATEST})
+
+
+# --- Feature store (summary view) ---
+def _fresh_summaries(names: list) -> dict:
+    """
+    Feature-store rows that are still current: the source document exists and has the
+    update_time the row was built from. One metadata-only get_all (no document fields);
+    names missing from the result need a full read (live summary or 404).
+    """
+    stored = {}
+    for name in names:
+        summary = feature_store.lookup(name)
+        if summary:
+            stored[name] = summary
+    if not stored:
+        return {}
+    with tracing.span("firestore.get_all", collection="customers", batch_size=len(stored), mask="metadata"), FIRESTORE_READ_LATENCY.time():
+        snapshots = get_documents(db, list(stored), field_paths=[])
+    current = {snapshot.id: getattr(snapshot, "update_time", None) for snapshot in snapshots if snapshot.exists}
+    return {name: {**summary, "source": "feature_store"} for name, summary in stored.items()
+            if name in current and summary["source_update_time"] == (str(current[name]) if current[name] is not None else None)}
+
+
+# --- Health / readiness ---
+# /healthz is liveness only (no I/O). /readyz checks that Firestore is reachable with
+# a cheap keys-only read (which also opens the gRPC channel; how much that saves the
+# first real request is unmeasured, see benchmarks/warmup_latency.py). Cloud Run's
+# startup probe points at /readyz.
+# The customer index (a full keys-only scan) loads in the background once Firestore
+# is reachable; it is not part of readiness, /customers waits for it on first use.
+_readiness = {"ready": False, "warmed_at": None, "components": {}}
+_warmup_lock = threading.Lock()
+
+
+def _load_customer_index():
+    start = time.perf_counter()
+    try:
+        customer_index.refresh_if_stale()
+        print(f"[Warm-up: customer index loaded, {len(customer_index)} IDs in {(time.perf_counter() - start) * 1000:.0f} ms]")
+    except Exception as e:
+        print(f"Warm-up customer index load failed: {str(e)}")
+
+
+def warm_up() -> dict:
+    """Prime the Firestore channel with a one-document read and record per-component status."""
+    # probes never queue behind an in-progress warm-up, they just see "not ready yet"
+    if _readiness["ready"] or not _warmup_lock.acquire(blocking=False):
+        return _readiness
+    try:
+        components = {}
+        start = time.perf_counter()
+        try:
+            # keys-only, single document: a round trip without pulling data
+            list(db.collection("customers").select([DOCUMENT_ID]).limit(1).stream())
+            components["firestore"] = {"status": "ok", "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            print(f"Warm-up read failed: {str(e)}")
+            components["firestore"] = {"status": "error", "error": str(e)}
+
+        _readiness["components"] = components
+        _readiness["ready"] = all(c["status"] == "ok" for c in components.values())
+        _readiness["warmed_at"] = time.time() if _readiness["ready"] else None
+        if _readiness["ready"]:
+            threading.Thread(target=_load_customer_index, daemon=True).start()
+    finally:
+        _warmup_lock.release()
+    return _readiness
+
+
+# Start warming as soon as the worker boots; set WARMUP_ON_START=0 to disable
+# (e.g. when measuring cold first-request latency).
+if os.environ.get("WARMUP_ON_START", "1") == "1":
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return (jsonify({"status": "ok"}), 200)
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    status = warm_up()
+    return (jsonify(status), 200 if status["ready"] else 503)
+
+
 @app.route("/", methods=["GET", "POST", "OPTIONS"])
 def get_customer_data():
     if request.method == "OPTIONS":
         return ('', 204, CORS_HEADERS)
 
     customer_name = None
+    view = None
     if request.method == "POST":
         try:
             body = request.get_json(silent=True)
             if body and "customer_name" in body:
                 customer_name = body["customer_name"]
+                view = body.get("view")
         except Exception:
             pass
 
     if not customer_name:
         customer_name = request.args.get("customer_name")
+    view = view or request.args.get("view", "full")
+
+    if view not in ("full", "summary"):
+        return (jsonify({"error": f"Unknown view '{view}', expected 'full' or 'summary'"}), 400, CORS_HEADERS)
 
     if not customer_name:
         return (jsonify({"error": "Missing required parameter: customer_name"}), 400, CORS_HEADERS)
 
     try:
+        # summary view: the feature-store row, after a metadata-only check that it is still current
+        if view == "summary":
+            summary = _fresh_summaries([customer_name]).get(customer_name)
+            if summary:
+                return (jsonify(summary), 200, CORS_HEADERS)
+
         # db = get_firestore_client()
 
-        doc_ref = db.collection("customers").document(customer_name)
-        doc = doc_ref.get()
+        # continue the caller's trace (agent -> Cloud Run) when a traceparent header is sent
+        with tracing.span("data_service.get_customer_data", parent=tracing.extract(request.headers), customer_name=customer_name) as request_span:
+            with tracing.span("firestore.get", collection="customers"), FIRESTORE_READ_LATENCY.time():
+                doc_ref = db.collection("customers").document(customer_name)
+                doc = doc_ref.get()
+            request_span.set_attribute("customer.found", doc.exists)
         if doc.exists:
-            return (jsonify(doc.to_dict()), 200, CORS_HEADERS)
+            customer_index.add(customer_name)
+            with SERIALIZATION_LATENCY.time():
+                data = doc.to_dict()
+                if view == "summary":
+                    # not in the store yet (new customer / job not run): derive it from the document
+                    row = feature_store.build_rows([customer_name], [data], [getattr(doc, "update_time", None)])[0]
+                    data = {**feature_store.row_to_dict(row), "source": "live"}
+                payload = jsonify(data)
+            return (payload, 200, CORS_HEADERS)
         else:
+            customer_index.discard(customer_name)
             return (jsonify({"error": f"Customer '{customer_name}' not found in Firestore.", "data": {}}), 404, CORS_HEADERS)
     except Exception as e:
         print("Error during Firestore query:")
         traceback.print_exc()
         return (jsonify({"error": f"Firestore query failed: {str(e)}"}), 500, CORS_HEADERS)
 
+@app.route("/batch", methods=["POST", "OPTIONS"])
+def get_customer_batch():
+    """
+    Bulk read for comparison reports: {"customer_names": [...], "view": "full" | "summary"}
+    One Firestore get_all for the whole list instead of one GET per customer.
+    """
+    if request.method == "OPTIONS":
+        return ('', 204, CORS_HEADERS)
+
+    body = request.get_json(silent=True) or {}
+    names = body.get("customer_names")
+    view = body.get("view", "full")
+    if not isinstance(names, list) or not names or not all(isinstance(n, str) and n for n in names):
+        return (jsonify({"error": "Missing required parameter: customer_names (non-empty list of names)"}), 400, CORS_HEADERS)
+    if view not in ("full", "summary"):
+        return (jsonify({"error": f"Unknown view '{view}', expected 'full' or 'summary'"}), 400, CORS_HEADERS)
+    names = list(dict.fromkeys(names))  # de-duplicate, keep order
+    if len(names) > MAX_BATCH_SIZE:
+        return (jsonify({"error": f"At most {MAX_BATCH_SIZE} customers per batch request"}), 400, CORS_HEADERS)
+
+    try:
+        customers = _fresh_summaries(names) if view == "summary" else {}
+        to_read = [name for name in names if name not in customers]
+        with tracing.span("data_service.get_customer_batch", parent=tracing.extract(request.headers), batch_size=len(names)):
+            if to_read:
+                with tracing.span("firestore.get_all", collection="customers", batch_size=len(to_read)), FIRESTORE_READ_LATENCY.time():
+                    snapshots = [snapshot for snapshot in get_documents(db, to_read) if snapshot.exists]
+            else:
+                snapshots = []
+        with SERIALIZATION_LATENCY.time():
+            found = {snapshot.id: snapshot.to_dict() for snapshot in snapshots}
+            if view == "summary" and found:
+                rows = feature_store.build_rows(list(found), list(found.values()),
+                                                [getattr(snapshot, "update_time", None) for snapshot in snapshots])
+                found = {row[0]: {**feature_store.row_to_dict(row), "source": "live"} for row in rows}
+            customers.update(found)
+            for name in to_read:
+                if name in found:
+                    customer_index.add(name)
+                else:
+                    customer_index.discard(name)
+            missing = [name for name in names if name not in customers]
+            payload = jsonify({"customers": {name: customers[name] for name in names if name in customers}, "missing": missing})
+        return (payload, 200, CORS_HEADERS)
+    except Exception as e:
+        print("Error during Firestore batch query:")
+        traceback.print_exc()
+        return (jsonify({"error": f"Firestore batch query failed: {str(e)}"}), 500, CORS_HEADERS)
+
+@app.route("/customers", methods=["GET", "OPTIONS"])
+def search_customers():
+    """Autocomplete: ?prefix=AC&limit=50&page_token=<last id of previous page>"""
+    if request.method == "OPTIONS":
+        return ('', 204, CORS_HEADERS)
+
+    prefix = request.args.get("prefix", "")
+    page_token = request.args.get("page_token") or None
+    try:
+        limit = max(1, min(int(request.args.get("limit", 50)), 500))
+    except ValueError:
+        return (jsonify({"error": "Parameter 'limit' must be an integer"}), 400, CORS_HEADERS)
+
+    try:
+        return (jsonify(customer_index.search(prefix, limit=limit, page_token=page_token)), 200, CORS_HEADERS)
+    except Exception as e:
+        print("Error during customer index search:")
+        traceback.print_exc()
+        return (jsonify({"error": f"Customer search failed: {str(e)}"}), 500, CORS_HEADERS)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 8080)))
\ No newline at end of file
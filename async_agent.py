@@ -0,0 +1,334 @@
+"""
+asyncio version of the agent pipeline (agent_app.py), for driving many customer
+reports from one process without a thread per report.
+
+Same prompts, tool, tiering policy and outputs as agent_app; only the I/O is async:
+  * model calls      - `client.aio.models.generate_content`
+  * tool call        - tools.ToolRegistry.call_async: cache, Firestore directly when a
+                       client is given, else one shared httpx.AsyncClient (connection
+                       pool) to the data service
+  * chart            - speculative_chart, drawn in a worker thread from the tool result
+                       while Agent 1 writes the report; otherwise model-written code via
+                       report_render.run_chart_code_async (asyncio.create_subprocess_exec),
+                       bounded by a semaphore so concurrent reports do not fork one
+                       Python process each at the same time
+
+    python async_agent.py "ACME TECH" "Customer C" --concurrency 8 --out-dir reports
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+
+import httpx
+from google.genai.errors import APIError
+from google.genai.types import Content, Part
+
+import agent_app
+import analytics
+import report_render
+import speculative_chart
+import tiering
+import tools
+import tracing
+import usage
+
+TOOL_TIMEOUT = 10
+DEFAULT_CONCURRENCY = 8
+CHART_CONCURRENCY = os.cpu_count() or 2
+
+
+# --- 4. tool (data service) ---
+async def call_customer_data_service(http: httpx.AsyncClient, customer_name: str) -> dict:
+    """Async remote path of getCustomerData."""
+    url = agent_app.CUSTOMER_DATA_SERVICE_URL
+    print(f"\n[Tool Execution: Calling Cloud Function at: {url}?customer_name={customer_name}]")
+    try:
+        # traceparent lets the Cloud Run spans join this trace
+        response = await http.get(url, params={"customer_name": customer_name}, headers=tracing.inject())
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as err:
+        print(f"HTTP Error: {err.response.status_code}")
+        return {"error": f"Tool execution failed with HTTP status {err.response.status_code}. Response: {err.response.text}"}
+
+
+def build_registry(http: httpx.AsyncClient, db_client=None) -> tools.ToolRegistry:
+    """getCustomerData for the async pipeline: Firestore (in a worker thread) when available, else async HTTP."""
+    return tools.customer_data_registry(
+        db_client,
+        async_remote_handler=lambda args, timeout: call_customer_data_service(http, args.get("customer_name")),
+        timeout=TOOL_TIMEOUT,
+    )
+
+
+# --- 5. Report Agent 1 ---
+@tracing.traced("agent1.run")
+async def run_agent_chat(client, prompt: str, registry: tools.ToolRegistry, tool_results: list = None,
+                         prerender: list = None, policy: tiering.TieringPolicy = None, tiers: list = None):
+    """
+    Async agent_app.run_agent_chat; tool_results / prerender / tiers receive every tool payload /
+    speculative chart / tiering.TierDecision.
+    """
+    policy = policy or tiering.ACTIVE_POLICY
+    negotiation_tool = registry.tool()
+    initial_content = [Content(role="user", parts=[Part(text=prompt)])]
+    print(f"User Prompt: {prompt}")
+
+    try:
+        with tracing.span("model.generate_content", stage="agent1.plan") as model_span:
+            response = await client.aio.models.generate_content(
+                model=policy.plan_model,
+                contents=initial_content,
+                config={'tools': [negotiation_tool], 'system_instruction': agent_app.SYSTEM_INSTRUCTION},
+            )
+            usage.record(model_span, response, policy.plan_model, {
+                "system_instruction": agent_app.SYSTEM_INSTRUCTION, "user_prompt": prompt,
+                "tool_declarations": negotiation_tool})
+    except APIError as e:
+        print(f"\n❌ Report Agent 1 API Error: {e}")
+        return None
+
+    while response.function_calls:
+        tool_call = response.function_calls[0]
+        function_name = tool_call.name
+        args = dict(tool_call.args)
+        customer_name = args.get('customer_name')
+        print(f"[Model requested Tool Call: {function_name} with args: {args}]")
+
+        with tracing.span("tool.call", tool=function_name, customer_name=customer_name):
+            tool_result = await registry.call_async(function_name, args)
+        tool_response_data = tool_result.response
+        print(f"[Tool result via {tool_result.path} in {tool_result.seconds * 1000:.0f} ms]")
+        if tool_results is not None:
+            tool_results.append(tool_response_data)
+
+        decision = policy.decide(tool_response_data, customer_name)
+        tiering.tag_span(decision)
+        if tiers is not None:
+            tiers.append(decision)
+        if decision.template is not None:
+            print(f"[Tier: {decision.tier} - templated report, no further model calls]")
+            return decision.template
+        print(f"[Tier: {decision.tier} - report on {decision.models['report']}, chart {'on' if decision.chart else 'off'}]")
+        if prerender is not None and decision.chart:
+            chart = speculative_chart.start(tool_response_data)
+            if chart is not None:
+                prerender.append(chart)
+
+        contents_with_response = initial_content + [
+            response.candidates[0].content,
+            Content(role="tool", parts=[Part.from_function_response(name=function_name, response=tool_response_data)]),
+        ]
+        with tracing.span("model.generate_content", stage="agent1.answer") as model_span:
+            response = await client.aio.models.generate_content(
+                model=decision.models["report"],
+                contents=contents_with_response,
+                config={'tools': [negotiation_tool]},
+            )
+            usage.record(model_span, response, decision.models["report"], {
+                "user_prompt": prompt, "tool_declarations": negotiation_tool,
+                "tool_call": contents_with_response[-2], "tool_payload": tool_response_data})
+
+    print("\n--- Report Agent Final Report ---")
+    print(response.text)
+    print("----------------------")
+    return response.text
+
+
+# --- 6. HTML ---
+@tracing.traced("report.render_html")
+async def generate_html_report(customer_name: str, report_html: str, chart_png: bytes = None, sink=None,
+                               asset_mode: str = "inline") -> str:
+    html_content, assets = report_render.render_html(customer_name, report_html, chart_png, asset_mode)
+    # sink writes are blocking file I/O
+    location = await asyncio.to_thread(report_render.publish, sink or report_render.DirectorySink("."),
+                                       customer_name, html_content, assets)
+    print(f"\n🎉 Successfully Generated Report: {location}")
+    return location
+
+
+# --- 7. Visual Agent 2 ---
+async def _chart_mission(client, report_text: str, features: dict, chart_slots: asyncio.Semaphore,
+                         chart: speculative_chart.SpeculativeChart = None, model: str = agent_app.MODEL_NAME) -> tuple:
+    """
+    Mission 1: the speculative chart when there is one, else chart code from the model,
+    executed in a subprocess.
+    Returns (chart_png or None, publish_raw_text) - agent_app publishes the raw report
+    when the model gives no code block or the code fails.
+    """
+    if chart is not None:
+        chart_png = await chart.finish_async(report_text, features)
+        if chart_png is not None:
+            print("\n✅ Visualization Agent Success: pre-rendered chart finished with the predicted price.")
+            return chart_png, False
+    visualization_prompt = agent_app.build_visualization_prompt(report_text, features)
+    try:
+        with tracing.span("model.generate_content", stage="agent2.chart_code") as model_span:
+            vis_response = await client.aio.models.generate_content(
+                model=model,
+                contents=[Content(role="user", parts=[Part(text=visualization_prompt)])],
+                config={'temperature': 0.1},
+            )
+            usage.record(model_span, vis_response, model, usage.prompt_sections(
+                visualization_prompt, features=analytics.features_prompt_section(features), report_text=report_text))
+
+        code_match = agent_app.CHART_CODE_RE.search(vis_response.text)
+        if not code_match:
+            print("\n⚠️ Visualization Agent Failed: Did not generate valid Python code block.")
+            return None, True
+
+        async with chart_slots:
+            with tracing.span("chart.execute") as chart_span:
+                chart_png = await report_render.run_chart_code_async(code_match.group(1))
+                chart_span.set_attribute("png_bytes", len(chart_png))
+        print("\n✅ Visualization Agent Success: chart rendered in memory.")
+        return chart_png, False
+    except report_render.ChartExecutionError as e:
+        print(f"\n⚠️ Visualization Agent Error during code execution: {e}")
+        print(e.stderr)
+        return None, True
+    except subprocess.TimeoutExpired as e:
+        print(f"\n⚠️ Visualization Agent Error: chart code timed out after {e.timeout}s")
+    except Exception as e:
+        print(f"\n❌ Visualization Agent Error: {e}")
+    return None, False
+
+
+async def _styling_mission(client, report_text: str, model: str = agent_app.MODEL_NAME) -> str:
+    """Mission 2: Markdown report -> HTML block (falls back to <pre>)."""
+    styling_prompt = agent_app.build_styling_prompt(report_text)
+    try:
+        with tracing.span("model.generate_content", stage="agent2.styling") as model_span:
+            style_response = await client.aio.models.generate_content(
+                model=model,
+                contents=[Content(role="user", parts=[Part(text=styling_prompt)])],
+                config={'temperature': 0.1},
+            )
+            usage.record(model_span, style_response, model,
+                         usage.prompt_sections(styling_prompt, report_text=report_text))
+        print("\n✅ Visualization Agent (convert text) succeed")
+        return style_response.text
+    except Exception as e:
+        print(f"\n❌ Visualization Agent (convert text) failed: {e}")
+        return f"<div class='report-content'><pre>{report_text}</pre></div>"
+
+
+@tracing.traced("agent2.run")
+async def run_visualization_agent(client, customer_name: str, report_text: str, features: dict = None, sink=None,
+                                  asset_mode: str = "inline", chart_slots: asyncio.Semaphore = None,
+                                  chart: speculative_chart.SpeculativeChart = None,
+                                  tier: tiering.TierDecision = None) -> str:
+    """
+    Async agent_app.run_visualization_agent. The two missions are independent,
+    so the chart and the HTML styling run concurrently; styling is cancelled when the
+    chart mission decides to publish the raw report. Returns the report location.
+    """
+    if tier is not None and tier.template_html is not None:
+        print(f"\n[Agent 2: skipped ({tier.tier}), publishing the templated report]")
+        return await generate_html_report(customer_name, tier.template_html, None, sink, asset_mode)
+    models = tier.models if tier is not None else dict.fromkeys(tiering.STAGES, agent_app.MODEL_NAME)
+    print(f"\n[Agent 2: Data Visualization (Models: chart {models['chart']}, styling {models['styling']})]")
+    if tier is not None and not tier.chart:
+        print(f"\n[Agent 2: no chart for the {tier.tier} tier (too few data points)]")
+        chart_png, publish_raw_text = None, False
+        styled_report_html = await _styling_mission(client, report_text, models["styling"])
+    else:
+        styling = asyncio.create_task(_styling_mission(client, report_text, models["styling"]))
+        try:
+            chart_png, publish_raw_text = await _chart_mission(client, report_text, features,
+                                                               chart_slots or asyncio.Semaphore(1), chart, models["chart"])
+        except BaseException:
+            styling.cancel()
+            raise
+        if publish_raw_text:
+            # the sync path never makes this call: drop it (unrecorded) if it is still in flight
+            styling.cancel()
+            styled_report_html = report_text
+        else:
+            styled_report_html = await styling
+    return await generate_html_report(customer_name, styled_report_html, chart_png, sink, asset_mode)
+
+
+# --- pipelines ---
+async def run_report(client, customer_name: str, registry: tools.ToolRegistry, prompt: str = None, sink=None,
+                     chart_slots: asyncio.Semaphore = None, policy: tiering.TieringPolicy = None,
+                     speculative_charts: bool = True) -> str:
+    """
+    Both agents for one customer; returns the report location or None.
+    speculative_charts=False: always the model-written chart code (as before speculative_chart.py)
+    """
+    prompt = prompt or f"Generate a negotiation strategy report for {customer_name}, focusing on profit maximization."
+    with tracing.span("report", customer_name=customer_name):
+        tool_results, tiers = [], []
+        charts = [] if speculative_charts else None
+        report_text = await run_agent_chat(client, prompt, registry, tool_results, charts, policy, tiers)
+        if not report_text:
+            return None
+        features = tool_results[-1].get("precomputed_features") if tool_results else None
+        return await run_visualization_agent(client, customer_name, report_text, features, sink, chart_slots=chart_slots,
+                                             chart=charts[-1] if charts else None, tier=tiers[-1] if tiers else None)
+
+
+async def run_reports(client, customers: list, concurrency: int = DEFAULT_CONCURRENCY, sink=None,
+                      http: httpx.AsyncClient = None, chart_concurrency: int = CHART_CONCURRENCY,
+                      db_client=None, usage_reports: dict = None, policy: tiering.TieringPolicy = None,
+                      speculative_charts: bool = True) -> dict:
+    """
+    Up to `concurrency` customer pipelines at once on one event loop; {customer_name: location or None}.
+    usage_reports: optional dict, receives {customer_name: usage.ReportUsage.to_dict()}.
+    policy: tiering.TieringPolicy (default: tiering.ACTIVE_POLICY); speculative_charts: see run_report.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    chart_slots = asyncio.Semaphore(chart_concurrency)
+    own_http = http is None
+    http = http or httpx.AsyncClient(timeout=TOOL_TIMEOUT)
+    registry = build_registry(http, db_client)
+
+    async def one(name: str):
+        async with slots:
+            with usage.collect(name) as ledger:
+                try:
+                    return await run_report(client, name, registry, sink=sink, chart_slots=chart_slots, policy=policy,
+                                            speculative_charts=speculative_charts)
+                except Exception as e:
+                    print(f"\n❌ Report for {name} failed: {e}")
+                    return None
+                finally:
+                    if usage_reports is not None:
+                        usage_reports[name] = ledger.to_dict()
+
+    try:
+        locations = await asyncio.gather(*(one(name) for name in customers))
+    finally:
+        if own_http:
+            await http.aclose()
+    return dict(zip(customers, locations))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("customers", nargs="+")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--tiering", help="tiering policy JSON, 'default' for the built-in tiers, or 'flat' (default: TIERING_POLICY, else flat)")
+    args = parser.parse_args()
+
+    import google.auth
+    from google import genai
+
+    try:
+        credentials, project = google.auth.default()
+        client = genai.Client(vertexai=True, project=agent_app.PROJECT_ID, location=agent_app.REGION, credentials=credentials)
+        print("--- Gemini Client Initialized ---")
+    except Exception as e:
+        print("\n--- Fail Authorization：Please check gcloud auth application-default login ---")
+        print(f"Error: {e}")
+        exit(1)
+
+    usage_reports = {}
+    results = asyncio.run(run_reports(client, args.customers, args.concurrency, report_render.DirectorySink(args.out_dir),
+                                      usage_reports=usage_reports,
+                                      policy=tiering.load_policy(args.tiering) if args.tiering else None))
+    print(f"\n🎉 {sum(1 for location in results.values() if location)} / {len(results)} reports generated")
+    print(usage.format_batch(usage.summarize_batch(list(usage_reports.values()))))
@@ -0,0 +1,282 @@
+"""
+Batch report generation with change tracking.
+
+Every generated report is recorded in a manifest together with the source
+document's Firestore `update_time`, a content hash, the prompt fingerprint and
+the model fingerprint (tiering.py policy). With --changed-only, a run
+regenerates only customers where one of those changed:
+
+  1. candidates come from a keys-only snapshot scan (document ID + update_time,
+     no field data) diffed against the manifest, or from a Firestore query on a
+     timestamp field with --updated-field;
+  2. candidates whose content hash is unchanged (e.g. a rewrite with identical
+     data) are skipped without a model call.
+
+    python batch_reports.py --out-dir reports                 # everything
+    python batch_reports.py --out-dir reports --changed-only  # nightly run
+    python batch_reports.py --sink zip:reports/reports.zip    # one archive instead of loose files
+    python batch_reports.py --usage-json usage.json           # per-report token/cost breakdown
+    python batch_reports.py --tiering default                 # built-in tiering policy (tiering.json: custom)
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+import agent_app
+import report_render
+import speculative_chart
+import tiering
+import tools
+import usage
+from customer_index import get_documents, iter_document_pages
+
+DATABASE_ID = "customers"
+MANIFEST_FILE = "report_manifest.json"
+PLAN_BATCH_SIZE = 500  # documents per get_all when planning a run
+REPORT_PROMPT = "Generate a negotiation strategy report for {customer_name}, focusing on profit maximization."
+
+
+# --- fingerprints ---
+def content_hash(doc: dict) -> str:
+    canonical = json.dumps(doc, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def prompt_fingerprint() -> str:
+    """
+    Changes whenever the text sent to the model (system prompt, report prompt, Agent 2 prompt templates)
+    or speculative_chart.CHART_STYLE_VERSION changes; code around the prompts can be edited freely.
+    """
+    parts = [
+        agent_app.SYSTEM_INSTRUCTION,
+        REPORT_PROMPT,
+        # the templates rendered with placeholders: only the prompt text is hashed
+        agent_app.build_visualization_prompt("{report_text}", {"{feature}": 0}),
+        agent_app.build_styling_prompt("{report_text}"),
+        f"chart style {speculative_chart.CHART_STYLE_VERSION}",
+    ]
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# --- manifest ---
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {"last_run": None, "customers": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict):
+    # write-then-rename, so a crash mid-write never leaves a truncated manifest
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# --- change detection ---
+def _update_time(snapshot) -> str:
+    value = getattr(snapshot, "update_time", None)
+    return str(value) if value is not None else None
+
+
+def scan_update_times(db_client, collection: str = "customers") -> dict:
+    """Snapshot diff input: {customer_name: update_time} from a keys-only scan."""
+    return {
+        snapshot.id: _update_time(snapshot)
+        for page in iter_document_pages(db_client.collection(collection), keys_only=True)
+        for snapshot in page
+    }
+
+
+def query_updated_since(db_client, field: str, since: str, collection: str = "customers") -> dict:
+    """Alternative candidate source when documents carry their own timestamp field."""
+    since_dt = datetime.datetime.fromisoformat(since)
+    query = db_client.collection(collection).where(filter=FieldFilter(field, ">", since_dt))
+    return {snapshot.id: _update_time(snapshot) for snapshot in query.stream()}
+
+
+def plan_run(db_client, manifest: dict, changed_only: bool, customers: list = None,
+             updated_field: str = None, collection: str = "customers", policy: tiering.TieringPolicy = None) -> tuple:
+    """
+    Returns (to_generate, skipped, removed), where to_generate is a list of
+    (customer_name, fingerprint dict, reason).
+    """
+    policy = policy or tiering.ACTIVE_POLICY
+    fingerprint_base = {"prompt": prompt_fingerprint(), "model": policy.fingerprint()}
+    recorded = manifest["customers"]
+
+    if updated_field and manifest.get("last_run"):
+        update_times = query_updated_since(db_client, updated_field, manifest["last_run"], collection)
+        # prompt/model changes still invalidate everything already in the manifest
+        if any(recorded[name].get("prompt") != fingerprint_base["prompt"] or recorded[name].get("model") != fingerprint_base["model"]
+               for name in recorded):
+            update_times = {**{name: None for name in recorded}, **update_times}
+    else:
+        update_times = scan_update_times(db_client, collection)
+    if customers:
+        update_times = {name: update_times.get(name) for name in customers}
+
+    removed = [] if (customers or updated_field) else sorted(set(recorded) - set(update_times))
+    to_generate, skipped, candidates = [], [], []
+    for name, update_time in sorted(update_times.items()):
+        previous = recorded.get(name)
+        if changed_only and previous:
+            if (previous.get("update_time") == update_time and update_time is not None
+                    and previous.get("prompt") == fingerprint_base["prompt"]
+                    and previous.get("model") == fingerprint_base["model"]):
+                skipped.append(name)
+                continue
+        candidates.append(name)
+
+    # content hashes need the documents: one get_all round trip per PLAN_BATCH_SIZE candidates
+    for start in range(0, len(candidates), PLAN_BATCH_SIZE):
+        batch = candidates[start:start + PLAN_BATCH_SIZE]
+        snapshots = {snapshot.id: snapshot for snapshot in get_documents(db_client, batch, collection) if snapshot.exists}
+        for name in batch:
+            snapshot = snapshots.get(name)
+            if snapshot is None:
+                removed.append(name)
+                continue
+            previous = recorded.get(name)
+            fingerprint = {**fingerprint_base, "update_time": _update_time(snapshot) or update_times[name],
+                           "content_hash": content_hash(snapshot.to_dict())}
+
+            if not changed_only or not previous:
+                reason = "new" if not previous else "full run"
+            elif previous.get("content_hash") != fingerprint["content_hash"]:
+                reason = "data changed"
+            elif previous.get("prompt") != fingerprint["prompt"]:
+                reason = "prompt changed"
+            elif previous.get("model") != fingerprint["model"]:
+                reason = "model changed"
+            else:
+                # update_time moved but the data is identical: just record the new timestamp
+                previous["update_time"] = fingerprint["update_time"]
+                skipped.append(name)
+                continue
+            to_generate.append((name, fingerprint, reason))
+    return to_generate, skipped, removed
+
+
+# --- generation ---
+def generate_report(client, customer_name: str, sink=None, asset_mode: str = "inline", registry=None,
+                    policy: tiering.TieringPolicy = None, tiers: list = None) -> str:
+    """
+    Run both agents for one customer; returns the report location in the sink or None.
+    tiers: optional list, receives the customer's tiering.TierDecision
+    """
+    tool_results, charts = [], []
+    tiers = tiers if tiers is not None else []
+    report_text = agent_app.run_agent_chat(client, REPORT_PROMPT.format(customer_name=customer_name), tool_results, registry,
+                                           prerender=charts, policy=policy, tiers=tiers)
+    if not report_text:
+        return None
+    features = tool_results[-1].get("precomputed_features") if tool_results else None
+    return agent_app.run_visualization_agent(client, customer_name, report_text, features, sink, asset_mode,
+                                             chart=charts[-1] if charts else None, tier=tiers[-1] if tiers else None)
+
+
+def run_batch(client, db_client, out_dir: str = ".", changed_only: bool = False, customers: list = None,
+              updated_field: str = None, manifest_file: str = MANIFEST_FILE, sink=None,
+              asset_mode: str = "inline", policy: tiering.TieringPolicy = None) -> dict:
+    """
+    `sink` defaults to a DirectorySink on out_dir; the manifest always lives in out_dir.
+    policy: tiering.TieringPolicy (default: tiering.ACTIVE_POLICY)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sink = sink or report_render.DirectorySink(out_dir)
+    # we already hold a Firestore client: tool calls read it directly, Cloud Run only as fallback
+    registry = tools.customer_data_registry(db_client, agent_app.CUSTOMER_DATA_SERVICE_URL)
+    manifest_path = os.path.join(out_dir, manifest_file)
+    manifest = load_manifest(manifest_path)
+    run_started = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+    to_generate, skipped, removed = plan_run(db_client, manifest, changed_only, customers, updated_field, policy=policy)
+    print(f"[Batch: {len(to_generate)} to generate, {len(skipped)} unchanged, {len(removed)} removed]")
+    for name in removed:
+        manifest["customers"].pop(name, None)
+
+    generated, failed, usage_reports, tier_counts = [], [], [], Counter()
+    for name, fingerprint, reason in to_generate:
+        print(f"\n[Batch: generating {name} ({reason})]")
+        started = time.perf_counter()
+        tiers = []
+        with usage.collect(name) as ledger:
+            report_file = generate_report(client, name, sink, asset_mode, registry, policy, tiers)
+        report_usage = ledger.to_dict()
+        usage_reports.append(report_usage)
+        tier = tiers[-1].tier if tiers else None
+        tier_counts[tier] += 1
+        if report_file is None:
+            failed.append(name)
+            continue
+        manifest["customers"][name] = {**fingerprint, "report_file": report_file, "tier": tier,
+                                       "generated_at": time.time(), "seconds": round(time.perf_counter() - started, 2),
+                                       "usage": {key: report_usage[key] for key in
+                                                 ("model_calls", "input_tokens", "output_tokens", "thoughts_tokens", "cost_usd")}}
+        save_manifest(manifest_path, manifest)  # checkpoint after every report
+        generated.append(name)
+
+    if not failed:
+        manifest["last_run"] = run_started
+    save_manifest(manifest_path, manifest)
+    return {"generated": generated, "skipped": skipped, "removed": removed, "failed": failed, "tiers": dict(tier_counts),
+            "usage": usage.summarize_batch(usage_reports), "usage_reports": usage_reports}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--changed-only", action="store_true", help="regenerate only changed customers")
+    parser.add_argument("--customers", nargs="*", help="limit the run to these customers")
+    parser.add_argument("--updated-field", help="document timestamp field to query instead of a snapshot diff")
+    parser.add_argument("--sink", help="where reports go: dir:<path> (default: --out-dir) or zip:<path>")
+    parser.add_argument("--linked-charts", action="store_true", help="write charts as separate PNGs instead of inlining them")
+    parser.add_argument("--usage-json", help="write per-call token usage of this run to this file")
+    parser.add_argument("--tiering", help="tiering policy JSON, 'default' for the built-in tiers, or 'flat' (default: TIERING_POLICY, else flat)")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan without calling the model")
+    args = parser.parse_args()
+    policy = tiering.load_policy(args.tiering) if args.tiering else None
+
+    import google.auth
+    from google import genai
+    from google.cloud import firestore
+
+    try:
+        credentials, project = google.auth.default()
+        genai_client = genai.Client(vertexai=True, project=agent_app.PROJECT_ID, location=agent_app.REGION, credentials=credentials)
+        db = firestore.Client(project=agent_app.PROJECT_ID, database=DATABASE_ID, credentials=credentials)
+        print("--- Gemini & Firestore Clients Initialized ---")
+    except Exception as e:
+        print("\n--- Fail Authorization：Please check gcloud auth application-default login ---")
+        print(f"Error: {e}")
+        exit(1)
+
+    if args.dry_run:
+        plan, unchanged, gone = plan_run(db, load_manifest(os.path.join(args.out_dir, MANIFEST_FILE)),
+                                         args.changed_only, args.customers, args.updated_field, policy=policy)
+        for name, _, reason in plan:
+            print(f"  regenerate  {name:<40} {reason}")
+        print(f"\n{len(plan)} to generate, {len(unchanged)} unchanged, {len(gone)} removed")
+    else:
+        sink = report_render.sink_from_spec(args.sink) if args.sink else None
+        try:
+            summary = run_batch(genai_client, db, args.out_dir, args.changed_only, args.customers, args.updated_field,
+                                sink=sink, asset_mode="linked" if args.linked_charts else "inline", policy=policy)
+        finally:
+            if isinstance(sink, report_render.ArchiveSink):
+                sink.close()
+        print(f"\n🎉 Batch finished: {len(summary['generated'])} generated, {len(summary['skipped'])} unchanged, "
+              f"{len(summary['removed'])} removed, {len(summary['failed'])} failed")
+        print("Tiers: " + ", ".join(f"{tier}: {count}" for tier, count in sorted(summary["tiers"].items(), key=str)))
+        print(usage.format_batch(summary["usage"]))
+        if args.usage_json:
+            with open(args.usage_json, "w", encoding="utf-8") as f:
+                json.dump({"batch": summary["usage"], "reports": summary["usage_reports"]}, f, indent=2)
@@ -0,0 +1,146 @@
+"""
+Concurrency benchmark: async pipeline (async_agent.py, one event loop) vs the
+blocking pipeline (agent_app.py) on a thread pool, offline.
+
+Both modes drive the same fake backends:
+  * model  - FakeGenaiClient (`client.models` / `client.aio.models`), per-stage latency
+  * tool   - app.py through the Flask test client behind an in-memory Firestore,
+             plus --tool-latency of simulated network time (httpx.MockTransport
+             for the async client, time.sleep for the blocking one)
+  * charts - the speculative chart (speculative_chart.py), or with --chart model the
+             real chart subprocess (the CPU-bound part; async mode bounds it with
+             async_agent.CHART_CONCURRENCY)
+  * tiering - the same tiering.py policy in both modes (--tiering, default flat)
+
+Both modes make the same model calls, so the numbers compare threads vs asyncio only.
+
+Reported per mode and concurrency: wall time, reports/s and peak thread count.
+
+Usage:
+    python benchmarks/async_pipeline.py --reports 12 --concurrency 1 4 12 --model-latency 0.2
+    python benchmarks/async_pipeline.py --modes async --concurrency 50 --reports 50
+    python benchmarks/async_pipeline.py --chart model      # model-written chart code + subprocess in both modes
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import report_render
+import tiering
+from fakes import FakeGenaiClient, make_customers
+from run_benchmarks import load_data_service
+
+
+class PeakThreads:
+    def __init__(self):
+        self.peak = threading.active_count()
+
+    def sample(self):
+        self.peak = max(self.peak, threading.active_count())
+
+
+def run_async(client, names: list, concurrency: int, http_service, tool_latency: float, threads: PeakThreads,
+              policy, speculative_charts: bool) -> int:
+    import async_agent
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        threads.sample()
+        await asyncio.sleep(tool_latency)
+        response = http_service.get("/", query_string=dict(request.url.params))
+        return httpx.Response(response.status_code, content=response.data, headers={"Content-Type": "application/json"})
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            return await async_agent.run_reports(client, names, concurrency, report_render.MemorySink(), http=http,
+                                                 policy=policy, speculative_charts=speculative_charts)
+
+    results = asyncio.run(main())
+    return sum(1 for location in results.values() if location)
+
+
+def run_threads(client, names: list, concurrency: int, http_service, tool_latency: float, threads: PeakThreads,
+                policy, speculative_charts: bool) -> int:
+    import agent_app
+    import tools
+
+    def call_service(customer_name: str) -> dict:
+        threads.sample()
+        time.sleep(tool_latency)
+        return http_service.get("/", query_string={"customer_name": customer_name}).get_json()
+
+    registry = tools.customer_data_registry(remote_handler=lambda args, timeout: call_service(args["customer_name"]),
+                                            cache_ttl=0)
+    sink = report_render.MemorySink()
+
+    def one(name: str):
+        tool_results, tiers = [], []
+        charts = [] if speculative_charts else None
+        prompt = f"Generate a negotiation strategy report for {name}, focusing on profit maximization."
+        report_text = agent_app.run_agent_chat(client, prompt, tool_results, registry, prerender=charts,
+                                               policy=policy, tiers=tiers)
+        if not report_text:
+            return None
+        features = tool_results[-1].get("precomputed_features") if tool_results else None
+        return agent_app.run_visualization_agent(client, name, report_text, features, sink,
+                                                 chart=charts[-1] if charts else None, tier=tiers[-1] if tiers else None)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return sum(1 for location in pool.map(one, names) if location)
+
+
+MODES = {"async": run_async, "threads": run_threads}
+
+
+def run(args) -> list:
+    customers = make_customers(args.reports, args.history_size, args.seed)
+    names = list(customers)
+    http_service = load_data_service(customers, use_emulator=False, firestore_latency=0.0).app.test_client()
+    latency = {"tool_call": args.model_latency, "report": args.model_latency * 4,
+               "chart": args.model_latency * 2, "styling": args.model_latency * 2}
+
+    policy = tiering.load_policy(args.tiering)
+    results = []
+    for mode in args.modes:
+        for concurrency in args.concurrency:
+            client = FakeGenaiClient(latency=latency, seed=args.seed)
+            threads = PeakThreads()
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                done = MODES[mode](client, names, concurrency, http_service, args.tool_latency, threads,
+                                   policy, args.chart == "speculative")
+            elapsed = time.perf_counter() - started
+            results.append({"mode": mode, "concurrency": concurrency, "reports": done, "wall_s": round(elapsed, 2),
+                            "reports_per_s": round(done / elapsed, 3), "peak_threads": threads.peak,
+                            "model_calls": client.models.calls})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=12, help="customer pipelines per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 12])
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["async", "threads"])
+    parser.add_argument("--history-size", type=int, default=12)
+    parser.add_argument("--model-latency", type=float, default=0.2, help="seconds per fake tool-call round (other stages scale from it)")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="simulated network time per data service call")
+    parser.add_argument("--chart", choices=["speculative", "model"], default="speculative",
+                        help="chart path for both modes: speculative_chart.py or model-written code in a subprocess")
+    parser.add_argument("--tiering", default="flat", help="tiering policy for both modes: 'flat', 'default' or a policy JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'mode':<9}{'concurrency':>12}{'reports':>9}{'wall s':>9}{'reports/s':>11}{'threads':>9}{'calls':>7}")
+    for r in run(args):
+        print(f"{r['mode']:<9}{r['concurrency']:>12}{r['reports']:>9}{r['wall_s']:>9}{r['reports_per_s']:>11}"
+              f"{r['peak_threads']:>9}{r['model_calls']:>7}")
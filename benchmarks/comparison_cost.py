@@ -0,0 +1,92 @@
+"""
+Model cost of a segment comparison report vs one report per customer, offline.
+
+For each segment size, counts model calls and prompt/output tokens (FakeUsage,
+~4 characters per token) for:
+  * comparison   - comparison.run_comparison_report (one bulk read, one model call)
+  * per_customer - Agent 1 for every customer in the segment (lower bound of N
+                   single reports: Agent 2 adds two more calls per customer)
+
+Usage:
+    python benchmarks/comparison_cost.py --sizes 5 10 20 50 --history-size 24
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import report_render
+import tracing
+from fakes import FakeGenaiClient, make_customers
+from run_benchmarks import load_data_service
+
+
+def model_usage(spans: list) -> dict:
+    model_spans = [s for s in spans if s.name == "model.generate_content"]
+    return {
+        "calls": len(model_spans),
+        "input_tokens": sum(s.attributes.get("gen_ai.usage.input_tokens") or 0 for s in model_spans),
+        "output_tokens": sum(s.attributes.get("gen_ai.usage.output_tokens") or 0 for s in model_spans),
+    }
+
+
+def run(args) -> list:
+    customers = make_customers(max(args.sizes), args.history_size, args.seed)
+    names = list(customers)
+    service = load_data_service(customers, use_emulator=False, firestore_latency=0.0)
+    http = service.app.test_client()
+
+    import agent_app
+    import comparison
+    import tools
+
+    def call_service(customer_name: str) -> dict:
+        return http.get("/", query_string={"customer_name": customer_name}).get_json()
+
+    def fetch_customers(batch: list, db_client=None, service_url: str = None) -> tuple:
+        data = http.post("/batch", json={"customer_names": batch}).get_json()
+        return data["customers"], data["missing"]
+
+    registry = tools.customer_data_registry(remote_handler=lambda args, timeout: call_service(args["customer_name"]),
+                                            cache_ttl=0)
+    comparison.fetch_customers = fetch_customers
+
+    exporter = tracing.InMemoryExporter()
+    tracing.set_exporter(exporter)
+    client = FakeGenaiClient()
+    results = []
+    for size in args.sizes:
+        segment = names[:size]
+        with contextlib.redirect_stdout(io.StringIO()):
+            exporter.clear()
+            comparison.run_comparison_report(client, segment, sink=report_render.MemorySink())
+            compare_usage = model_usage(exporter.spans)
+
+            exporter.clear()
+            for name in segment:
+                agent_app.run_agent_chat(client, f"Generate a negotiation strategy report for {name}, focusing on profit maximization.",
+                                         registry=registry)
+            single_usage = model_usage(exporter.spans)
+        results.append({"size": size, "comparison": compare_usage, "per_customer": single_usage})
+    return results
+
+
+def print_results(results: list):
+    print(f"{'accounts':>8}  {'mode':<13}{'calls':>6}{'in tokens':>12}{'out tokens':>12}{'in tok/acct':>13}")
+    for result in results:
+        for mode in ("comparison", "per_customer"):
+            usage = result[mode]
+            print(f"{result['size']:>8}  {mode:<13}{usage['calls']:>6}{usage['input_tokens']:>12}"
+                  f"{usage['output_tokens']:>12}{usage['input_tokens'] / result['size']:>13.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 20, 50])
+    parser.add_argument("--history-size", type=int, default=24, help="purchase_history entries per customer")
+    parser.add_argument("--seed", type=int, default=0)
+    print_results(run(parser.parse_args()))
@@ -0,0 +1,26 @@
+"""
+WSGI entry point for load tests: app.py backed by the in-memory FakeFirestore,
+so gunicorn configurations can be compared without GCP or the emulator.
+
+    gunicorn --chdir benchmarks fake_service:app --workers 2 --threads 4
+
+Data (identical in every worker, see fakes.make_load_customers):
+  LOAD_CUSTOMERS          regular customers "Customer 00000".. (default 1000)
+  LOAD_HISTORY_SIZE       purchase_history entries per regular customer (default 24)
+  LOAD_LARGE_CUSTOMERS    large documents "Large 00000".. (default 20)
+  LOAD_LARGE_HISTORY_SIZE purchase_history entries per large document (default 2000)
+  LOAD_FIRESTORE_LATENCY  simulated Firestore round trip in seconds (default 0.005)
+"""
+import os
+
+from fakes import make_load_customers
+from run_benchmarks import load_data_service
+
+customers = make_load_customers(
+    int(os.environ.get("LOAD_CUSTOMERS", 1000)),
+    int(os.environ.get("LOAD_HISTORY_SIZE", 24)),
+    int(os.environ.get("LOAD_LARGE_CUSTOMERS", 20)),
+    int(os.environ.get("LOAD_LARGE_HISTORY_SIZE", 2000)),
+)
+app = load_data_service(customers, use_emulator=False,
+                        firestore_latency=float(os.environ.get("LOAD_FIRESTORE_LATENCY", 0.005))).app
@@ -0,0 +1,304 @@
+"""
+Deterministic stand-ins for the live backends, used by the benchmarks.
+
+* FakeGenaiClient  - mimics `genai.Client().models.generate_content` (and the
+                     `client.aio` async variant) for the three calls the pipeline
+                     makes (tool call -> report, chart code, HTML), with configurable latency.
+* FakeFirestore    - in-memory replacement for the `firestore.Client` calls app.py
+                     and customer_index.py make.
+* make_customer    - synthetic customer documents with a configurable
+                     `purchase_history` size.
+"""
+import asyncio
+import datetime
+import json
+import random
+import re
+import time
+
+from google.genai.types import Content, Part
+
+NEGOTIATION_STYLES = ["Aggressive", "Collaborative", "Price-sensitive", "Relationship-driven", "Analytical"]
+
+
+# --- synthetic data ---
+def make_customer(name: str, history_size: int = 12, seed: int = 0) -> dict:
+    rng = random.Random(f"{name}-{seed}")
+    target = rng.randrange(50_000, 150_000, 500)
+    cost = int(target * rng.uniform(0.55, 0.8))
+    day = datetime.date(2020, 1, 1)
+    price = target * rng.uniform(0.8, 1.0)
+    history = []
+    for i in range(history_size):
+        day += datetime.timedelta(days=rng.randint(20, 90))
+        price = max(cost * 0.9, price * rng.uniform(0.95, 1.06))
+        history.append({
+            "date": day.isoformat(),
+            "product": f"Product {chr(65 + i % 5)}",
+            "price_achieved": round(price, 2),
+            "outcome": rng.choice(["won", "won", "won", "lost"]),
+        })
+    return {
+        "customer_name": name,
+        "negotiation_style": rng.choice(NEGOTIATION_STYLES),
+        "current_target_price": target,
+        "current_cost_price": cost,
+        "purchase_history": history,
+    }
+
+
+def make_customers(count: int, history_size: int = 12, seed: int = 0) -> dict:
+    return {f"Customer {i:05d}": make_customer(f"Customer {i:05d}", history_size, seed) for i in range(count)}
+
+
+def make_load_customers(count: int, history_size: int, large_count: int, large_history_size: int) -> dict:
+    """Load-test data set: regular customers plus "Large 00000".. documents with long histories."""
+    customers = make_customers(count, history_size)
+    for i in range(large_count):
+        customers[f"Large {i:05d}"] = make_customer(f"Large {i:05d}", large_history_size)
+    return customers
+
+
+# --- Firestore ---
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data):
+        self.id = doc_id
+        self._data = data
+        self.exists = data is not None
+
+    def to_dict(self):
+        return json.loads(json.dumps(self._data)) if self._data is not None else None
+
+
+class FakeDocumentRef:
+    def __init__(self, store: dict, doc_id: str, latency: float):
+        self._store = store
+        self.id = doc_id
+        self._latency = latency
+
+    def get(self, timeout: float = None):
+        time.sleep(self._latency)
+        return FakeSnapshot(self.id, self._store.get(self.id))
+
+
+class FakeQuery:
+    """Supports the keys-only paging chain: select().order_by().limit().start_after().stream()"""
+
+    def __init__(self, store: dict, latency: float, limit: int = None, after: str = None):
+        self._store = store
+        self._latency = latency
+        self._limit = limit
+        self._after = after
+
+    def select(self, field_paths):
+        return self
+
+    def order_by(self, field_path):
+        return self
+
+    def limit(self, count: int):
+        return FakeQuery(self._store, self._latency, count, self._after)
+
+    def start_after(self, snapshot):
+        return FakeQuery(self._store, self._latency, self._limit, snapshot.id)
+
+    def stream(self):
+        time.sleep(self._latency)
+        ids = sorted(k for k in self._store if self._after is None or k > self._after)
+        if self._limit is not None:
+            ids = ids[:self._limit]
+        for doc_id in ids:
+            yield FakeSnapshot(doc_id, self._store[doc_id])
+
+
+class FakeCollection(FakeQuery):
+    def document(self, doc_id: str):
+        return FakeDocumentRef(self._store, doc_id, self._latency)
+
+
+class FakeFirestore:
+    def __init__(self, customers: dict, latency: float = 0.0):
+        self._collections = {"customers": customers}
+        self._latency = latency
+
+    def collection(self, name: str):
+        return FakeCollection(self._collections.setdefault(name, {}), self._latency)
+
+    def get_all(self, references, field_paths=None):
+        # one round trip for the whole batch, like BatchGetDocuments
+        time.sleep(self._latency)
+        for ref in references:
+            yield FakeSnapshot(ref.id, ref._store.get(ref.id))
+
+
+# --- Gemini ---
+class FakeUsage:
+    def __init__(self, prompt_chars: int, output_chars: int):
+        # ~4 characters per token, close enough for relative comparisons
+        self.prompt_token_count = prompt_chars // 4
+        self.candidates_token_count = output_chars // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeFunctionCall:
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+
+
+class FakeCandidate:
+    def __init__(self, content: Content):
+        self.content = content
+
+
+class FakeResponse:
+    def __init__(self, text: str = None, function_call: FakeFunctionCall = None, prompt_chars: int = 0):
+        self.text = text
+        self.function_calls = [function_call] if function_call else None
+        if function_call:
+            part = Part.from_function_call(name=function_call.name, args=function_call.args)
+        else:
+            part = Part(text=text)
+        self.candidates = [FakeCandidate(Content(role="model", parts=[part]))]
+        self.usage_metadata = FakeUsage(prompt_chars, len(text or json.dumps(function_call.args)))
+
+
+def _contents_text(contents) -> str:
+    chunks = []
+    for content in contents:
+        for part in content.parts or []:
+            if part.text:
+                chunks.append(part.text)
+            if part.function_response:
+                chunks.append(json.dumps(part.function_response.response, default=str))
+    return "\n".join(chunks)
+
+
+def _tool_payload(contents) -> dict:
+    for content in contents:
+        for part in content.parts or []:
+            if part.function_response:
+                return part.function_response.response or {}
+    return {}
+
+
+def _extract_payload(text: str) -> dict:
+    match = re.search(r"```json\n(.*?)\n```", text, re.DOTALL)
+    return json.loads(match.group(1)) if match else {}
+
+
+CHART_CODE = """```python
+import datetime
+import matplotlib.pyplot as plt
+
+history = {history}
+dates = [datetime.datetime.strptime(h["date"], "%Y-%m-%d") for h in history]
+prices = [h["price_achieved"] for h in history]
+plt.figure(figsize=(10, 5))
+plt.plot(dates, prices, marker="o", label="Historical Prices")
+plt.axhline({target}, linestyle="--", color="green", label="Target Price")
+plt.axhline({cost}, linestyle="--", color="red", label="Cost Price")
+if dates:
+    plt.fill_between(dates, {cost}, {target}, color="green", alpha=0.1, label="Target Profit Zone")
+plt.axhline({predicted}, color="gold", label="Predicted Price")
+plt.title("Negotiation Price History")
+plt.xlabel("Date")
+plt.ylabel("Price ($)")
+plt.legend()
+plt.savefig("chart.png")
+```"""
+
+
+class FakeModels:
+    def __init__(self, latency, seed: int):
+        self._latency = latency
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _delay(self, stage: str) -> float:
+        latency = self._latency.get(stage, 0.0) if isinstance(self._latency, dict) else self._latency
+        return latency * self._rng.uniform(0.9, 1.1) if latency else 0.0
+
+    def _sleep(self, stage: str):
+        delay = self._delay(stage)
+        if delay:
+            time.sleep(delay)
+
+    def generate_content(self, model: str, contents, config=None):
+        self.calls += 1
+        return self._respond(contents, config or {}, self._sleep)
+
+    def _respond(self, contents, config: dict, wait):
+        """Pick the pipeline stage from the request, wait(stage), build the canned response."""
+        text = _contents_text(contents)
+        has_tool_result = any(content.role == "tool" for content in contents)
+
+        # Agent 1, first round: ask for the tool
+        if config.get("tools") and not has_tool_result:
+            wait("tool_call")
+            match = re.search(r"report for ([^,.\n]+)", text)
+            name = match.group(1).strip() if match else "Customer C"
+            return FakeResponse(function_call=FakeFunctionCall("getCustomerData", {"customer_name": name}), prompt_chars=len(text))
+
+        # Agent 1, second round: write the report, embedding the tool payload
+        if has_tool_result:
+            wait("report")
+            data = _tool_payload(contents)
+            prices = [h["price_achieved"] for h in data.get("purchase_history", [])] or [0]
+            predicted = round(sum(prices[-3:]) / len(prices[-3:]), 2)
+            report = (f"## Negotiation Strategy for {data.get('customer_name', 'customer')}\n"
+                      f"* **Negotiation style:** {data.get('negotiation_style', 'unknown')}\n"
+                      f"* **Walk-away Price:** ${data.get('current_cost_price', 0)}\n"
+                      f"Predicted Deal Price: ${predicted}\n\n"
+                      f"```json\n{json.dumps(data)}\n```")
+            return FakeResponse(text=report, prompt_chars=len(text))
+
+        # Agent 2, mission 1: chart code
+        if "matplotlib" in text:
+            wait("chart")
+            data = _extract_payload(text)
+            predicted = re.search(r"Predicted Deal Price: \$([\d.]+)", text)
+            code = CHART_CODE.format(
+                history=json.dumps(data.get("purchase_history", [])),
+                target=data.get("current_target_price", 0),
+                cost=data.get("current_cost_price", 0),
+                predicted=predicted.group(1) if predicted else 0,
+            )
+            return FakeResponse(text=code, prompt_chars=len(text))
+
+        # Agent 2, mission 2: HTML
+        wait("styling")
+        body = text.split("---")[1] if "---" in text else text
+        return FakeResponse(text=f"<div class='report-content'><pre>{body.strip()}</pre></div>", prompt_chars=len(text))
+
+
+class FakeAsyncModels:
+    """`client.aio.models`: same responses and call counter, latency awaited instead of slept."""
+
+    def __init__(self, models: FakeModels):
+        self._models = models
+
+    async def generate_content(self, model: str, contents, config=None):
+        self._models.calls += 1
+        delays = []
+        response = self._models._respond(contents, config or {}, lambda stage: delays.append(self._models._delay(stage)))
+        if delays and delays[0]:
+            await asyncio.sleep(delays[0])
+        return response
+
+
+class FakeAio:
+    def __init__(self, models: FakeModels):
+        self.models = FakeAsyncModels(models)
+
+
+class FakeGenaiClient:
+    """
+    latency: seconds per call, either a float or a dict keyed by stage
+             ('tool_call', 'report', 'chart', 'styling').
+    `client.aio.models.generate_content` is the asyncio variant (async_agent.py).
+    """
+
+    def __init__(self, latency=0.0, seed: int = 0):
+        self.models = FakeModels(latency, seed)
+        self.aio = FakeAio(self.models)
@@ -0,0 +1,76 @@
+"""
+Report farm scaling benchmark (report_farm.py), offline.
+
+Every worker process builds its own FakeGenaiClient (per-stage latency) and an
+in-memory Firestore with the same synthetic data (fakes.make_load_customers:
+regular customers plus "Large ..." documents with long purchase histories that
+sort last, so they are handed out at the end of the run).
+
+Reported per worker count: wall time, reports/s and per-worker utilization.
+
+Usage:
+    python benchmarks/farm_scaling.py --reports 24 --workers 1 2 4
+    python benchmarks/farm_scaling.py --reports 40 --large 10 --large-history-size 5000 --workers 4 --per-worker
+"""
+import argparse
+import contextlib
+import functools
+import io
+import os
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from fakes import FakeFirestore, FakeGenaiClient, make_load_customers
+
+
+# --- worker client factories (module level: pickled into spawned workers) ---
+def fake_genai_client(model_latency: float):
+    return FakeGenaiClient(latency={"tool_call": model_latency, "report": model_latency * 4,
+                                    "chart": model_latency * 2, "styling": model_latency * 2})
+
+
+def fake_db_client(count: int, history_size: int, large_count: int, large_history_size: int, latency: float):
+    return FakeFirestore(make_load_customers(count, history_size, large_count, large_history_size), latency=latency)
+
+
+def run(args) -> list:
+    import report_farm
+
+    db_factory = functools.partial(fake_db_client, args.reports - args.large, args.history_size, args.large,
+                                   args.large_history_size, args.firestore_latency)
+    client_factory = functools.partial(fake_genai_client, args.model_latency)
+    results = []
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as out_dir:
+            with contextlib.redirect_stdout(io.StringIO()):
+                summary = report_farm.run_farm(db_factory(), workers, out_dir, client_factory=client_factory,
+                                               db_factory=db_factory, service_url=None)
+        results.append({"worker_count": workers, **summary})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=24, help="customers in the run (regular + large)")
+    parser.add_argument("--large", type=int, default=4, help="of which large documents")
+    parser.add_argument("--history-size", type=int, default=24)
+    parser.add_argument("--large-history-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model-latency", type=float, default=0.1, help="seconds per fake tool-call round (other stages scale from it)")
+    parser.add_argument("--firestore-latency", type=float, default=0.005)
+    parser.add_argument("--per-worker", action="store_true", help="print per-worker stats for every run")
+    args = parser.parse_args()
+
+    import report_farm
+
+    print(f"{'workers':>7}{'reports':>9}{'failed':>8}{'wall s':>9}{'reports/s':>11}{'mean util':>11}")
+    for r in run(args):
+        stats = r["workers"].values()
+        utilization = sum(s["utilization"] for s in stats) / len(stats) if stats else 0.0
+        print(f"{r['worker_count']:>7}{len(r['generated']):>9}{len(r['failed']):>8}"
+              f"{r['wall_s']:>9}{r['reports_per_s']:>11}{utilization:>11.0%}")
+        if args.per_worker:
+            print(report_farm.format_worker_stats(r))
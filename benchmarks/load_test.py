@@ -0,0 +1,323 @@
+"""
+Load generator for the customer data service (app.py): find the saturation point
+and compare gunicorn workers/threads (and so Cloud Run concurrency) settings.
+
+Targets:
+  --url URL            an already running instance (Cloud Run or local)
+  --backend fake       starts gunicorn per --config on app.py + in-memory Firestore
+                       (benchmarks/fake_service.py, no GCP needed)
+  --backend emulator   starts gunicorn per --config on app.py against the Firestore
+                       emulator (FIRESTORE_EMULATOR_HOST), seeded with the same data
+
+Closed-loop clients (one thread + keep-alive session each) send a weighted mix of:
+  hit      GET  /?customer_name=<existing customer>
+  miss     GET  /?customer_name=<unknown name>          (404 expected)
+  batch    POST /batch with --batch-size customers
+  large    GET  /?customer_name=<"Large ..." document with a long purchase_history>
+  summary  GET  /?customer_name=...&view=summary
+
+Reports throughput, p50/p90/p99 latency and error rate per config and client
+concurrency, side by side (--by-kind adds the per-request-type breakdown).
+
+Usage:
+    python benchmarks/load_test.py --backend fake --concurrency 4 16 64 --duration 20 \\
+        --config "1x8=--workers 1 --threads 8" --config "2x4=--workers 2 --threads 4" \\
+        --config "1x16=--workers 1 --threads 16"
+    python benchmarks/load_test.py --url https://get-customer-data-func-....run.app --concurrency 8 --duration 30
+    python benchmarks/load_test.py --backend fake --mix hit=50,large=50 --json load.json
+"""
+import argparse
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from fakes import make_load_customers
+from run_benchmarks import percentile
+
+DEFAULT_MIX = "hit=70,miss=10,batch=10,large=5,summary=5"
+DEFAULT_CONFIG = "1x8=--workers 1 --threads 8"  # Dockerfile CMD
+EXPECTED_STATUS = {"hit": 200, "miss": 404, "batch": 200, "large": 200, "summary": 200}
+REQUEST_TIMEOUT = 30
+
+
+# --- request mix ---
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for item in spec.split(","):
+        kind, _, weight = item.partition("=")
+        if kind.strip() not in EXPECTED_STATUS:
+            raise ValueError(f"Unknown request kind '{kind}', expected one of {sorted(EXPECTED_STATUS)}")
+        mix[kind.strip()] = float(weight or 1)
+    return mix
+
+
+def discover_names(base_url: str, large_prefix: str) -> tuple:
+    """(regular, large) customer IDs from the /customers search route."""
+    def page(prefix: str) -> list:
+        response = requests.get(f"{base_url}/customers", params={"prefix": prefix, "limit": 500}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()["customers"]
+
+    large = page(large_prefix) if large_prefix else []
+    regular = [name for name in page("") if not (large_prefix and name.startswith(large_prefix))]
+    return regular, large
+
+
+class RequestFactory:
+    def __init__(self, mix: dict, regular: list, large: list, batch_size: int, seed: int):
+        if "large" in mix and not large:
+            raise ValueError("Mix has 'large' requests but no large documents were found (see --large-prefix)")
+        if set(mix) & {"hit", "batch", "summary"} and not regular:
+            raise ValueError("No customers found behind /customers")
+        self.kinds = list(mix)
+        self.weights = [mix[kind] for kind in self.kinds]
+        self.regular = regular
+        self.large = large
+        self.batch_size = batch_size
+        self.rng = random.Random(seed)
+
+    def next(self, base_url: str) -> tuple:
+        """(kind, method, url, request kwargs)"""
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind == "hit":
+            return kind, "GET", base_url, {"params": {"customer_name": self.rng.choice(self.regular)}}
+        if kind == "miss":
+            return kind, "GET", base_url, {"params": {"customer_name": f"__loadtest_missing_{self.rng.randrange(10**9)}"}}
+        if kind == "large":
+            return kind, "GET", base_url, {"params": {"customer_name": self.rng.choice(self.large)}}
+        if kind == "summary":
+            return kind, "GET", base_url, {"params": {"customer_name": self.rng.choice(self.regular), "view": "summary"}}
+        names = self.rng.sample(self.regular, min(self.batch_size, len(self.regular)))
+        return kind, "POST", f"{base_url}/batch", {"json": {"customer_names": names}}
+
+
+# --- load ---
+def _client(base_url: str, factory: RequestFactory, deadline: float, samples: list, lock: threading.Lock):
+    session = requests.Session()
+    local = []
+    while time.perf_counter() < deadline:
+        kind, method, url, kwargs = factory.next(base_url)
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=REQUEST_TIMEOUT, **kwargs)
+            status, size = response.status_code, len(response.content)
+        except requests.RequestException as e:
+            status, size = type(e).__name__, 0
+        local.append((kind, started, time.perf_counter() - started, status, size))
+    session.close()
+    with lock:
+        samples.extend(local)
+
+
+def run_load(base_url: str, concurrency: int, duration: float, warmup: float, mix: dict, regular: list,
+             large: list, batch_size: int, seed: int) -> dict:
+    samples, lock = [], threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    clients = [
+        threading.Thread(target=_client, daemon=True,
+                         args=(base_url, RequestFactory(mix, regular, large, batch_size, seed + i), deadline, samples, lock))
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    # requests still in flight at the deadline finish late; measure the window they ran in
+    measured = [s for s in samples if s[1] >= measure_from]
+    window = max(time.perf_counter() - measure_from, duration)
+    return summarize(measured, window)
+
+
+def _stats(samples: list, window: float) -> dict:
+    latencies = [s[2] for s in samples]
+    errors = {}
+    for kind, _, _, status, _ in samples:
+        if status != EXPECTED_STATUS[kind]:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    count = len(samples)
+    return {
+        "requests": count,
+        "rps": round(count / window, 1) if window else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+        "error_rate": round(sum(errors.values()) / count, 4) if count else 0.0,
+        "errors": errors,
+        "mean_bytes": round(sum(s[4] for s in samples) / count) if count else 0,
+    }
+
+
+def summarize(samples: list, window: float) -> dict:
+    by_kind = {}
+    for sample in samples:
+        by_kind.setdefault(sample[0], []).append(sample)
+    return {"total": _stats(samples, window), "by_kind": {kind: _stats(group, window) for kind, group in sorted(by_kind.items())}}
+
+
+# --- local servers ---
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def seed_emulator(customers: dict):
+    """Write the load data set into the Firestore emulator (FIRESTORE_EMULATOR_HOST)."""
+    from google.cloud import firestore
+
+    import app as data_service  # only for PROJECT_ID / DATABASE_ID
+    db = firestore.Client(project=data_service.PROJECT_ID, database=data_service.DATABASE_ID)
+    items = list(customers.items())
+    for start in range(0, len(items), 400):
+        batch = db.batch()
+        for name, doc in items[start:start + 400]:
+            batch.set(db.collection("customers").document(name), doc)
+        batch.commit()
+
+
+class LocalServer:
+    """gunicorn on a free port running app.py (fake or emulator backend); waits for /readyz."""
+
+    def __init__(self, gunicorn_args: str, backend: str, env: dict = None, ready_timeout: float = 120):
+        self.gunicorn_args = gunicorn_args
+        self.backend = backend
+        self.env = env or {}
+        self.ready_timeout = ready_timeout
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._process = None
+        self._log = None
+
+    def __enter__(self):
+        module, cwd = ("fake_service:app", BENCH_DIR) if self.backend == "fake" else ("app:app", REPO_ROOT)
+        command = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{self.port}",
+                   *shlex.split(self.gunicorn_args), module]
+        self._log = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(command, cwd=cwd, env={**os.environ, **self.env},
+                                         stdout=self._log, stderr=subprocess.STDOUT)
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                break
+            try:
+                if requests.get(f"{self.url}/readyz", timeout=5).status_code == 200:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"gunicorn ({self.gunicorn_args}) did not become ready:\n{self.log_tail()}")
+
+    def log_tail(self, lines: int = 20) -> str:
+        self._log.seek(0)
+        return "\n".join(self._log.read().decode("utf-8", errors="replace").splitlines()[-lines:])
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        if self._log and exc_type is not None:
+            print(self.log_tail())
+
+
+# --- CLI ---
+def parse_config(spec: str) -> tuple:
+    name, sep, gunicorn_args = spec.partition("=")
+    return (name, gunicorn_args) if sep else (spec, spec)
+
+
+def print_side_by_side(results: list):
+    print(f"\n{'config':<14}{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>9}")
+    for r in results:
+        t = r["total"]
+        print(f"{r['config']:<14}{r['concurrency']:>8}{t['rps']:>10}{t['p50_ms']:>10}{t['p90_ms']:>10}"
+              f"{t['p99_ms']:>10}{t['max_ms']:>10}{t['error_rate']:>9.2%}")
+
+
+def print_by_kind(results: list):
+    print(f"\n{'config':<14}{'clients':>8}  {'kind':<9}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'errors':>9}{'bytes':>10}")
+    for r in results:
+        for kind, s in r["by_kind"].items():
+            errors = f"{s['error_rate']:.2%}"
+            print(f"{r['config']:<14}{r['concurrency']:>8}  {kind:<9}{s['rps']:>9}{s['p50_ms']:>10}{s['p99_ms']:>10}"
+                  f"{errors:>9}{s['mean_bytes']:>10}" + (f"  {s['errors']}" if s["errors"] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="running data service base URL")
+    target.add_argument("--backend", choices=["fake", "emulator"], help="start local gunicorn instances per --config")
+    parser.add_argument("--config", action="append", help="NAME=gunicorn args, repeatable (default: the Dockerfile's)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="concurrent clients, one run each")
+    parser.add_argument("--duration", type=float, default=15.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each run")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="request weights, e.g. hit=80,miss=20")
+    parser.add_argument("--batch-size", type=int, default=20, help="customers per batch request")
+    parser.add_argument("--large-prefix", default="Large ", help="ID prefix of the large documents")
+    parser.add_argument("--customers", type=int, default=1000, help="local backends: regular customers")
+    parser.add_argument("--history-size", type=int, default=24, help="local backends: purchase_history per customer")
+    parser.add_argument("--large-customers", type=int, default=20, help="local backends: large documents")
+    parser.add_argument("--large-history-size", type=int, default=2000, help="local backends: purchase_history per large document")
+    parser.add_argument("--firestore-latency", type=float, default=0.005, help="fake backend: Firestore round trip in seconds")
+    parser.add_argument("--by-kind", action="store_true", help="also print the per-request-type breakdown")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write all results to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    configs = [parse_config(spec) for spec in (args.config or [DEFAULT_CONFIG])]
+    env = {
+        "LOAD_CUSTOMERS": str(args.customers), "LOAD_HISTORY_SIZE": str(args.history_size),
+        "LOAD_LARGE_CUSTOMERS": str(args.large_customers), "LOAD_LARGE_HISTORY_SIZE": str(args.large_history_size),
+        "LOAD_FIRESTORE_LATENCY": str(args.firestore_latency),
+    }
+    if args.backend == "emulator":
+        if not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+            parser.error("--backend emulator needs FIRESTORE_EMULATOR_HOST (gcloud emulators firestore start)")
+        print("Seeding the Firestore emulator...")
+        seed_emulator(make_load_customers(args.customers, args.history_size, args.large_customers, args.large_history_size))
+
+    results = []
+    for name, gunicorn_args in (configs if args.backend else [("remote", "")]):
+        server = LocalServer(gunicorn_args, args.backend, env) if args.backend else None
+        if server:
+            print(f"Starting gunicorn {gunicorn_args} ({args.backend} backend)...")
+            server.__enter__()
+        base_url = server.url if server else args.url.rstrip("/")
+        try:
+            regular, large = discover_names(base_url, args.large_prefix if "large" in mix else None)
+            for concurrency in args.concurrency:
+                print(f"[{name}] {concurrency} clients for {args.duration:.0f}s...")
+                result = run_load(base_url, concurrency, args.duration, args.warmup, mix, regular, large,
+                                  args.batch_size, args.seed)
+                results.append({"config": name, "gunicorn_args": gunicorn_args, "concurrency": concurrency, **result})
+        finally:
+            if server:
+                server.__exit__(None, None, None)
+
+    print_side_by_side(results)
+    if args.by_kind:
+        print_by_kind(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"mix": mix, "duration": args.duration, "results": results}, f, indent=2)
@@ -0,0 +1,238 @@
+"""
+Offline end-to-end benchmark: no Vertex AI, no Cloud Run.
+
+Stages measured (p50 / p95 latency and throughput):
+  * data_service             - app.py `get_customer_data` through the Flask test client,
+                               backed by an in-memory Firestore (or the emulator with --emulator)
+  * run_agent_chat           - Agent 1 tool loop with a fake genai.Client
+  * run_visualization_agent  - Agent 2: chart (speculative, or model code executed with
+                               --chart model) + HTML assembly
+  * end_to_end               - both agents for one customer
+
+Usage:
+    python benchmarks/run_benchmarks.py --customers 20 --history-size 200 --iterations 10
+    python benchmarks/run_benchmarks.py --json results.json
+    python benchmarks/run_benchmarks.py --baseline results.json --max-regression 20
+    python benchmarks/run_benchmarks.py --trace    # per-span breakdown (model calls, tool, Firestore, chart, HTML)
+    python benchmarks/run_benchmarks.py --tool-path firestore --tool-cache-ttl 60   # tool fast paths
+    python benchmarks/run_benchmarks.py --chart model --model-latency 0.2          # vs. model-written chart code
+    python benchmarks/run_benchmarks.py --tiering default --history-size 2         # tiering.py (no chart below 3 points)
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import report_render
+import tiering
+import tracing
+from fakes import FakeFirestore, FakeGenaiClient, make_customers
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class StageTimer:
+    def __init__(self):
+        self.samples = {}
+
+    @contextlib.contextmanager
+    def measure(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+
+    def summary(self) -> dict:
+        result = {}
+        for stage, samples in self.samples.items():
+            total = sum(samples)
+            result[stage] = {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "throughput_per_s": round(len(samples) / total, 2) if total else None,
+            }
+        return result
+
+
+def span_summary(spans: list) -> dict:
+    """Group finished spans by name (and model stage) into p50/p95 and token totals."""
+    groups = {}
+    for s in spans:
+        key = f"{s.name}[{s.attributes['stage']}]" if "stage" in s.attributes else s.name
+        groups.setdefault(key, []).append(s)
+    result = {}
+    for key, group in sorted(groups.items()):
+        durations = [s.duration_ms / 1000 for s in group]
+        result[key] = {
+            "count": len(group),
+            "p50_ms": round(percentile(durations, 50) * 1000, 2),
+            "p95_ms": round(percentile(durations, 95) * 1000, 2),
+            "input_tokens": sum(s.attributes.get("gen_ai.usage.input_tokens") or 0 for s in group),
+            "output_tokens": sum(s.attributes.get("gen_ai.usage.output_tokens") or 0 for s in group),
+        }
+    return result
+
+
+def load_data_service(customers: dict, use_emulator: bool, firestore_latency: float):
+    """Import app.py without touching the network and point it at the fake store."""
+    os.environ.setdefault("WARMUP_ON_START", "0")
+    if not use_emulator:
+        # the client only needs a host to skip credential lookup; it is replaced below
+        os.environ.setdefault("FIRESTORE_EMULATOR_HOST", "localhost:8681")
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    if use_emulator:
+        batch = app.db.batch()
+        for name, doc in customers.items():
+            batch.set(app.db.collection("customers").document(name), doc)
+        batch.commit()
+    else:
+        app.db = FakeFirestore(customers, latency=firestore_latency)
+        app.customer_index._db = app.db
+    return app
+
+
+def run(args) -> dict:
+    customers = make_customers(args.customers, args.history_size, args.seed)
+    names = list(customers)
+    timer = StageTimer()
+
+    service = load_data_service(customers, args.emulator, args.firestore_latency)
+    http = service.app.test_client()
+
+    def call_service(customer_name: str) -> dict:
+        with timer.measure("data_service"):
+            response = http.get("/", query_string={"customer_name": customer_name}, headers=tracing.inject())
+        return response.get_json()
+
+    import agent_app
+    import tools
+
+    # getCustomerData through the registry: the data service (HTTP path), or Firestore
+    # directly with --tool-path firestore (the fast path Streamlit / batch runs take)
+    registry = tools.ToolRegistry()
+    registered = registry.register(tools.CUSTOMER_DATA_DECLARATION, cache_ttl=args.tool_cache_ttl,
+                                   postprocess=tools.enrich_customer_data)
+    if args.tool_path == "firestore":
+        read_direct = tools.firestore_customer_data(service.db)
+
+        def call_firestore(tool_args: dict, timeout: float) -> dict:
+            with timer.measure("firestore_direct"):
+                return read_direct(tool_args, timeout)
+        registered.add_path("firestore", call_firestore)
+    registered.add_path("http", lambda tool_args, timeout: call_service(tool_args["customer_name"]))
+    agent_app.TOOLS = registry
+
+    latency = {"tool_call": args.model_latency, "report": args.model_latency * 4,
+               "chart": args.model_latency * 2, "styling": args.model_latency * 2}
+    client = FakeGenaiClient(latency=latency, seed=args.seed)
+
+    # reports are rendered into memory, nothing touches the disk
+    sink = report_render.MemorySink()
+    exporter = tracing.InMemoryExporter()
+    if args.trace:
+        tracing.set_exporter(exporter)
+
+    policy = tiering.load_policy(args.tiering)
+    started = time.perf_counter()
+    for i in range(args.iterations):
+        name = names[i % len(names)]
+        prompt = f"Generate a negotiation strategy report for {name}, focusing on profit maximization."
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.measure("end_to_end"), tracing.span("report", customer_name=name):
+                tool_results, tiers = [], []
+                charts = [] if args.chart == "speculative" else None
+                with timer.measure("run_agent_chat"):
+                    report_text = agent_app.run_agent_chat(client, prompt, tool_results, prerender=charts,
+                                                           policy=policy, tiers=tiers)
+                features = tool_results[-1].get("precomputed_features") if tool_results else None
+                with timer.measure("run_visualization_agent"):
+                    agent_app.run_visualization_agent(client, name, report_text, features, sink,
+                                                      chart=charts[-1] if charts else None,
+                                                      tier=tiers[-1] if tiers else None)
+    elapsed = time.perf_counter() - started
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "baseline")},
+        "stages": timer.summary(),
+        "reports_per_s": round(args.iterations / elapsed, 3),
+        "model_calls": client.models.calls,
+    }
+    if args.trace:
+        results["spans"] = span_summary(exporter.spans)
+    return results
+
+
+def print_summary(results: dict):
+    print(f"{'stage':<26}{'count':>7}{'p50 ms':>12}{'p95 ms':>12}{'ops/s':>10}")
+    for stage, s in results["stages"].items():
+        print(f"{stage:<26}{s['count']:>7}{s['p50_ms']:>12.2f}{s['p95_ms']:>12.2f}{s['throughput_per_s'] or 0:>10.2f}")
+    print(f"\nreports/s: {results['reports_per_s']}  model calls: {results['model_calls']}")
+    if "spans" in results:
+        print(f"\n{'span':<44}{'count':>7}{'p50 ms':>12}{'p95 ms':>12}{'in tok':>10}{'out tok':>10}")
+        for name, s in results["spans"].items():
+            print(f"{name:<44}{s['count']:>7}{s['p50_ms']:>12.2f}{s['p95_ms']:>12.2f}{s['input_tokens']:>10}{s['output_tokens']:>10}")
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """Stages whose p95 got slower than the baseline by more than max_regression percent."""
+    regressions = []
+    for stage, s in results["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if before and before["p95_ms"] and s["p95_ms"] > before["p95_ms"] * (1 + max_regression / 100):
+            regressions.append(f"{stage}: p95 {before['p95_ms']:.2f} ms -> {s['p95_ms']:.2f} ms")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=10, help="number of synthetic customers")
+    parser.add_argument("--history-size", type=int, default=24, help="purchase_history entries per customer")
+    parser.add_argument("--iterations", type=int, default=10, help="reports to generate")
+    parser.add_argument("--model-latency", type=float, default=0.0, help="base fake model latency in seconds")
+    parser.add_argument("--firestore-latency", type=float, default=0.0, help="fake Firestore read latency in seconds")
+    parser.add_argument("--emulator", action="store_true", help="use FIRESTORE_EMULATOR_HOST instead of the in-memory store")
+    parser.add_argument("--tool-path", choices=["http", "firestore"], default="http",
+                        help="getCustomerData via the data service or via Firestore directly")
+    parser.add_argument("--tool-cache-ttl", type=float, default=0.0, help="tool result cache TTL in seconds (0 = off)")
+    parser.add_argument("--chart", choices=["speculative", "model"], default="speculative",
+                        help="chart drawn from the tool result during Agent 1, or model-written code run afterwards")
+    parser.add_argument("--tiering", default="flat",
+                        help="tiering policy: 'flat' (one model, always a chart), 'default' or a policy JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", action="store_true", help="collect spans and print a per-span breakdown")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="previous --json output to compare against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="allowed p95 slowdown in percent")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_summary(results)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("\n❌ Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
@@ -0,0 +1,106 @@
+"""
+Measure first-request latency of the data service with and without warm-up.
+
+Each trial runs in a fresh Python process (so the Firestore gRPC channel is
+really cold), imports app.py, optionally calls /readyz (the startup probe), then
+times the first real customer lookup and the first /customers search. Run it
+against the Firestore emulator:
+
+    gcloud emulators firestore start --host-port=localhost:8681
+    FIRESTORE_EMULATOR_HOST=localhost:8681 python benchmarks/warmup_latency.py --customer "ACME TECH"
+
+or offline, against the in-memory Firestore of the other benchmarks (no gRPC
+channel to warm, so this measures the probe and the customer index load only):
+
+    python benchmarks/warmup_latency.py --offline 50000 --firestore-latency 0.02
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_child(customer_name: str, warm: bool, offline: int = 0, firestore_latency: float = 0.0):
+    """One trial: import the service, optionally warm it, time the first lookup and search."""
+    # service logs (including the background index load) go to stderr, stdout carries only the result
+    result_stream, sys.stdout = sys.stdout, sys.stderr
+    sys.path.insert(0, REPO_ROOT)
+    if offline:
+        from fakes import make_customers
+        from run_benchmarks import load_data_service
+
+        customers = make_customers(offline, history_size=2)
+        customer_name = next(iter(customers))
+        app = load_data_service(customers, use_emulator=False, firestore_latency=firestore_latency)
+    else:
+        import app
+
+    client = app.app.test_client()
+    warmup_ms = None
+    if warm:
+        start = time.perf_counter()
+        client.get("/readyz")
+        warmup_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    response = client.get("/", query_string={"customer_name": customer_name})
+    first_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    client.get("/customers", query_string={"prefix": customer_name[:1]})
+    search_ms = (time.perf_counter() - start) * 1000
+
+    print(json.dumps({"status": response.status_code, "first_request_ms": first_ms, "warmup_ms": warmup_ms,
+                      "first_search_ms": search_ms}), file=result_stream)
+
+
+def run_trials(customer_name: str, warm: bool, trials: int, offline: int = 0, firestore_latency: float = 0.0) -> list:
+    env = dict(os.environ, WARMUP_ON_START="0")
+    results = []
+    for _ in range(trials):
+        cmd = [sys.executable, __file__, "--child", "--customer", customer_name]
+        if offline:
+            cmd += ["--offline", str(offline), "--firestore-latency", str(firestore_latency)]
+        if warm:
+            cmd.append("--warm")
+        process = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+        results.append(json.loads(process.stdout.strip().splitlines()[-1]))
+    return results
+
+
+def summarize(label: str, results: list):
+    first = [r["first_request_ms"] for r in results]
+    search = [r["first_search_ms"] for r in results]
+    line = (f"{label:<12} first request p50={statistics.median(first):8.1f} ms  max={max(first):8.1f} ms"
+            f"  first search p50={statistics.median(search):8.1f} ms")
+    warmups = [r["warmup_ms"] for r in results if r["warmup_ms"] is not None]
+    if warmups:
+        line += f"  (/readyz p50={statistics.median(warmups):.1f} ms, off the request path)"
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customer", default="ACME TECH")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--offline", type=int, default=0, metavar="N",
+                        help="in-memory Firestore with N synthetic customers instead of the emulator")
+    parser.add_argument("--firestore-latency", type=float, default=0.0, help="offline: seconds per simulated Firestore read")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--warm", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.customer, args.warm, args.offline, args.firestore_latency)
+        sys.exit(0)
+
+    if not args.offline and not os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        print("⚠️ FIRESTORE_EMULATOR_HOST is not set, measuring against the real Firestore project.")
+
+    summarize("cold", run_trials(args.customer, False, args.trials, args.offline, args.firestore_latency))
+    summarize("warmed", run_trials(args.customer, True, args.trials, args.offline, args.firestore_latency))
@@ -0,0 +1,252 @@
+"""
+Segment comparison reports: one report comparing 20-50 accounts.
+
+  1. one bulk read (data service POST /batch -> Firestore get_all, or get_all
+     directly when a Firestore client is passed)
+  2. shared statistics computed locally (feature_store.build_rows, i.e. the
+     vectorized analytics.py features + win rate / headroom / style, plus
+     segment quartiles)
+  3. ONE model call on a compact table - one short row per account, no raw
+     purchase_history
+  4. one multi-series chart rendered locally (no generated chart code)
+
+Model calls stay at one per report whatever the segment size, and the prompt
+grows by one table row per account instead of one full document.
+
+    python comparison.py "ACME TECH" "Customer C" "Customer D"
+    python comparison.py --top 30 --by margin_headroom       # accounts from the feature store
+"""
+import argparse
+import io
+import json
+import re
+
+import numpy as np
+import requests
+from google.genai.types import Content, Part
+from matplotlib.figure import Figure
+
+import agent_app
+import analytics
+import feature_store
+import report_render
+import tracing
+import usage
+from customer_index import get_documents
+
+MAX_COMPARISON_CUSTOMERS = 50
+
+# (row key, header, format) - one compact row per account
+TABLE_COLUMNS = [
+    ("deal_count", "deals", "{:.0f}"),
+    ("last_price", "last $", "{:,.0f}"),
+    ("mean_price", "mean $", "{:,.0f}"),
+    ("target_price", "target $", "{:,.0f}"),
+    ("trend_slope_per_30d", "trend $/30d", "{:+,.0f}"),
+    ("volatility", "volatility %", "{:.1%}"),
+    ("discount_vs_target", "disc vs target %", "{:.1%}"),
+    ("margin_vs_cost", "margin %", "{:.1%}"),
+    ("margin_headroom", "headroom %", "{:.1%}"),
+    ("win_rate", "win %", "{:.0%}"),
+    ("baseline_predicted_price", "predicted $", "{:,.0f}"),
+]
+
+COMPARISON_PROMPT = """
+You are a professional Sales Negotiation Strategy Expert. Write the report entirely IN ENGLISH.
+Compare the following segment of {count} accounts and produce ONE comparison report.
+The negotiation purpose is: {purpose}.
+
+The table has one row per account, followed by segment quartile rows (p25 / median / p75).
+All figures are precomputed; use them as given, do not recompute.
+'disc vs target' = how far the last price is below target, 'headroom' = (target - last price) / last price.
+
+**Requirements:**
+1.  Rank the accounts by negotiation opportunity and name the top and bottom 5 with reasons.
+2.  Group accounts that need the same strategy (e.g. by style category and price trend) and give one strategy per group.
+3.  Call out outliers against the segment median.
+4.  Respond ONLY with an HTML block wrapped in a single `<div>` with class "report-content". Use `<ul>`/`<li>`, `<strong>`,
+    a `<table>` for rankings, and `<mark>` for key numbers. Do not add "```html" or any explanatory text.
+{missing_note}
+**Segment Table:**
+---
+{table}
+---
+"""
+
+
+# --- data ---
+def fetch_customers(names: list, db_client=None, service_url: str = agent_app.CUSTOMER_DATA_SERVICE_URL) -> tuple:
+    """
+    Returns ({customer_name: document}, missing names) from one bulk read.
+    Reads Firestore get_all through db_client when given (the caller's project), the
+    data service /batch route (PROJECT_ID only) otherwise or when that read fails.
+    """
+    if db_client is not None:
+        try:
+            snapshots = {snapshot.id: snapshot for snapshot in get_documents(db_client, names) if snapshot.exists}
+            # timestamps -> strings, as they would arrive from /batch
+            return ({name: json.loads(json.dumps(snapshots[name].to_dict(), default=str))
+                     for name in names if name in snapshots},
+                    [name for name in names if name not in snapshots])
+        except Exception as e:
+            print(f"Firestore get_all failed, using the batch route: {e}")
+
+    response = requests.post(f"{service_url}/batch", json={"customer_names": names},
+                             timeout=30, headers=tracing.inject())
+    response.raise_for_status()
+    data = response.json()
+    return data["customers"], data["missing"]
+
+
+def segment_rows(docs: dict) -> list:
+    """Per-account feature rows (one vectorized pass) as flat dicts."""
+    rows = feature_store.build_rows(list(docs), list(docs.values()))
+    result = []
+    for row in rows:
+        summary = feature_store.row_to_dict(row)
+        result.append({**summary.pop("features"), **summary})
+    return result
+
+
+def segment_quartiles(rows: list) -> dict:
+    """{'p25' | 'median' | 'p75': {column: value}} over the accounts (NaN-aware)."""
+    quartiles = {"p25": {}, "median": {}, "p75": {}}
+    for key, _, _ in TABLE_COLUMNS:
+        values = np.array([row[key] if row[key] is not None else np.nan for row in rows], dtype=np.float64)
+        if np.isnan(values).all():
+            continue
+        for label, q in (("p25", 25), ("median", 50), ("p75", 75)):
+            quartiles[label][key] = float(np.nanpercentile(values, q))
+    return quartiles
+
+
+def _cell(value, fmt: str) -> str:
+    return "-" if value is None else fmt.format(value)
+
+
+def build_table(rows: list) -> str:
+    """Pipe-separated table: accounts, then segment quartiles."""
+    lines = [" | ".join(["account"] + [header for _, header, _ in TABLE_COLUMNS] + ["style"])]
+    for row in rows:
+        cells = [_cell(row.get(key), fmt) for key, _, fmt in TABLE_COLUMNS]
+        lines.append(" | ".join([row["customer_name"]] + cells + [row["style_category"]]))
+    for label, values in segment_quartiles(rows).items():
+        cells = [_cell(values.get(key), fmt) for key, _, fmt in TABLE_COLUMNS]
+        lines.append(" | ".join([f"[segment {label}]"] + cells + ["-"]))
+    return "\n".join(lines)
+
+
+# --- chart ---
+def render_comparison_chart(docs: dict) -> bytes:
+    """
+    One line per account: price achieved as a share of that account's target
+    price (mean price when no target), so accounts of any size share one axis.
+    Object-oriented Figure, no pyplot state, rendered straight to PNG bytes.
+    """
+    cols = analytics.PurchaseHistoryColumns.from_docs(list(docs.values()), list(docs))
+    fig = Figure(figsize=(12, 6))
+    ax = fig.add_subplot()
+    dates = (cols.days * 86400).astype("datetime64[s]")
+    for i, name in enumerate(cols.names):
+        start, end = cols.offsets[i], cols.offsets[i + 1]
+        if start == end:
+            continue
+        prices = cols.prices[start:end]
+        reference = cols.target[i] if cols.target[i] > 0 else prices.mean()
+        ax.plot(dates[start:end], prices / reference * 100, marker="o", markersize=2, linewidth=1, label=name)
+    ax.axhline(100, linestyle="--", color="green", label="Target Price")
+    ax.set_title(f"Price Achieved vs Target ({len(cols)} accounts)")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("% of target price")
+    ax.legend(loc="upper left", bbox_to_anchor=(1.01, 1), fontsize="x-small", ncol=1 if len(cols) <= 25 else 2)
+    fig.tight_layout()
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100)
+    return buffer.getvalue()
+
+
+# --- report ---
+@tracing.traced("comparison.run")
+def run_comparison_report(client, names: list, purpose: str = "Focus on maximizing profit margin",
+                          db_client=None, sink=None, label: str = None) -> str:
+    """Comparison report for up to MAX_COMPARISON_CUSTOMERS accounts; returns the report location."""
+    names = list(dict.fromkeys(names))
+    if not names or len(names) > MAX_COMPARISON_CUSTOMERS:
+        raise ValueError(f"Comparison needs 1 to {MAX_COMPARISON_CUSTOMERS} customers, got {len(names)}")
+    print(f"\n[Comparison: {len(names)} accounts (Model: {agent_app.MODEL_NAME})]")
+
+    with tracing.span("tool.call", tool="getCustomerBatch", batch_size=len(names)):
+        docs, missing = fetch_customers(names, db_client)
+    if missing:
+        print(f"⚠️ Not found: {', '.join(missing)}")
+    if not docs:
+        raise ValueError("None of the requested customers were found")
+
+    rows = segment_rows(docs)
+    table = build_table(rows)
+    prompt = COMPARISON_PROMPT.format(
+        count=len(rows), purpose=purpose, table=table,
+        missing_note=f"Not found (mention briefly): {', '.join(missing)}\n" if missing else "",
+    )
+
+    report_html = f"<div class='report-content'><pre>{table}</pre></div>"  # 默认值，以防出错
+    try:
+        with tracing.span("model.generate_content", stage="comparison.report") as model_span:
+            response = client.models.generate_content(
+                model=agent_app.MODEL_NAME,
+                contents=[Content(role="user", parts=[Part(text=prompt)])],
+                config={'temperature': 0.2},
+            )
+            usage.record(model_span, response, agent_app.MODEL_NAME,
+                         usage.prompt_sections(prompt, customer_table=table, purpose=purpose))
+        report_html = re.sub(r"^```(?:html)?\s*|\s*```$", "", response.text.strip())
+        print("\n✅ Comparison report generated")
+    except Exception as e:
+        print(f"\n❌ Comparison report failed, falling back to the table: {e}")
+
+    chart_png = None
+    try:
+        with tracing.span("chart.execute", mode="local"):
+            chart_png = render_comparison_chart(docs)
+    except Exception as e:
+        print(f"\n❌ Comparison chart failed: {e}")
+
+    label = label or f"Segment Comparison ({len(docs)} accounts)"
+    html_content, assets = report_render.render_html(label, report_html, chart_png)
+    location = report_render.publish(sink or report_render.DirectorySink("."), label, html_content, assets)
+    print(f"\n🎉 Successfully Generated Report: {location}")
+    return location
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("customers", nargs="*", help="customer names to compare")
+    parser.add_argument("--top", type=int, help="compare the top N accounts from the feature store instead")
+    parser.add_argument("--by", default="margin_headroom", choices=sorted(feature_store.SORTABLE_COLUMNS))
+    parser.add_argument("--style", help="with --top: only this style category")
+    parser.add_argument("--purpose", default="Focus on maximizing profit margin")
+    parser.add_argument("--out-dir", default=".")
+    args = parser.parse_args()
+
+    names = args.customers
+    if args.top:
+        names = [row["customer_name"] for row in feature_store.FeatureStore().top(args.by, args.top, args.style)]
+    if not names:
+        parser.error("give customer names or --top N")
+
+    import google.auth
+    from google import genai
+
+    try:
+        credentials, project = google.auth.default()
+        genai_client = genai.Client(vertexai=True, project=agent_app.PROJECT_ID, location=agent_app.REGION, credentials=credentials)
+        print("--- Gemini Client Initialized ---")
+    except Exception as e:
+        print("\n--- Fail Authorization：Please check gcloud auth application-default login ---")
+        print(f"Error: {e}")
+        exit(1)
+
+    with tracing.span("report", customer_count=len(names)), usage.collect(f"comparison of {len(names)}") as ledger:
+        run_comparison_report(genai_client, names, args.purpose, sink=report_render.DirectorySink(args.out_dir))
+    print(usage.format_report(ledger.to_dict()))
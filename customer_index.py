@@ -0,0 +1,125 @@
+"""
+ID-only index of the Firestore 'customers' collection.
+
+Only document IDs are pulled (keys-only projection, paged by document ID) and
+kept in a sorted list, so prefix search is two bisects and pagination is a
+cursor on the last returned ID. Shared by the data service (/customers route)
+and the Streamlit sidebar.
+"""
+import bisect
+import threading
+import time
+
+from google.cloud.firestore_v1.field_path import FieldPath
+
+DOCUMENT_ID = FieldPath.document_id()  # "__name__", for keys-only projections
+PAGE_SIZE = 1000
+DEFAULT_TTL = 600  # seconds, same as the old get_customer_list cache
+
+
+def iter_document_pages(collection_ref, page_size: int = PAGE_SIZE, keys_only: bool = False):
+    """Yield lists of snapshots in document-ID order, cursoring on the last snapshot of each page."""
+    base_query = collection_ref.order_by(DOCUMENT_ID).limit(page_size)
+    if keys_only:
+        base_query = base_query.select([DOCUMENT_ID])
+    last_snapshot = None
+    while True:
+        query = base_query.start_after(last_snapshot) if last_snapshot else base_query
+        page = list(query.stream())
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_snapshot = page[-1]
+
+
+def get_documents(db_client, names: list, collection: str = "customers", field_paths: list = None) -> list:
+    """
+    Bulk read: one batched `get_all` round trip for many IDs, snapshots in request order.
+    field_paths=[] reads metadata only (exists, update_time), no document fields.
+    """
+    collection_ref = db_client.collection(collection)
+    refs = [collection_ref.document(name) for name in names]
+    # get_all streams back in arbitrary order
+    snapshots = {snapshot.id: snapshot for snapshot in db_client.get_all(refs, field_paths=field_paths)}
+    return [snapshots[name] for name in names if name in snapshots]
+
+
+class CustomerIndex:
+    def __init__(self, db_client, collection: str = "customers", ttl: int = DEFAULT_TTL):
+        self._db = db_client
+        self._collection = collection
+        self._ttl = ttl
+        self._ids = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        self.refresh_count = 0
+
+    # --- loading ---
+    def _scan_ids(self):
+        """Yield document IDs page by page using a keys-only query."""
+        for page in iter_document_pages(self._db.collection(self._collection), keys_only=True):
+            for snapshot in page:
+                yield snapshot.id
+
+    def refresh(self):
+        """Full keys-only rescan. IDs arrive already sorted, no sort needed."""
+        ids = list(self._scan_ids())
+        with self._lock:
+            self._ids = ids
+            self._refreshed_at = time.monotonic()
+            self.refresh_count += 1
+        return len(ids)
+
+    def _is_stale(self) -> bool:
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at > self._ttl
+
+    def refresh_if_stale(self):
+        # one thread rescans, concurrent callers keep serving the previous list
+        if self._is_stale() and self._refresh_lock.acquire(blocking=self._refreshed_at is None):
+            try:
+                if self._is_stale():
+                    self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+    # --- incremental updates (e.g. the data service saw a hit/miss) ---
+    def add(self, customer_name: str):
+        with self._lock:
+            pos = bisect.bisect_left(self._ids, customer_name)
+            if pos == len(self._ids) or self._ids[pos] != customer_name:
+                self._ids.insert(pos, customer_name)
+
+    def discard(self, customer_name: str):
+        with self._lock:
+            pos = bisect.bisect_left(self._ids, customer_name)
+            if pos < len(self._ids) and self._ids[pos] == customer_name:
+                del self._ids[pos]
+
+    # --- queries ---
+    def search(self, prefix: str = "", limit: int = 50, page_token: str = None) -> dict:
+        """
+        Prefix match with cursor pagination.
+        Returns {"customers": [...], "next_page_token": <last id or None>, "total": <matches>}.
+        """
+        self.refresh_if_stale()
+        with self._lock:
+            ids = self._ids
+            lo = bisect.bisect_left(ids, prefix)
+            # U+FFFF sorts after any character that can follow the prefix
+            hi = bisect.bisect_left(ids, prefix + "\uffff", lo) if prefix else len(ids)
+            start = bisect.bisect_right(ids, page_token, lo, hi) if page_token else lo
+            page = ids[start:min(start + limit, hi)]
+        next_token = page[-1] if page and start + limit < hi else None
+        return {"customers": page, "next_page_token": next_token, "total": hi - lo}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._ids),
+            "refresh_count": self.refresh_count,
+            "age_seconds": None if self._refreshed_at is None else round(time.monotonic() - self._refreshed_at, 1),
+        }
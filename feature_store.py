@@ -0,0 +1,248 @@
+"""
+Portfolio-wide negotiation feature store.
+
+An offline job scans the Firestore 'customers' collection, computes per-customer
+aggregates (deal count, average/last price, win rate, margin headroom, style
+category, plus the analytics.py price features) and writes them to a local
+SQLite file keyed by customer name. Readers (the data service `?view=summary`,
+the agents, dashboards, batch prioritization) then do a primary-key lookup
+instead of re-reading and re-deriving the raw document.
+
+    python feature_store.py build                 # -> customer_features.db
+    python feature_store.py show "ACME TECH"
+    python feature_store.py top --by margin_headroom --limit 20
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import analytics
+from customer_index import iter_document_pages
+
+PROJECT_ID = "eighth-pen-476811-f3"
+DATABASE_ID = "customers"
+FEATURE_STORE_PATH = os.environ.get("FEATURE_STORE_PATH", "customer_features.db")
+BUILD_PAGE_SIZE = 500
+
+WON_OUTCOMES = {"won", "win", "closed won", "closed-won", "success", "successful", "accepted"}
+LOST_OUTCOMES = {"lost", "loss", "closed lost", "closed-lost", "failed", "rejected"}
+OUTCOME_KEYS = ("outcome", "deal_status", "status", "result")
+
+# keyword -> category, first match wins
+STYLE_CATEGORIES = [
+    ("aggressive", ("aggress", "tough", "hard", "competitive")),
+    ("price-sensitive", ("price", "cost", "budget", "discount")),
+    ("collaborative", ("collabor", "relationship", "partner", "loyal", "win-win")),
+    ("analytical", ("analyt", "data", "detail", "technical")),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customer_features (
+    customer_name      TEXT PRIMARY KEY,
+    deal_count         INTEGER,
+    mean_price         REAL,
+    last_price         REAL,
+    win_rate           REAL,   -- won / (won + lost) over purchase_history entries with an outcome
+    margin_headroom    REAL,   -- (target - last price) / last price: how far the next deal can be pushed
+    style_category     TEXT,
+    features_json      TEXT,   -- full analytics.compute_features output
+    source_update_time TEXT,   -- Firestore update_time of the source document
+    built_at           REAL
+);
+CREATE INDEX IF NOT EXISTS idx_customer_features_style ON customer_features (style_category);
+"""
+
+COLUMNS = ["customer_name", "deal_count", "mean_price", "last_price", "win_rate", "margin_headroom",
+           "style_category", "features_json", "source_update_time", "built_at"]
+SORTABLE_COLUMNS = {"deal_count", "mean_price", "last_price", "win_rate", "margin_headroom"}
+
+
+# --- aggregates ---
+def win_rate(doc: dict) -> float:
+    won = lost = 0
+    for entry in doc.get("purchase_history") or []:
+        if not isinstance(entry, dict):
+            continue
+        outcome = next((str(entry[k]).strip().lower() for k in OUTCOME_KEYS if entry.get(k) is not None), None)
+        if outcome in WON_OUTCOMES:
+            won += 1
+        elif outcome in LOST_OUTCOMES:
+            lost += 1
+    return round(won / (won + lost), 4) if won + lost else None
+
+
+def style_category(doc: dict) -> str:
+    style = str(doc.get("negotiation_style") or "").lower()
+    if not style:
+        return "unknown"
+    for category, keywords in STYLE_CATEGORIES:
+        if any(keyword in style for keyword in keywords):
+            return category
+    return "other"
+
+
+def build_rows(names: list, docs: list, update_times: list = None) -> list:
+    """Feature-store rows for a batch of documents (price features in one vectorized pass)."""
+    features = analytics.compute_features_batch(docs, names)
+    now = time.time()
+    rows = []
+    for i, (name, doc, f) in enumerate(zip(names, docs, features)):
+        headroom = None
+        if f["target_price"] is not None and f["last_price"]:
+            headroom = round((f["target_price"] - f["last_price"]) / f["last_price"], 4)
+        rows.append((
+            name, f["deal_count"], f["mean_price"], f["last_price"], win_rate(doc), headroom,
+            style_category(doc), json.dumps(f),
+            str(update_times[i]) if update_times and update_times[i] is not None else None, now,
+        ))
+    return rows
+
+
+def row_to_dict(row: tuple) -> dict:
+    result = dict(zip(COLUMNS, row))
+    result["features"] = json.loads(result.pop("features_json") or "{}")
+    return result
+
+
+# --- store ---
+class FeatureStore:
+    def __init__(self, path: str = FEATURE_STORE_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def upsert(self, rows: list):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO customer_features ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows
+            )
+
+    def prune(self, keep: set) -> int:
+        """Delete rows for customers not in `keep` (documents removed from the collection)."""
+        with self._lock, self._conn:
+            stale = [(name,) for (name,) in self._conn.execute("SELECT customer_name FROM customer_features")
+                     if name not in keep]
+            self._conn.executemany("DELETE FROM customer_features WHERE customer_name = ?", stale)
+        return len(stale)
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        return row_to_dict(tuple(row[column] for column in COLUMNS))
+
+    def get(self, customer_name: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM customer_features WHERE customer_name = ?", (customer_name,)
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def top(self, by: str = "margin_headroom", limit: int = 20, style: str = None) -> list:
+        """Highest-first ranking for batch prioritization."""
+        if by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot rank by '{by}', choose one of {sorted(SORTABLE_COLUMNS)}")
+        query = "SELECT * FROM customer_features"
+        params = []
+        if style:
+            query += " WHERE style_category = ?"
+            params.append(style)
+        query += f" ORDER BY {by} IS NULL, {by} DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return [self._to_dict(row) for row in self._conn.execute(query, params).fetchall()]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM customer_features").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+def build(db_client, path: str = FEATURE_STORE_PATH, collection: str = "customers") -> int:
+    """
+    Offline job: full scan of the collection into the store, one page at a time.
+    Rows for customers no longer in the collection are deleted once the scan completes.
+    """
+    store = FeatureStore(path)
+    seen = set()
+    try:
+        for page in iter_document_pages(db_client.collection(collection), page_size=BUILD_PAGE_SIZE):
+            names = [snapshot.id for snapshot in page]
+            docs = [snapshot.to_dict() or {} for snapshot in page]
+            store.upsert(build_rows(names, docs, [getattr(snapshot, "update_time", None) for snapshot in page]))
+            seen.update(names)
+            print(f"[Feature store: {len(seen)} customers processed]")
+        removed = store.prune(seen)
+        if removed:
+            print(f"[Feature store: {removed} removed customers deleted]")
+    finally:
+        store.close()
+    return len(seen)
+
+
+# --- readers (data service / agents) ---
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_store():
+    """The store at FEATURE_STORE_PATH, or None when the offline job has not been run."""
+    global _default_store
+    if _default_store is None and os.path.exists(FEATURE_STORE_PATH):
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = FeatureStore(FEATURE_STORE_PATH)
+    return _default_store
+
+
+def lookup(customer_name: str) -> dict:
+    store = get_default_store()
+    if store is None or not customer_name:
+        return None
+    try:
+        return store.get(customer_name)
+    except sqlite3.Error as e:
+        print(f"Feature store lookup failed: {e}")
+        return None
+
+
+def attach_summary(payload: dict, customer_name: str) -> dict:
+    """Add the precomputed `portfolio_summary` to a getCustomerData tool result when available."""
+    if isinstance(payload, dict) and "error" not in payload:
+        summary = lookup(customer_name)
+        if summary:
+            payload["portfolio_summary"] = summary
+    return payload
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the customer feature store")
+    parser.add_argument("--path", default=FEATURE_STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="scan Firestore 'customers' and rebuild the store")
+    show = sub.add_parser("show", help="print one customer's features")
+    show.add_argument("customer_name")
+    top = sub.add_parser("top", help="rank customers for prioritization")
+    top.add_argument("--by", default="margin_headroom", choices=sorted(SORTABLE_COLUMNS))
+    top.add_argument("--limit", type=int, default=20)
+    top.add_argument("--style")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from google.cloud import firestore
+
+        client = firestore.Client(project=PROJECT_ID, database=DATABASE_ID)
+        started = time.perf_counter()
+        count = build(client, args.path)
+        print(f"\n🎉 Feature store built: {count} customers -> {args.path} ({time.perf_counter() - started:.1f}s)")
+    elif args.command == "show":
+        print(json.dumps(FeatureStore(args.path).get(args.customer_name), indent=2))
+    else:
+        for row in FeatureStore(args.path).top(args.by, args.limit, args.style):
+            print(f"{row['customer_name']:<40}{row[args.by] if row[args.by] is not None else '-':>14}  {row['style_category']}")
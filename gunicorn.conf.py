@@ -0,0 +1,22 @@
+"""
+gunicorn settings shared by every deployment (loaded automatically from the working directory).
+Workers / threads stay on the command line (Dockerfile CMD, benchmarks/load_test.py --config).
+"""
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # samples from a previous run would be added to this one
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    # drop the in-flight / index gauges of a worker that exited (livesum)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
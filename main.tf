@@ -42,6 +42,22 @@ resource "google_cloud_run_v2_service" "get_customer_data_func" {
       ports {
         container_port = 8080
       }
+
+      # /readyz: no traffic is routed to the instance until Firestore is reachable
+      startup_probe {
+        http_get {
+          path = "/readyz"
+        }
+        period_seconds    = 2
+        failure_threshold = 15
+      }
+
+      liveness_probe {
+        http_get {
+          path = "/healthz"
+        }
+        period_seconds = 30
+      }
     }
   }
 
@@ -0,0 +1,325 @@
+"""
+Multi-process report farm for very large batch runs.
+
+batch_reports.py generates one report at a time in one process, where HTML
+assembly, base64 encoding and chart rendering share one GIL. The farm runs one
+process per worker instead, each with its own warmed GenAI client, Firestore
+client, tool registry and matplotlib state. The coordinator:
+
+  * plans the run exactly like batch_reports.py (same manifest, fingerprints and
+    --changed-only logic, so both tools can be mixed)
+  * hands out customers one at a time from a single shared queue, so a worker
+    that finishes early simply gets the next customer (slow customers never hold
+    up a pre-assigned shard)
+  * records every finished report in the manifest and in a checkpoint file, so a
+    crashed run continues with --resume; a worker process that dies has its
+    in-flight report requeued and is restarted (up to MAX_RESTARTS times)
+  * keeps per-worker stats: reports, failures, busy time, utilization, reports/s
+
+Worker output goes to <out-dir>/farm_logs/worker-N.log.
+
+    python report_farm.py --workers 4 --out-dir reports
+    python report_farm.py --workers 8 --out-dir reports --changed-only --stats-json farm_stats.json
+    python report_farm.py --workers 4 --out-dir reports --resume        # after a crash
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from collections import Counter, deque, namedtuple
+
+import agent_app
+import batch_reports
+import report_render
+import speculative_chart
+import tiering
+import tools
+import usage
+from customer_index import DOCUMENT_ID
+
+CHECKPOINT_FILE = "farm_checkpoint.json"
+LOG_DIR = "farm_logs"
+MAX_RESTARTS = 3
+POLL_INTERVAL = 1.0
+
+FarmConfig = namedtuple("FarmConfig", ["out_dir", "asset_mode", "client_factory", "db_factory", "service_url", "policy"])
+
+
+# --- clients (module level, so spawned workers can unpickle them) ---
+def default_genai_client():
+    import google.auth
+    from google import genai
+
+    credentials, project = google.auth.default()
+    return genai.Client(vertexai=True, project=agent_app.PROJECT_ID, location=agent_app.REGION, credentials=credentials)
+
+
+def default_db_client():
+    import google.auth
+    from google.cloud import firestore
+
+    credentials, project = google.auth.default()
+    return firestore.Client(project=agent_app.PROJECT_ID, database=batch_reports.DATABASE_ID, credentials=credentials)
+
+
+# --- worker process ---
+def _warm_up(db_client):
+    """First Firestore round trip and matplotlib font loading, before the first real report."""
+    with contextlib.suppress(Exception):
+        list(db_client.collection("customers").select([DOCUMENT_ID]).limit(1).stream())
+    speculative_chart.build_base_figure({
+        "customer_name": "warm-up", "current_target_price": 1.0, "current_cost_price": 0.5,
+        "purchase_history": [{"date": "2024-01-01", "price_achieved": 1.0}],
+    })
+
+
+def _worker_main(worker_id: int, config: FarmConfig, inbox, outbox):
+    log_path = os.path.join(config.out_dir, LOG_DIR, f"worker-{worker_id}.log")
+    sys.stdout = open(log_path, "a", encoding="utf-8", buffering=1)
+    sys.stderr = sys.stdout
+    try:
+        started = time.perf_counter()
+        client = config.client_factory()
+        db_client = config.db_factory()
+        registry = tools.customer_data_registry(db_client, config.service_url)
+        sink = report_render.DirectorySink(config.out_dir)
+        _warm_up(db_client)
+    except Exception as e:
+        outbox.put(("init_failed", worker_id, repr(e)))
+        return
+    outbox.put(("ready", worker_id, time.perf_counter() - started))
+
+    while True:
+        name = inbox.get()
+        if name is None:
+            break
+        print(f"\n[Farm worker {worker_id}: {name}]")
+        started = time.perf_counter()
+        location, error, tiers = None, None, []
+        with usage.collect(name) as ledger:
+            try:
+                location = batch_reports.generate_report(client, name, sink, config.asset_mode, registry, config.policy, tiers)
+            except Exception as e:
+                print(f"\n❌ Report for {name} failed: {e!r}")
+                error = repr(e)
+        outbox.put(("done", worker_id, {"customer_name": name, "report_file": location, "error": error,
+                                        "seconds": round(time.perf_counter() - started, 2), "usage": ledger.to_dict(),
+                                        "tier": tiers[-1].tier if tiers else None}))
+
+
+# --- coordinator ---
+def _new_stats() -> dict:
+    return {"reports": 0, "failed": 0, "busy_s": 0.0, "warmup_s": None, "restarts": 0}
+
+
+def run_farm(db_client, workers: int = None, out_dir: str = "reports", changed_only: bool = False,
+             customers: list = None, updated_field: str = None, resume: bool = False, asset_mode: str = "inline",
+             client_factory=default_genai_client, db_factory=default_db_client,
+             service_url: str = agent_app.CUSTOMER_DATA_SERVICE_URL, policy: tiering.TieringPolicy = None) -> dict:
+    """
+    Generate reports on `workers` processes. db_client is the coordinator's own client
+    (planning only); client_factory / db_factory build each worker's clients.
+    policy: tiering.TieringPolicy for planning and every worker (default: tiering.ACTIVE_POLICY)
+    """
+    policy = policy or tiering.ACTIVE_POLICY
+    workers = workers or os.cpu_count() or 2
+    os.makedirs(os.path.join(out_dir, LOG_DIR), exist_ok=True)
+    manifest_path = os.path.join(out_dir, batch_reports.MANIFEST_FILE)
+    checkpoint_path = os.path.join(out_dir, CHECKPOINT_FILE)
+    manifest = batch_reports.load_manifest(manifest_path)
+
+    skipped, removed = [], []
+    if resume and os.path.exists(checkpoint_path):
+        checkpoint = batch_reports.load_manifest(checkpoint_path)
+        print(f"[Farm: resuming run from {checkpoint['run_started']}, {len(checkpoint['done'])} already done]")
+    else:
+        to_generate, skipped, removed = batch_reports.plan_run(db_client, manifest, changed_only, customers, updated_field,
+                                                               policy=policy)
+        for name in removed:
+            manifest["customers"].pop(name, None)
+        batch_reports.save_manifest(manifest_path, manifest)
+        checkpoint = {"run_started": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                      "plan": {name: fingerprint for name, fingerprint, _ in to_generate}, "done": [], "failed": []}
+        batch_reports.save_manifest(checkpoint_path, checkpoint)
+
+    done = set(checkpoint["done"])
+    pending = [name for name in checkpoint["plan"] if name not in done]
+    checkpoint["failed"] = []
+    workers = max(min(workers, len(pending)), 1)
+    print(f"[Farm: {len(pending)} to generate on {workers} workers, {len(skipped)} unchanged, {len(removed)} removed]")
+
+    config = FarmConfig(out_dir, asset_mode, client_factory, db_factory, service_url, policy)
+    # spawn, not fork: the coordinator holds gRPC (Firestore) channels, which do not survive a fork
+    context = multiprocessing.get_context("spawn")
+    outbox = context.Queue()
+    waiting = deque(pending)  # shared by all workers; a dead worker's report goes back to the front
+    processes, inboxes, in_flight, idle = {}, {}, {}, set()
+    stats = {worker_id: _new_stats() for worker_id in range(workers)}
+    usage_reports, generated, failed, tier_counts = [], [], [], Counter()
+
+    def start_worker(worker_id: int):
+        inboxes[worker_id] = context.Queue()
+        processes[worker_id] = context.Process(target=_worker_main, args=(worker_id, config, inboxes[worker_id], outbox),
+                                               name=f"report-farm-{worker_id}", daemon=True)
+        processes[worker_id].start()
+
+    def dispatch(worker_id: int):
+        if not waiting:
+            idle.add(worker_id)
+            return
+        name = waiting.popleft()
+        idle.discard(worker_id)
+        in_flight[worker_id] = (name, time.perf_counter())
+        inboxes[worker_id].put(name)
+
+    def record(worker_id: int, result: dict):
+        name = result["customer_name"]
+        stats[worker_id]["busy_s"] += result["seconds"]
+        usage_reports.append(result["usage"])
+        tier_counts[result["tier"]] += 1
+        if result["report_file"] is None:
+            stats[worker_id]["failed"] += 1
+            failed.append(name)
+            checkpoint["failed"].append(name)
+            print(f"[Farm: ❌ {name} failed on worker {worker_id}: {result['error'] or 'no report'}]")
+        else:
+            stats[worker_id]["reports"] += 1
+            generated.append(name)
+            checkpoint["done"].append(name)
+            report_usage = result["usage"]
+            manifest["customers"][name] = {
+                **checkpoint["plan"][name], "report_file": result["report_file"], "generated_at": time.time(),
+                "seconds": result["seconds"], "worker": worker_id, "tier": result["tier"],
+                "usage": {key: report_usage[key] for key in
+                          ("model_calls", "input_tokens", "output_tokens", "thoughts_tokens", "cost_usd")},
+            }
+            batch_reports.save_manifest(manifest_path, manifest)
+            print(f"[Farm: {len(generated) + len(failed)}/{len(pending)}] {name} on worker {worker_id} in {result['seconds']} s")
+        batch_reports.save_manifest(checkpoint_path, checkpoint)  # checkpoint after every report
+
+    def handle(kind: str, worker_id: int, payload):
+        if kind == "ready":
+            stats[worker_id]["warmup_s"] = round(payload, 2)
+            dispatch(worker_id)
+        elif kind == "done":
+            in_flight.pop(worker_id, None)
+            record(worker_id, payload)
+            dispatch(worker_id)
+        elif kind == "init_failed":
+            print(f"[Farm: worker {worker_id} could not start: {payload}]")
+            stats[worker_id]["restarts"] = MAX_RESTARTS
+
+    def drain_outbox():
+        while True:
+            try:
+                message = outbox.get_nowait()
+            except queue.Empty:
+                return
+            handle(*message)
+
+    def check_workers():
+        dead = [worker_id for worker_id, process in processes.items() if not process.is_alive()]
+        if dead:
+            # a worker can send "done" and exit before the loop reads it; its message is already
+            # in the queue, so take it first, or the finished report is requeued and counted twice
+            drain_outbox()
+        for worker_id in dead:
+            process = processes.pop(worker_id)
+            if worker_id in in_flight:
+                name, _ = in_flight.pop(worker_id)
+                waiting.appendleft(name)
+                print(f"[Farm: worker {worker_id} died (exit code {process.exitcode}), {name} requeued]")
+            if stats[worker_id]["restarts"] < MAX_RESTARTS:
+                stats[worker_id]["restarts"] += 1
+                start_worker(worker_id)
+            else:
+                print(f"[Farm: worker {worker_id} gave up after {MAX_RESTARTS} restarts]")
+                idle.discard(worker_id)
+
+    started = time.perf_counter()
+    for worker_id in range(workers if pending else 0):
+        start_worker(worker_id)
+    try:
+        while processes and (in_flight or waiting):
+            try:
+                handle(*outbox.get(timeout=POLL_INTERVAL))
+            except queue.Empty:
+                pass
+            # every iteration, not only when the outbox is quiet: busy workers must not hide a dead one
+            check_workers()
+            # requeued work (a dead worker's report) may be waiting while others sit idle
+            for worker_id in list(idle):
+                if waiting and worker_id in processes:
+                    dispatch(worker_id)
+    finally:
+        for worker_id, process in processes.items():
+            inboxes[worker_id].put(None)
+        for process in processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+    wall = time.perf_counter() - started
+
+    unfinished = len(waiting) + len(in_flight)
+    if not failed and not unfinished:
+        manifest["last_run"] = checkpoint["run_started"]
+        batch_reports.save_manifest(manifest_path, manifest)
+        os.remove(checkpoint_path)
+    for worker_stats in stats.values():
+        worker_stats["busy_s"] = round(worker_stats["busy_s"], 2)
+        worker_stats["reports_per_s"] = round(worker_stats["reports"] / wall, 3) if wall else 0.0
+        worker_stats["utilization"] = round(worker_stats["busy_s"] / wall, 3) if wall else 0.0
+    return {"generated": generated, "skipped": skipped, "removed": removed, "failed": failed,
+            "unfinished": unfinished, "wall_s": round(wall, 2), "reports_per_s": round(len(generated) / wall, 3) if wall else 0.0,
+            "workers": stats, "tiers": dict(tier_counts), "usage": usage.summarize_batch(usage_reports)}
+
+
+def format_worker_stats(summary: dict) -> str:
+    lines = [f"{'worker':>6}{'reports':>9}{'failed':>8}{'busy s':>9}{'util':>7}{'rep/s':>8}{'warmup s':>10}{'restarts':>10}"]
+    for worker_id, s in sorted(summary["workers"].items()):
+        lines.append(f"{worker_id:>6}{s['reports']:>9}{s['failed']:>8}{s['busy_s']:>9}"
+                     f"{s['utilization']:>7.0%}{s['reports_per_s']:>8}{s['warmup_s'] if s['warmup_s'] is not None else '-':>10}"
+                     f"{s['restarts']:>10}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: CPU count)")
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--changed-only", action="store_true", help="regenerate only changed customers")
+    parser.add_argument("--customers", nargs="*", help="limit the run to these customers")
+    parser.add_argument("--updated-field", help="document timestamp field to query instead of a snapshot diff")
+    parser.add_argument("--resume", action="store_true", help="continue the run recorded in the checkpoint file")
+    parser.add_argument("--linked-charts", action="store_true", help="write charts as separate PNGs instead of inlining them")
+    parser.add_argument("--tiering", help="tiering policy JSON, 'default' for the built-in tiers, or 'flat' (default: TIERING_POLICY, else flat)")
+    parser.add_argument("--stats-json", help="write per-worker stats and token usage to this file")
+    args = parser.parse_args()
+
+    try:
+        db = default_db_client()
+        print("--- Firestore Client Initialized ---")
+    except Exception as e:
+        print("\n--- Fail Authorization：Please check gcloud auth application-default login ---")
+        print(f"Error: {e}")
+        exit(1)
+
+    summary = run_farm(db, args.workers, args.out_dir, args.changed_only, args.customers, args.updated_field,
+                       args.resume, "linked" if args.linked_charts else "inline",
+                       policy=tiering.load_policy(args.tiering) if args.tiering else None)
+    print(f"\n🎉 Farm finished in {summary['wall_s']} s: {len(summary['generated'])} generated "
+          f"({summary['reports_per_s']} reports/s), {len(summary['skipped'])} unchanged, {len(summary['removed'])} removed, "
+          f"{len(summary['failed'])} failed, {summary['unfinished']} unfinished")
+    print(format_worker_stats(summary))
+    print("Tiers: " + ", ".join(f"{tier}: {count}" for tier, count in sorted(summary["tiers"].items(), key=str)))
+    print(usage.format_batch(summary["usage"]))
+    if summary["failed"] or summary["unfinished"]:
+        print(f"Checkpoint kept: rerun with --resume to retry ({os.path.join(args.out_dir, CHECKPOINT_FILE)})")
+    if args.stats_json:
+        with open(args.stats_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
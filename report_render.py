@@ -0,0 +1,230 @@
+"""
+In-memory report rendering.
+
+* run_chart_code - runs the model's matplotlib script in a subprocess fed over
+                   stdin; every `savefig` is redirected into a BytesIO and the PNG
+                   bytes come back on stdout. No generate_chart.py / chart.png on disk.
+                   run_chart_code_async is the asyncio equivalent.
+* render_html    - fills the report shell (a string.Template compiled once at
+                   import) with the chart inlined as base64 or linked as a file.
+* sinks          - where finished reports go: MemorySink, DirectorySink or
+                   ArchiveSink (zip). Sinks are safe to share between threads.
+"""
+import asyncio
+import base64
+import datetime
+import html
+import os
+import string
+import subprocess
+import sys
+import threading
+import zipfile
+
+CHART_TIMEOUT = 15
+
+# Runs before the generated code: force Agg, capture every savefig into memory,
+# keep the script's own prints off the stdout channel used for the PNG bytes.
+CHART_PRELUDE = """\
+import atexit as _atexit, io as _io, sys as _sys
+import matplotlib as _matplotlib
+_matplotlib.use('Agg')
+import matplotlib.figure as _figure
+_png_out = _sys.stdout.buffer
+_sys.stdout = _sys.stderr
+_chart_buffer = _io.BytesIO()
+_original_savefig = _figure.Figure.savefig
+def _savefig_to_buffer(self, fname=None, *args, **kwargs):
+    kwargs['format'] = 'png'
+    _chart_buffer.seek(0)
+    _chart_buffer.truncate()
+    _original_savefig(self, _chart_buffer, *args, **kwargs)
+_figure.Figure.savefig = _savefig_to_buffer
+@_atexit.register
+def _emit_chart():
+    _png_out.write(_chart_buffer.getvalue())
+    _png_out.flush()
+"""
+
+
+class ChartExecutionError(RuntimeError):
+    def __init__(self, message: str, stderr: str = ""):
+        super().__init__(message)
+        self.stderr = stderr
+
+
+def run_chart_code(python_code: str, timeout: int = CHART_TIMEOUT) -> bytes:
+    """
+    Execute generated chart code and return the PNG bytes.
+    Raises subprocess.TimeoutExpired or ChartExecutionError.
+    """
+    code = CHART_PRELUDE + python_code.replace("plt.show()", "")
+    process = subprocess.run([sys.executable, "-"], input=code.encode("utf-8"), capture_output=True, timeout=timeout)
+    stderr = process.stderr.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        raise ChartExecutionError(f"Chart code exited with status {process.returncode}", stderr)
+    if not process.stdout:
+        raise ChartExecutionError("Chart code did not save a figure", stderr)
+    return process.stdout
+
+
+async def run_chart_code_async(python_code: str, timeout: int = CHART_TIMEOUT) -> bytes:
+    """asyncio version of run_chart_code (same prelude, same errors), no thread needed per chart."""
+    code = CHART_PRELUDE + python_code.replace("plt.show()", "")
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-", stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(code.encode("utf-8")), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired([sys.executable, "-"], timeout)
+    stderr = stderr.decode("utf-8", errors="replace")
+    if process.returncode != 0:
+        raise ChartExecutionError(f"Chart code exited with status {process.returncode}", stderr)
+    if not stdout:
+        raise ChartExecutionError("Chart code did not save a figure", stderr)
+    return stdout
+
+
+# --- HTML ---
+HTML_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Negotiation Strategy Report: $customer_name</title>
+    <style>
+        body { font-family: 'Arial', sans-serif; line-height: 1.6; padding: 20px; background-color: #f9f9f9; }
+        .container { max-width: 900px; margin: 0 auto; background: #fff; padding: 30px; border-radius: 8px; box-shadow: 0 0 20px rgba(0,0,0,0.1); position: relative; }
+        .timestamp { position: absolute; top: 10px; right: 30px; font-size: 0.9em; color: #777; }
+        h1 { color: #1a73e8; border-bottom: 2px solid #eee; padding-bottom: 10px; }
+        h2 { color: #333; margin-top: 30px; }
+        .report-content { background: #fdfdfd; padding: 15px; border: 1px solid #eee; border-radius: 5px; white-space: normal; }
+        .report-content ul { padding-left: 20px; }
+        .report-content mark { background-color: #fcf8e3; padding: 2px 4px; border-radius: 3px; }
+        .visualization { text-align: center; margin-top: 20px; border: 1px solid #ddd; padding: 10px; border-radius: 5px; }
+        .visualization img { max-width: 100%; height: auto; border-radius: 5px; }
+        .footer { margin-top: 40px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; color: #777; font-size: 0.9em; }
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="timestamp">Generated: $generation_time</div>
+
+        <h1>📊 Negotiation Strategy Report: $customer_name</h1>
+
+        <h2>✅ AI Text Analysis (Agent 1 & 2)</h2>
+        $report_html
+
+        <h2>🖼️ Data Visualization (Agent 2)</h2>
+        <div class="visualization">
+            <img src="$image_src" alt="Data Visualization Chart (Generation failed or not supported)">
+            <p>Generated by Visualization Agent based on the strategy report.</p>
+        </div>
+
+        <div class="footer">
+            Report generated by Gemini Agent System.
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+
+def safe_name(customer_name: str) -> str:
+    return customer_name.replace("/", "_").replace("\\", "_")
+
+
+def report_filename(customer_name: str) -> str:
+    return f"Negotiation_Report_{safe_name(customer_name)}.html"
+
+
+def chart_filename(customer_name: str) -> str:
+    return f"chart_{safe_name(customer_name)}.png"
+
+
+def render_html(customer_name: str, report_html: str, chart_png: bytes = None, asset_mode: str = "inline") -> tuple:
+    """
+    Returns (html, assets). asset_mode 'inline' embeds the chart as a data URI;
+    'linked' references chart_<customer>.png, returned in assets for the sink.
+    """
+    assets = {}
+    image_src = "data:image/png;base64,"
+    if chart_png and asset_mode == "linked":
+        image_src = chart_filename(customer_name)
+        assets[image_src] = chart_png
+    elif chart_png:
+        image_src += base64.b64encode(chart_png).decode("ascii")
+
+    html_content = HTML_TEMPLATE.substitute(
+        customer_name=html.escape(customer_name),
+        generation_time=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        report_html=report_html,
+        image_src=image_src,
+    )
+    return html_content, assets
+
+
+# --- sinks ---
+class MemorySink:
+    def __init__(self):
+        self.files = {}
+        self._lock = threading.Lock()
+
+    def write(self, name: str, data: bytes) -> str:
+        with self._lock:
+            self.files[name] = data
+        return name
+
+
+class DirectorySink:
+    def __init__(self, directory: str = "."):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.directory, name)
+        # unique temp name per thread, then an atomic rename
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+
+class ArchiveSink:
+    """Zip archive on disk or in a BytesIO (pass `io.BytesIO()` as target)."""
+
+    def __init__(self, target, compression: int = zipfile.ZIP_DEFLATED):
+        self.target = target
+        self._zip = zipfile.ZipFile(target, "w", compression)
+        self._lock = threading.Lock()
+
+    def write(self, name: str, data: bytes) -> str:
+        with self._lock:
+            self._zip.writestr(name, data)
+        return name
+
+    def close(self):
+        with self._lock:
+            self._zip.close()
+
+
+def publish(sink, customer_name: str, html_content: str, assets: dict = None) -> str:
+    """Write the report (and any linked assets) to the sink; returns the report location."""
+    for name, data in (assets or {}).items():
+        sink.write(name, data)
+    return sink.write(report_filename(customer_name), html_content.encode("utf-8"))
+
+
+def sink_from_spec(spec: str):
+    """'memory', 'dir:<path>' or 'zip:<path>' (CLI helper)."""
+    if spec == "memory":
+        return MemorySink()
+    kind, _, path = spec.partition(":")
+    if kind == "dir":
+        return DirectorySink(path or ".")
+    if kind == "zip":
+        return ArchiveSink(path or "reports.zip")
+    raise ValueError(f"Unknown sink '{spec}', expected memory, dir:<path> or zip:<path>")
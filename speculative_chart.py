@@ -0,0 +1,182 @@
+"""
+Speculative chart rendering: the negotiation chart is drawn from the tool result
+while Agent 1 is still writing the report.
+
+Everything on the chart except the predicted-price line is known as soon as
+getCustomerData returns (purchase_history, target and cost price), so the base
+figure is built and rasterized in a background thread during Agent 1's answer
+call. When the report is done, only the predicted-price line is blitted onto the
+kept pixels and the PNG encoded, instead of asking the model for chart code and
+running it in a subprocess afterwards:
+
+    chart = speculative_chart.start(tool_payload)      # right after the tool call
+    ...                                                # Agent 1 keeps generating
+    chart_png = chart.finish(report_text, features)    # predicted line + PNG bytes, or None
+"""
+import asyncio
+import contextvars
+import io
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib import image
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import analytics
+import tracing
+
+CHART_THREADS = os.cpu_count() or 2
+CHART_STYLE_VERSION = 1  # bump by hand when the drawing changes: batch_reports.py regenerates every report
+CHART_TIMEOUT = 15
+DPI = 100
+PREDICTED_COLOR = "gold"
+PREDICTED_PRICE_RE = re.compile(r"Predicted Deal Price[\s:*_]*\$?\s*([\d,]+(?:\.\d+)?)", re.IGNORECASE)
+
+# shared by every report in the process, so concurrent reports do not oversubscribe the CPU
+_executor = ThreadPoolExecutor(max_workers=CHART_THREADS, thread_name_prefix="chart")
+
+
+def predicted_price(report_text: str, features: dict = None) -> float:
+    """'Predicted Deal Price: $X' from the report, else the local baseline prediction, else None."""
+    match = PREDICTED_PRICE_RE.search(report_text or "")
+    if match:
+        try:
+            return float(match.group(1).replace(",", ""))
+        except ValueError:
+            pass
+    return (features or {}).get("baseline_predicted_price")
+
+
+# --- drawing (object-oriented Figure + Agg canvas, no pyplot state: safe in worker threads) ---
+BaseChart = namedtuple("BaseChart", ["figure", "axes", "background"])
+
+
+def build_base_figure(payload: dict) -> BaseChart:
+    """
+    History line, target/cost lines, profit zone and legend, rasterized once; the
+    pixels are kept so the predicted line can be blitted on top. None when the
+    payload has no usable history.
+    """
+    name = payload.get("customer_name", "Customer")
+    cols = analytics.PurchaseHistoryColumns.from_docs([payload], [name])
+    if not len(cols.prices):
+        return None
+    dates = (cols.days * 86400).astype("datetime64[s]")
+    target, cost = cols.target[0], cols.cost[0]
+
+    fig = Figure(figsize=(10, 6), dpi=DPI)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.plot(dates, cols.prices, marker="o", label="Price Achieved")
+    if not np.isnan(target):
+        ax.axhline(target, linestyle="--", color="green", label="Target Price")
+    if not np.isnan(cost):
+        ax.axhline(cost, linestyle="--", color="red", label="Cost Price")
+    if not np.isnan(target) and not np.isnan(cost):
+        ax.fill_between(dates, cost, target, color="green", alpha=0.15, label="Target Profit Zone")
+    # keep the local baseline prediction in view, so the model's prediction usually is too
+    baseline = (payload.get("precomputed_features") or {}).get("baseline_predicted_price")
+    if baseline is not None:
+        ax.axhline(baseline, alpha=0)
+    ax.plot([], [], color=PREDICTED_COLOR, linewidth=2.5, label="Predicted Price")
+    ax.set_title(f"Negotiation Price History: {name}")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Price ($)")
+    ax.grid(True, alpha=0.3)
+    ax.legend(loc="best")
+    fig.autofmt_xdate()
+    canvas.draw()  # text layout, fonts and the full Agg pass happen here, off the critical path
+    return BaseChart(fig, ax, canvas.copy_from_bbox(fig.bbox))
+
+
+def _encode_png(fig: Figure) -> bytes:
+    buffer = io.BytesIO()
+    image.imsave(buffer, np.asarray(fig.canvas.buffer_rgba()), format="png", dpi=DPI)
+    return buffer.getvalue()
+
+
+def _predicted_artists(ax, price: float, animated: bool) -> tuple:
+    line = ax.axhline(price, color=PREDICTED_COLOR, linewidth=2.5, animated=animated)
+    label = ax.annotate(f"${price:,.0f}", (1, price), xycoords=("axes fraction", "data"), xytext=(-4, 4),
+                        textcoords="offset points", ha="right", color="darkgoldenrod", animated=animated)
+    return line, label
+
+
+def overlay_predicted(base: BaseChart, price: float = None) -> bytes:
+    """Blit the predicted line (and its value) onto the pre-rendered pixels; full redraw only if it is off-scale."""
+    fig, ax, background = base
+    low, high = ax.get_ylim()
+    if price is not None and low <= price <= high:
+        fig.canvas.restore_region(background)
+        for artist in (*_predicted_artists(ax, price, animated=True), ax.get_legend()):
+            ax.draw_artist(artist)
+        return _encode_png(fig)
+
+    # off-scale or no prediction: rescale / drop the legend entry and draw everything again
+    handles, labels = ax.get_legend_handles_labels()
+    keep = [i for i, text in enumerate(labels) if text != "Predicted Price"]
+    if price is not None:
+        _predicted_artists(ax, price, animated=False)
+        ax.relim()
+        ax.autoscale_view()
+        keep = range(len(labels))
+    ax.legend([handles[i] for i in keep], [labels[i] for i in keep], loc="best")
+    fig.canvas.draw()
+    return _encode_png(fig)
+
+
+def _build(payload: dict):
+    with tracing.span("chart.prerender"):
+        return build_base_figure(payload)
+
+
+def _finish(base: BaseChart, price: float) -> bytes:
+    with tracing.span("chart.overlay", predicted_price=price) as overlay_span:
+        chart_png = overlay_predicted(base, price)
+        overlay_span.set_attribute("png_bytes", len(chart_png))
+        return chart_png
+
+
+class SpeculativeChart:
+    def __init__(self, future):
+        self._future = future
+
+    def finish(self, report_text: str, features: dict = None, timeout: float = CHART_TIMEOUT) -> bytes:
+        """Wait for the base figure, add the predicted line; None when the speculative render failed."""
+        try:
+            base = self._future.result(timeout)
+            if base is None:
+                return None
+            return _finish(base, predicted_price(report_text, features))
+        except Exception as e:
+            print(f"\n⚠️ Speculative chart failed: {e!r}")
+            return None
+
+    async def finish_async(self, report_text: str, features: dict = None, timeout: float = CHART_TIMEOUT) -> bytes:
+        """finish() for asyncio: waits on the worker thread without blocking the event loop."""
+        try:
+            base = await asyncio.wait_for(asyncio.wrap_future(self._future), timeout)
+            if base is None:
+                return None
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(_executor, context.run, _finish, base,
+                                              predicted_price(report_text, features))
+        except Exception as e:
+            print(f"\n⚠️ Speculative chart failed: {e!r}")
+            return None
+
+    def cancel(self):
+        self._future.cancel()
+
+
+def start(payload: dict) -> SpeculativeChart:
+    """Start drawing the base chart for a getCustomerData result; None for error payloads."""
+    if not isinstance(payload, dict) or "error" in payload or not payload.get("purchase_history"):
+        return None
+    # copy_context: the prerender span joins the current trace
+    return SpeculativeChart(_executor.submit(contextvars.copy_context().run, _build, payload))
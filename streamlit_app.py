@@ -2,21 +2,29 @@ import streamlit as st
 import os
 import json
 import requests
-import base64
-import re
 import subprocess
-import datetime
 import matplotlib 
 import tempfile
 
 # GCP & GenAI
 from google.cloud import firestore
 from google import genai
-from google.genai.types import Tool, FunctionDeclaration, Content, Part
+from google.genai.types import Content, Part
 from google.genai.errors import APIError
 import google.auth 
 import google.auth.transport.requests
 
+import agent_app
+import analytics
+import comparison
+import report_render
+import speculative_chart
+import tiering
+import tools
+import tracing
+import usage
+from customer_index import CustomerIndex
+
 # --- 1. Config ---
 DATABASE_ID = "customers"
 PROJECT_ID = "eighth-pen-476811-f3" 
@@ -132,78 +140,77 @@ def init_clients(uploaded_credentials_json=None):
         st.error("Make sure 'gcloud auth application-default login' is running，or uploaded active Service Account JSON。")
         # st.stop()
 
-# --- 3. get customer list  ---
-# cache data for 10mins
-@st.cache_data(ttl=600)
-def get_customer_list(_db_client):
+# --- 3. customer search (ID-only index) ---
+CUSTOMER_PAGE_SIZE = 50
+
+# _db_client is not hashed by Streamlit: project_id is the cache key, one index per project
+@st.cache_resource
+def get_customer_index(_db_client, project_id: str):
+    """Local keys-only index over the session's Firestore client"""
+    return CustomerIndex(_db_client)
+
+# cache each (project, prefix, page) for 1 min
+@st.cache_data(ttl=60)
+def get_customer_page(_db_client, project_id: str, prefix: str = "", page_token: str = None) -> dict:
     """
-    
-    Get customer ID from Firestore
+    One page of customer IDs matching the prefix, from the session's project.
+    The data service /customers route only serves PROJECT_ID, so it is used only when the
+    session is in that project (falling back to the local index); other projects use the local index.
     """
+    if project_id == PROJECT_ID:
+        params = {"prefix": prefix, "limit": CUSTOMER_PAGE_SIZE}
+        if page_token:
+            params["page_token"] = page_token
+        try:
+            response = requests.get(f"{CUSTOMER_DATA_SERVICE_URL}/customers", params=params, timeout=5)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            print(f"Customer search route failed, using local index: {e}")
+
     try:
-        customers_ref = _db_client.collection("customers")
-        customer_docs = customers_ref.stream()
-        customer_names = [doc.id for doc in customer_docs]
-        if not customer_names:
-            st.warning("Firestore 'customers' not found")
-            return []
-        return customer_names
+        return get_customer_index(_db_client, project_id).search(prefix, limit=CUSTOMER_PAGE_SIZE, page_token=page_token)
     except Exception as e:
         st.error(f"❌ Failed to get cumstomer data from Firestore: {e}")
-        return []
+        return {"customers": [], "next_page_token": None, "total": 0}
 
 # --- 4. Agent logic ---
 
-def call_customer_data_service(customer_name: str, st_status_container) -> dict:
-    url = f"{CUSTOMER_DATA_SERVICE_URL}?customer_name={customer_name}"
-    st_status_container.write(f"Using tools: {url}")
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        st_status_container.write("✅ tools succeed")
-        return response.json() 
-    except requests.exceptions.HTTPError as err:
-        st_status_container.write(f"❌ HTTP error: {err.response.status_code}")
-        return {"error": f"Tool execution failed with HTTP status {err.response.status_code}. Response: {err.response.text}"}
-    except Exception as e:
-        st_status_container.write(f"❌ tools unknown error: {str(e)}")
-        return {"error": f"Tool execution failed with unknown error: {str(e)}"}
+# _db_client is not hashed by Streamlit: project_id keys the registry (and its result cache)
+@st.cache_resource
+def get_tool_registry(_db_client, project_id: str):
+    """getCustomerData: Firestore through the logged-in client first, the data service as fallback (results cached 60s)"""
+    return tools.customer_data_registry(_db_client, CUSTOMER_DATA_SERVICE_URL)
 
-def run_agent_chat(client: genai.Client, prompt: str, st_status_container):
+@tracing.traced("agent1.run")
+def run_agent_chat(client: genai.Client, prompt: str, st_status_container, tool_results: list = None,
+                   prerender: list = None, tiers: list = None):
     """
     using Agent 1 logic
+    tool_results: optional list, receives every tool payload (with precomputed features)
+    prerender: optional list, receives a speculative_chart.SpeculativeChart per tool payload
+    tiers: optional list, receives a tiering.TierDecision per tool payload (models for Agent 2, chart or not)
+    tool calls read Firestore through the session's client (Cloud Run only as fallback)
     """
-    customer_data_tool_declaration = FunctionDeclaration(
-        name="getCustomerData", 
-        description="Retrieves comprehensive customer negotiation data, including purchase history, negotiation style, and pricing targets, needed to prepare a sales strategy.",
-        parameters={
-            "type": "OBJECT",
-            "properties": {"customer_name": {"type": "STRING", "description": "The full name of the customer"}},
-            "required": ["customer_name"]
-        },
-    )
-    negotiation_tool = Tool(function_declarations=[customer_data_tool_declaration])
-
-    system_instruction = ("You are a professional Sales Negotiation Strategy Expert. "
-                          "You MUST perform all analysis and generate the FINAL report entirely IN ENGLISH. "
-                          "You MUST use the 'getCustomerData' tool to retrieve customer data. "
-                          "After retrieving the data, you must analyze the last deal's outcome and price targets "
-                          "**Crucially, you MUST also provide a 'Predicted Deal Price' (a single numerical value) "
-                          "based on the purchase history, purchased_price, current targets, and negotiation style. "
-                          "Include this prediction clearly in your text report (e.g., 'Predicted Deal Price: $XXXXX').**"
-                          "to generate a structured negotiation strategy focused on maximizing profit margin. "
-                          "If the tool execution fails, you must inform the user and stop.")
+    registry = get_tool_registry(st.session_state.db_client, st.session_state.project_id)
+    policy = tiering.ACTIVE_POLICY
+    negotiation_tool = registry.tool()
+
+    system_instruction = agent_app.SYSTEM_INSTRUCTION
     
     initial_content = [Content(role="user", parts=[Part(text=prompt)])]
     
     st_status_container.write("Agent 1 thinking now...")
     
     try:
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=initial_content,
-            config={'tools': [negotiation_tool], 'system_instruction': system_instruction},
-        )
+        with tracing.span("model.generate_content", stage="agent1.plan") as model_span:
+            response = client.models.generate_content(
+                model=policy.plan_model,
+                contents=initial_content,
+                config={'tools': [negotiation_tool], 'system_instruction': system_instruction},
+            )
+            usage.record(model_span, response, policy.plan_model, {
+                "system_instruction": system_instruction, "user_prompt": prompt, "tool_declarations": negotiation_tool})
     except APIError as e:
         st.error(f"❌ Agent 1 API error: {e}")
         return None
@@ -215,7 +222,29 @@ def run_agent_chat(client: genai.Client, prompt: str, st_status_container):
         args = dict(tool_call.args)
         customer_name = args.get('customer_name')
         
-        tool_response_data = call_customer_data_service(customer_name, st_status_container)
+        with tracing.span("tool.call", tool=tool_call.name, customer_name=customer_name):
+            tool_result = registry.call(tool_call.name, args)
+        tool_response_data = tool_result.response
+        if "error" in tool_response_data:
+            st_status_container.write(f"❌ tools error: {tool_response_data['error']}")
+        else:
+            st_status_container.write(f"✅ tools succeed ({tool_result.path}, {tool_result.seconds * 1000:.0f} ms)")
+        if tool_results is not None:
+            tool_results.append(tool_response_data)
+
+        decision = policy.decide(tool_response_data, customer_name)
+        tiering.tag_span(decision)
+        if tiers is not None:
+            tiers.append(decision)
+        if decision.template is not None:
+            st_status_container.write("Customer not found: templated report, no further model calls")
+            return decision.template
+        st_status_container.write(f"Tier: {decision.tier} (report model: {decision.models['report']})")
+        if prerender is not None and decision.chart:
+            chart = speculative_chart.start(tool_response_data)
+            if chart is not None:
+                st_status_container.write("Drawing the chart while Agent 1 writes the report...")
+                prerender.append(chart)
         
         tool_response_part = Part.from_function_response(
             name=tool_call.name,
@@ -228,197 +257,117 @@ def run_agent_chat(client: genai.Client, prompt: str, st_status_container):
         ]
 
         st_status_container.write("Agent 1 analysing tool ...")
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=contents_with_response,
-            config={'tools': [negotiation_tool]},
-        )
+        with tracing.span("model.generate_content", stage="agent1.answer") as model_span:
+            response = client.models.generate_content(
+                model=decision.models["report"],
+                contents=contents_with_response,
+                config={'tools': [negotiation_tool]},
+            )
+            usage.record(model_span, response, decision.models["report"], {
+                "user_prompt": prompt, "tool_declarations": negotiation_tool,
+                "tool_call": contents_with_response[-2], "tool_payload": tool_response_data})
         
     st_status_container.write("✅ Agent 1 generated result")
     return response.text
 
-def generate_html_report(customer_name: str, report_html: str, image_base64: str) -> str:
-    """
-    generated HTML report
+@tracing.traced("report.render_html")
+def generate_html_report(customer_name: str, report_html: str, chart_png: bytes = None) -> str:
     """
-    generation_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <title>Negotiation Strategy Report: {customer_name}</title>
-        <style>
-            body {{ font-family: 'Arial', sans-serif; line-height: 1.6; padding: 20px; background-color: #f9f9f9; }}
-            .container {{ max-width: 900px; margin: 0 auto; background: #fff; padding: 30px; border-radius: 8px; box-shadow: 0 0 20px rgba(0,0,0,0.1); position: relative; }}
-            .timestamp {{ position: absolute; top: 10px; right: 30px; font-size: 0.9em; color: #777; }}
-            h1 {{ color: #1a73e8; border-bottom: 2px solid #eee; padding-bottom: 10px; }}
-            h2 {{ color: #333; margin-top: 30px; }}
-            .report-content {{ background: #fdfdfd; padding: 15px; border: 1px solid #eee; border-radius: 5px; white-space: normal; }}
-            .report-content ul {{ padding-left: 20px; }}
-            .report-content mark {{ background-color: #fcf8e3; padding: 2px 4px; border-radius: 3px; }}
-            .visualization {{ text-align: center; margin-top: 20px; border: 1px solid #ddd; padding: 10px; border-radius: 5px; }}
-            .visualization img {{ max-width: 100%; height: auto; border-radius: 5px; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="timestamp">Generated: {generation_time}</div>
-            <h1>📊 Negotiation Strategy Report: {customer_name}</h1>
-            <h2>✅ AI Text Analysis (Agent 1 & 2)</h2>
-            {report_html} 
-            <h2>🖼️ Data Visualization (Agent 2)</h2>
-            <div class="visualization">
-                <img src="data:image/png;base64,{image_base64}" alt="Data Visualization Chart (Generation failed or not supported)">
-            </div>
-        </div>
-    </body>
-    </html>
+    generated HTML report (chart inlined, built in memory)
     """
+    html_content, _ = report_render.render_html(customer_name, report_html, chart_png)
     return html_content
 
-def run_visualization_agent(client: genai.Client, customer_name: str, report_text: str, st_status_container) -> str:
+@tracing.traced("agent2.run")
+def run_visualization_agent(client: genai.Client, customer_name: str, report_text: str, st_status_container, features: dict = None,
+                            chart: speculative_chart.SpeculativeChart = None, tier: tiering.TierDecision = None) -> str:
     """
     run Agent 2 
+    features: optional analytics.compute_features output for the chart
+    chart: speculative chart from run_agent_chat's prerender (model-written chart code only as fallback)
+    tier: run_agent_chat's tiering.TierDecision (models, chart or not, templated report)
     """
-    image_base64 = ""
+    chart_png = None
+    if tier is not None and tier.template_html is not None:
+        return generate_html_report(customer_name, tier.template_html)
+    models = tier.models if tier is not None else dict.fromkeys(tiering.STAGES, tiering.DEFAULT_MODEL)
     
     # --- Mission 1: Generating charts ---
     st_status_container.write("Agent 2 generating chart(mission 1)...")
    
-    visualization_prompt = f"""
-    Take the following raw negotiation strategy report. The report contains data on 'purchase_history' (with dates and prices), a 'current_target_price', and a 'current_cost_price' (or 'Baseline_Price_USD').
-    Your task is to generate a self-contained Python script using 'matplotlib.pyplot' to create ONE clear, professional line and area chart.
-
-    Chart Requirements:
-    1.  X-Axis: Dates from 'purchase_history' (must parse strings to datetime).
-    2.  Y-Axis: Price ($).
-    3.  Historical Prices: Plot 'price_achieved' from 'purchased_price' as a line with markers.
-    4.  Target Line: Draw a horizontal dashed line for 'current_target_price' (or 'Target_Price_USD').
-    5.  Cost Line: Draw a horizontal dashed line for 'current_cost_price' (or 'Baseline_Price_USD').
-    6.  Profit Zone: Create a shaded green area (using plt.fill_between) between the cost and target lines.
-    7.  **Predicted Price:** Look for the 'Predicted Deal Price: $...' in the report text. 
-        If found, plot this value as a **single, highly visible horizontal line**. 
-        Use a distinct color (e.g., 'gold' or 'red') and label it 'Predicted Price' in the legend.
-
-    Python Script Requirements:
-    1.  Code Only: Respond ONLY with Python code in ```python ... ```.
-    2.  Library: Use 'matplotlib.pyplot' and 'datetime'.
-    3.  Save to File: Save the chart to 'chart.png'.
-    4.  No Display: Do not use plt.show().
-
-    Input Report:
-    ---
-    {report_text}
-    ---
-    """
-    
-    try:
-        vis_response = client.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=[Content(role="user", parts=[Part(text=visualization_prompt)])],
-            config={'temperature': 0.1}
-        )
+    # speculative chart (started at the tool call): only the predicted line is left to draw
+    if chart is not None:
+        chart_png = chart.finish(report_text, features)
+        if chart_png is not None:
+            st_status_container.write("✅ Agent 2 finished the pre-rendered chart (predicted price added)")
+
+    if chart_png is None and tier is not None and not tier.chart:
+        st_status_container.write(f"Agent 2 skipping the chart ({tier.tier} tier, too few data points)")
+    elif chart_png is None:
+        visualization_prompt = agent_app.build_visualization_prompt(report_text, features)
+        try:
+            with tracing.span("model.generate_content", stage="agent2.chart_code") as model_span:
+                vis_response = client.models.generate_content(
+                    model=models["chart"], 
+                    contents=[Content(role="user", parts=[Part(text=visualization_prompt)])],
+                    config={'temperature': 0.1}
+                )
+                usage.record(model_span, vis_response, models["chart"], usage.prompt_sections(
+                    visualization_prompt, features=analytics.features_prompt_section(features), report_text=report_text))
         
-        code_match = re.search(r"```python\n(.*?)\n```", vis_response.text, re.DOTALL)
-        if not code_match:
-            st_status_container.write("⚠️ Agent 2 warning: could not generate cahrt code")
-        else:
-            python_code = code_match.group(1)
-            fixed_python_code = "import matplotlib\nmatplotlib.use('Agg')\n" + python_code
-            fixed_python_code = fixed_python_code.replace("plt.show()", "")
+            code_match = agent_app.CHART_CODE_RE.search(vis_response.text)
+            if not code_match:
+                st_status_container.write("⚠️ Agent 2 warning: could not generate cahrt code")
+            else:
+                python_code = code_match.group(1)
 
-            with open("generate_chart.py", "w", encoding="utf-8") as f:
-                f.write(fixed_python_code)
-            
-            # --- code running details ---
-            try:
-                st_status_container.write("Agent 2 executing code for charts...")
-                # 我们添加 check=True，这样脚本失败时会抛出异常
-                process = subprocess.run(
-                    ['python', 'generate_chart.py'], 
-                    capture_output=True, 
-                    text=True, 
-                    timeout=15,
-                    check=True # 如果 returncode != 0，则引发 CalledProcessError
-                )
-                
-                # --- if successful ---
+                # --- code running details (stdin in, PNG bytes out: no generate_chart.py / chart.png) ---
                 try:
-                    with open("chart.png", "rb") as img_file:
-                        image_base64 = base64.b64encode(img_file.read()).decode('utf-8')
+                    st_status_container.write("Agent 2 executing code for charts...")
+                    with tracing.span("chart.execute"):
+                        chart_png = report_render.run_chart_code(python_code)
                     st_status_container.write("✅ Agent 2 successfully generated charts")
-                    os.remove("chart.png") # 成功后清理
-                    os.remove("generate_chart.py") # 成功后清理
-                except FileNotFoundError:
-                    st_status_container.write("⚠️ Agent 2 warning: 'chart.png' not created")
-
-            # --- not successful ---
-            except subprocess.TimeoutExpired as e:
-                st_status_container.write(f"❌ Agent 2 Error: Overtime (15s)!")
-                st_status_container.write("Diagnose: code may contain 'plt.show()' ")
-                st_status_container.write("DEBUG: 'generate_chart.py' was saved，please check in VS Code ")
-
-            except subprocess.CalledProcessError as e:
-                # 这是最有用的！捕获所有Python脚本错误 (e.g., KeyError, TypeError)
-                st_status_container.write("❌ Agent 2 Error: Failed in executing code")
-                st_status_container.write("--- Wrong messages (STDERR) ---")
-                # 使用 st.code() 来格式化显示错误
-                st.code(e.stderr, language="bash")
-                st_status_container.write("DEBUG: 'generate_chart.py' was saved，please check in VS Code")
-            # --- end checking ---
-            # st_status_container.write("Agent 2 generating code for chart...")
-            # process = subprocess.run(['python', 'generate_chart.py'], capture_output=True, text=True, timeout=15)
-            
-            # if process.returncode != 0:
-            #     st_status_container.write("⚠️ Agent 2 warning: failed generating code for chart")
-            #     print(f"--- Agent 2 STDERR ---\n{process.stderr}")
-            # else:
-            #     try:
-            #         with open("chart.png", "rb") as img_file:
-            #             image_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-            #         st_status_container.write("✅ Agent 2 succeeded generation")
-            #         os.remove("chart.png") # 清理
-            #         os.remove("generate_chart.py") # 清理
-            #     except FileNotFoundError:
-            #         st_status_container.write("⚠️ Agent 2 warning: 'chart.png' not created")
 
-    except Exception as e:
-        st_status_container.write(f"❌ Agent 2 failed generated charts: {e}")
+                # --- not successful ---
+                except subprocess.TimeoutExpired as e:
+                    st_status_container.write(f"❌ Agent 2 Error: Overtime (15s)!")
+                    st_status_container.write("Diagnose: code may contain 'plt.show()' ")
+
+                except report_render.ChartExecutionError as e:
+                    # 捕获所有Python脚本错误 (e.g., KeyError, TypeError)
+                    st_status_container.write(f"❌ Agent 2 Error: Failed in executing code ({e})")
+                    st_status_container.write("--- Wrong messages (STDERR) ---")
+                    # 使用 st.code() 来格式化显示错误
+                    st.code(e.stderr, language="bash")
+                    st_status_container.write("--- Generated code ---")
+                    st.code(python_code, language="python")
+                # --- end checking ---
+
+        except Exception as e:
+            st_status_container.write(f"❌ Agent 2 failed generated charts: {e}")
 
     # --- Mission 2: formating ---
     st_status_container.write("Agent 2 forming text...")
-    styling_prompt = f"""
-    Take the following raw negotiation strategy report (written in Markdown). 
-    Your task is to convert it into a clean, professional HTML block.
-    Requirements:
-    1.  Respond ONLY with the HTML block. Do not add "```html" or any explanatory text.
-    2.  Use `<ul>` and `<li>` for bullet points.
-    3.  Use `<strong>` or `<b>` for bold text.
-    4.  Use `<mark>` tags for all key numerical data and key strategic phrases (e.g., "Walk-away Price").
-    5.  Wrap the entire output in a single `<div>` with class "report-content".
-    Input Report:
-    ---
-    {report_text}
-    ---
-    """
+    styling_prompt = agent_app.build_styling_prompt(report_text)
     
     styled_report_html = f"<div class='report-content'><pre>{report_text}</pre></div>" # 默认值
 
     try:
-        style_response = client.models.generate_content(
-            model='gemini-2.5-flash', 
-            contents=[Content(role="user", parts=[Part(text=styling_prompt)])],
-            config={'temperature': 0.1} 
-        )
+        with tracing.span("model.generate_content", stage="agent2.styling") as model_span:
+            style_response = client.models.generate_content(
+                model=models["styling"], 
+                contents=[Content(role="user", parts=[Part(text=styling_prompt)])],
+                config={'temperature': 0.1} 
+            )
+            usage.record(model_span, style_response, models["styling"],
+                         usage.prompt_sections(styling_prompt, report_text=report_text))
         styled_report_html = style_response.text
         st_status_container.write("✅ Agent 2 succeeded generation")
     except Exception as e:
         st_status_container.write(f"❌ Agent 2 failed generation: {e}")
         
     # --- output： return HTML ---
-    return generate_html_report(customer_name, styled_report_html, image_base64)
+    return generate_html_report(customer_name, styled_report_html, chart_png)
 
 # --- 5. Streamlit Interface ---
 st.set_page_config(layout="wide")
@@ -478,17 +427,40 @@ else:
         st.markdown(f"**Project:** `{st.session_state.project_id}`")
         
 
-        customer_list = get_customer_list(db_client)
+        search_prefix = st.text_input(
+            "Search customer",
+            value="",
+            help="Prefix match on the customer name (case-sensitive)"
+        )
+        # a new prefix restarts pagination
+        if st.session_state.get("customer_search_prefix") != search_prefix:
+            st.session_state.customer_search_prefix = search_prefix
+            st.session_state.customer_page_tokens = [None]
+        page_tokens = st.session_state.customer_page_tokens
+
+        customer_page = get_customer_page(db_client, st.session_state.project_id, search_prefix, page_tokens[-1])
+        customer_list = customer_page["customers"]
         if not customer_list:
-            st.error("Cannot load customer list, please check Firestore connection and content")
+            if search_prefix:
+                st.warning(f"No customer starts with '{search_prefix}'")
+            else:
+                st.error("Cannot load customer list, please check Firestore connection and content")
         else:
             selected_customer = st.selectbox(
                 "1. Choose target customer",
                 options=customer_list,
                 index=0,
-                help="This list collects from your Firestore 'customers' collection"
+                help=f"{customer_page['total']} matching customers in the 'customers' collection of project {st.session_state.project_id}"
             )
-            
+
+            col_prev, col_next = st.columns(2)
+            if col_prev.button("◀ Prev", disabled=len(page_tokens) == 1, use_container_width=True):
+                page_tokens.pop()
+                st.rerun()
+            if col_next.button("Next ▶", disabled=not customer_page["next_page_token"], use_container_width=True):
+                page_tokens.append(customer_page["next_page_token"])
+                st.rerun()
+
             # Negotiation purpose Textbox
             purpose = st.text_input(
                 "2. Input negotiation target",
@@ -501,6 +473,20 @@ else:
             if generate_button:
                 # when button clicked, we update status
                 st.session_state.app_step = "view"
+
+            # Comparison mode: collect accounts across searches/pages, one report for the segment
+            st.divider()
+            compare_list = st.session_state.setdefault("compare_list", [])
+            col_add, col_clear = st.columns(2)
+            if col_add.button("➕ Add to comparison", disabled=len(compare_list) >= comparison.MAX_COMPARISON_CUSTOMERS, use_container_width=True):
+                if selected_customer not in compare_list:
+                    compare_list.append(selected_customer)
+            if col_clear.button("🗑️ Clear", disabled=not compare_list, use_container_width=True):
+                compare_list.clear()
+            st.caption(f"Comparison ({len(compare_list)}/{comparison.MAX_COMPARISON_CUSTOMERS}): " + (", ".join(compare_list) or "empty"))
+            compare_button = st.button("📊 Generate Comparison Report", disabled=len(compare_list) < 2, use_container_width=True)
+            if compare_button:
+                st.session_state.app_step = "view"
 # --- Show results ---
 if 'generate_button' in locals() and generate_button:
     
@@ -525,20 +511,29 @@ if 'generate_button' in locals() and generate_button:
     
     # 2. 运行 Agent 流程
     # st.status 提供了一个很好的 "正在运行" 状态框
-    with st.status("Generating report, please wait...", expanded=True) as status:
+    with st.status("Generating report, please wait...", expanded=True) as status, tracing.span("report", customer_name=selected_customer), \
+            usage.collect(selected_customer) as report_usage:
         try:
             # 运行 Agent 1
             status.write("Activate Agent 1 (Text Analysis)...")
-            report_text = run_agent_chat(genai_client, final_prompt, status)
+            tool_results, charts, tiers = [], [], []
+            report_text = run_agent_chat(genai_client, final_prompt, status, tool_results, charts, tiers)
             
             if report_text:
                 # 运行 Agent 2
                 status.write("Activate Agent 2 (Visualization)...")
-                html_report = run_visualization_agent(genai_client, selected_customer, report_text, status)
+                features = tool_results[-1].get("precomputed_features") if tool_results else None
+                html_report = run_visualization_agent(genai_client, selected_customer, report_text, status, features,
+                                                      charts[-1] if charts else None, tiers[-1] if tiers else None)
                 
                 # 3. save results
                 st.session_state.html_report = html_report
+                # download bytes are built once from an in-memory sink, not re-encoded on every rerun
+                sink = report_render.MemorySink()
+                st.session_state.report_file = report_render.publish(sink, selected_customer, html_report)
+                st.session_state.report_bytes = sink.files[st.session_state.report_file]
                 st.session_state.report_customer = selected_customer
+                st.session_state.report_usage = report_usage.to_dict()
                 
                 status.update(label="Finished generating report", state="complete")
                 st.balloons()
@@ -548,6 +543,23 @@ if 'generate_button' in locals() and generate_button:
         except Exception as e:
             status.update(label=f"Failed generating report: {e}", state="error")
 
+# --- Comparison report (one bulk read + one model call for the whole segment) ---
+if 'compare_button' in locals() and compare_button:
+    compare_names = list(st.session_state.compare_list)
+    with st.status(f"Comparing {len(compare_names)} accounts, please wait...", expanded=True) as status, tracing.span("report", customer_count=len(compare_names)), \
+            usage.collect(f"comparison of {len(compare_names)}") as report_usage:
+        try:
+            sink = report_render.MemorySink()
+            report_file = comparison.run_comparison_report(genai_client, compare_names, purpose, db_client=db_client, sink=sink)
+            st.session_state.report_file = report_file
+            st.session_state.report_bytes = sink.files[report_file]
+            st.session_state.html_report = st.session_state.report_bytes.decode("utf-8")
+            st.session_state.report_customer = f"{len(compare_names)} accounts"
+            st.session_state.report_usage = report_usage.to_dict()
+            status.update(label="Finished generating comparison report", state="complete")
+        except Exception as e:
+            status.update(label=f"Failed generating comparison report: {e}", state="error")
+
 # 4. 在按钮点击之外显示报告 (这样它会保持在页面上)
 if st.session_state.app_step == "view" and 'html_report' in st.session_state:
     st.header(f"Strategy Report: {st.session_state.report_customer}")
@@ -555,10 +567,28 @@ if st.session_state.app_step == "view" and 'html_report' in st.session_state:
     # 提供下载按钮
     st.download_button(
         label="📥 Download HTML Report",
-        data=st.session_state.html_report,
-        file_name=f"Negotiation_Report_{st.session_state.report_customer}.html",
+        data=st.session_state.report_bytes,
+        file_name=st.session_state.report_file,
         mime="text/html"
     )
+
+    # token usage / cost of the model calls behind this report
+    report_usage = st.session_state.get("report_usage")
+    if report_usage:
+        with st.expander(f"💰 Token usage: {report_usage['input_tokens']} in / "
+                         f"{report_usage['output_tokens'] + report_usage['thoughts_tokens']} out tokens, "
+                         f"~${report_usage['cost_usd']:.4f}"):
+            col_calls, col_seconds, col_cost = st.columns(3)
+            col_calls.metric("Model calls", report_usage["model_calls"])
+            col_seconds.metric("Model time", f"{report_usage['model_seconds']:.1f} s")
+            col_cost.metric("Estimated cost", f"${report_usage['cost_usd']:.4f}")
+            st.dataframe([
+                {"stage": call["stage"], "input tokens": call["input_tokens"], "output tokens": call["output_tokens"],
+                 "thinking tokens": call["thoughts_tokens"], "seconds": call["seconds"], "cost $": call["cost_usd"]}
+                for call in report_usage["calls"]
+            ], use_container_width=True)
+            st.caption("Prompt tokens by section (estimated from section size)")
+            st.bar_chart({name: entry["tokens"] for name, entry in report_usage["by_section"].items()})
     
     # 渲染 HTML 报告
     st.components.v1.html(st.session_state.html_report, height=1000, scrolling=True)
\ No newline at end of file
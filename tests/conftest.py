@@ -0,0 +1,6 @@
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# repo modules are flat scripts; the fakes live next to the benchmarks that use them
+sys.path[:0] = [REPO_ROOT, os.path.join(REPO_ROOT, "benchmarks")]
@@ -0,0 +1,90 @@
+import datetime
+import math
+import warnings
+
+import pytest
+
+import analytics
+from fakes import make_customer
+
+
+def doc(history, target=100.0, cost=60.0):
+    return {"current_target_price": target, "current_cost_price": cost, "purchase_history": history}
+
+
+def test_batch_matches_single_document_path():
+    docs = [make_customer(f"C{i}", history_size=size) for i, size in enumerate([0, 1, 2, 12])]
+    batch = analytics.compute_features_batch(docs, [f"C{i}" for i in range(4)])
+    for single, batched in zip((analytics.compute_features(d) for d in docs), batch):
+        assert {k: v for k, v in single.items() if k != "customer_name"} == \
+               {k: v for k, v in batched.items() if k != "customer_name"}
+
+
+def test_rows_are_sorted_by_date_before_the_features():
+    features = analytics.compute_features(doc([
+        {"date": "2024-03-01", "price_achieved": 90},
+        {"date": "2024-01-01", "price_achieved": 80},
+        {"date": "2024-02-01", "price_achieved": 85},
+    ]))
+    assert features["deal_count"] == 3
+    assert features["last_price"] == 90
+    assert features["mean_price"] == 85
+    assert features["trend_slope_per_30d"] > 0
+    assert features["discount_vs_target"] == pytest.approx(0.1)
+    assert features["margin_vs_cost"] == pytest.approx(round(30 / 90, 4))
+
+
+def test_malformed_rows_are_dropped_not_fatal():
+    features = analytics.compute_features(doc([
+        {"date": "2024-01-01", "price_achieved": 80},
+        {"date": "not a date", "price_achieved": 99},
+        {"date": "2024-02-01", "price_achieved": "n/a"},
+        {"date": None, "price_achieved": 70},
+        {"price_achieved": 70},
+        "garbage",
+        {"date": "2024-03-01", "price_achieved": "100"},
+    ]))
+    assert features["deal_count"] == 2
+    assert features["last_price"] == 100
+    assert features["mean_price"] == 90
+
+
+def test_mixed_date_representations():
+    features = analytics.compute_features(doc([
+        {"date": datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc), "price_achieved": 80},
+        {"date": "Thu, 01 Feb 2024 00:00:00 GMT", "price_achieved": 85},
+        {"date": datetime.date(2024, 3, 1), "price_achieved": 90},
+    ]))
+    assert features["deal_count"] == 3
+    assert features["last_price"] == 90
+
+
+def test_firestore_timestamp_strings_parse_without_warnings():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        days = analytics._dates_to_days(["2024-01-15 00:00:00+00:00", "2024-01-15 00:00:00+02:00"])
+    assert days[0] == pytest.approx(19737.0)
+    assert days[1] == pytest.approx(19737.0 - 2 / 24)
+
+
+def test_empty_history_and_missing_prices_give_none():
+    features = analytics.compute_features({"purchase_history": []})
+    assert features["deal_count"] == 0
+    for key in ("last_price", "mean_price", "volatility", "discount_vs_target", "target_price", "baseline_predicted_price"):
+        assert features[key] is None
+    # a zero target must not produce inf
+    zero_target = analytics.compute_features(doc([{"date": "2024-01-01", "price_achieved": 80}], target=0))
+    assert zero_target["discount_vs_target"] is None
+
+
+def test_single_deal_predicts_the_last_price():
+    features = analytics.compute_features(doc([{"date": "2024-01-01", "price_achieved": 80}]))
+    assert features["baseline_predicted_price"] == 80
+    assert features["trend_slope_per_30d"] == 0
+    assert not math.isnan(features["volatility"])
+
+
+def test_attach_features_skips_error_payloads():
+    error = {"error": "Customer 'X' not found in Firestore.", "data": {}}
+    assert "precomputed_features" not in analytics.attach_features(dict(error))
+    assert analytics.attach_features(make_customer("X"))["precomputed_features"]["deal_count"] == 12
@@ -0,0 +1,62 @@
+import pytest
+
+from customer_index import CustomerIndex, get_documents
+from fakes import FakeFirestore
+
+NAMES = ["ACME", "ACME TECH", "ACME Tools", "Acorn", "Beta", "Gamma"]
+
+
+@pytest.fixture
+def index():
+    return CustomerIndex(FakeFirestore(dict.fromkeys(NAMES, {})))
+
+
+def test_prefix_is_case_sensitive(index):
+    assert index.search("ACME")["customers"] == ["ACME", "ACME TECH", "ACME Tools"]
+    assert index.search("Ac")["customers"] == ["Acorn"]
+    assert index.search("acme") == {"customers": [], "next_page_token": None, "total": 0}
+
+
+def test_empty_prefix_lists_everything(index):
+    result = index.search("", limit=100)
+    assert result["customers"] == sorted(NAMES)
+    assert result["total"] == len(NAMES)
+    assert result["next_page_token"] is None
+
+
+def test_pages_follow_the_token_until_exhausted(index):
+    first = index.search("A", limit=2)
+    assert first["customers"] == ["ACME", "ACME TECH"] and first["total"] == 4
+    second = index.search("A", limit=2, page_token=first["next_page_token"])
+    assert second["customers"] == ["ACME Tools", "Acorn"]
+    # exactly at the end: no token pointing at an empty page
+    assert second["next_page_token"] is None
+
+
+def test_page_token_outside_the_prefix_range(index):
+    assert index.search("ACME", page_token="Zzz")["customers"] == []
+    # a token before the range starts the page at the first match
+    assert index.search("B", page_token="A")["customers"] == ["Beta"]
+
+
+def test_add_and_discard_keep_the_list_sorted(index):
+    index.search("")  # load
+    index.add("ACME Labs")
+    index.add("ACME Labs")
+    index.discard("Beta")
+    index.discard("Missing")
+    assert index.search("", limit=100)["customers"] == sorted(set(NAMES) - {"Beta"} | {"ACME Labs"})
+
+
+def test_scan_pages_past_page_size():
+    names = [f"Customer {i:05d}" for i in range(2500)]
+    index = CustomerIndex(FakeFirestore(dict.fromkeys(names, {})))
+    assert index.refresh() == 2500
+    assert index.search("Customer 024", limit=1000)["total"] == 100
+
+
+def test_get_documents_keeps_request_order_and_skips_unknown():
+    db = FakeFirestore({"a": {"x": 1}, "b": {"x": 2}})
+    snapshots = get_documents(db, ["b", "missing", "a"])
+    assert [s.id for s in snapshots] == ["b", "missing", "a"]
+    assert [s.exists for s in snapshots] == [True, False, True]
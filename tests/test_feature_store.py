@@ -0,0 +1,64 @@
+import pytest
+
+import feature_store
+from fakes import FakeFirestore, make_customers
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = feature_store.FeatureStore(str(tmp_path / "features.db"))
+    yield store
+    store.close()
+
+
+def rows(customers: dict) -> list:
+    return feature_store.build_rows(list(customers), list(customers.values()))
+
+
+def test_upsert_replaces_rows_by_customer_name(store):
+    customers = make_customers(3, history_size=4)
+    store.upsert(rows(customers))
+    name = next(iter(customers))
+    customers[name]["current_target_price"] = 1
+    store.upsert(rows({name: customers[name]}))
+    assert len(store) == 3
+    assert store.get(name)["features"]["target_price"] == 1
+    assert store.get("Missing") is None
+
+
+def test_prune_deletes_only_customers_not_kept(store):
+    store.upsert(rows(make_customers(4, history_size=2)))
+    assert store.prune({"Customer 00000", "Customer 00002", "Not stored"}) == 2
+    assert sorted(row["customer_name"] for row in store.top(limit=10)) == ["Customer 00000", "Customer 00002"]
+    assert store.prune({"Customer 00000", "Customer 00002"}) == 0
+
+
+def test_build_drops_customers_removed_from_the_collection(tmp_path):
+    path = str(tmp_path / "features.db")
+    customers = make_customers(5, history_size=3)
+    assert feature_store.build(FakeFirestore(customers), path) == 5
+    del customers["Customer 00001"]
+    assert feature_store.build(FakeFirestore(customers), path) == 4
+    store = feature_store.FeatureStore(path)
+    assert store.get("Customer 00001") is None and len(store) == 4
+    store.close()
+
+
+def test_aggregates_from_the_document():
+    doc = {"negotiation_style": "Tough, competitive buyer", "current_target_price": 110,
+           "purchase_history": [{"date": "2024-01-01", "price_achieved": 100, "outcome": "Won"},
+                                {"date": "2024-02-01", "price_achieved": 100, "deal_status": "closed lost"},
+                                {"date": "2024-03-01", "price_achieved": 100}]}
+    row = feature_store.row_to_dict(feature_store.build_rows(["X"], [doc])[0])
+    assert row["win_rate"] == 0.5
+    assert row["margin_headroom"] == pytest.approx(0.1)
+    assert row["style_category"] == "aggressive"
+    assert feature_store.style_category({}) == "unknown"
+
+
+def test_top_ranks_highest_first_and_rejects_unknown_columns(store):
+    store.upsert(rows(make_customers(6, history_size=4)))
+    ranked = [row["margin_headroom"] for row in store.top("margin_headroom", limit=6)]
+    assert ranked == sorted(ranked, reverse=True)
+    with pytest.raises(ValueError):
+        store.top("customer_name; DROP TABLE customer_features")
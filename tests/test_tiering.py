@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import tiering
+from tiering import DEFAULT_MODEL, LITE_MODEL
+
+
+def payload(deal_count, mean_price):
+    return {"customer_name": "X", "purchase_history": [{}] * deal_count,
+            "precomputed_features": {"deal_count": deal_count, "mean_price": mean_price}}
+
+
+@pytest.mark.parametrize("deal_count, mean_price, tier", [
+    (10, 100_000, "key"),        # deal_volume exactly 1,000,000
+    (10, 99_999, "standard"),
+    (6, 1_000, "standard"),      # deal_count exactly 6
+    (5, 1_000, "small"),
+    (0, None, "small"),
+])
+def test_default_policy_thresholds(deal_count, mean_price, tier):
+    assert tiering.DEFAULT_POLICY.decide(payload(deal_count, mean_price)).tier == tier
+
+
+def test_default_policy_models_and_chart_threshold():
+    key = tiering.DEFAULT_POLICY.decide(payload(10, 100_000))
+    assert key.models == dict.fromkeys(tiering.STAGES, DEFAULT_MODEL)
+    assert tiering.DEFAULT_POLICY.plan_model == DEFAULT_MODEL
+    assert tiering.DEFAULT_POLICY.decide(payload(3, 10)).chart
+    small = tiering.DEFAULT_POLICY.decide(payload(2, 10))
+    assert not small.chart and small.models["report"] == LITE_MODEL
+
+
+@pytest.mark.parametrize("error", [
+    "Customer 'Ghost' not found in Firestore.",
+    "Tool execution failed with HTTP status 404. Response: {}",
+])
+def test_not_found_gets_the_template(error):
+    decision = tiering.DEFAULT_POLICY.decide({"error": error, "data": {}}, "Ghost <b>")
+    assert decision.tier == "not_found" and not decision.chart and decision.models == {}
+    assert 'No customer record was found for "Ghost <b>"' in decision.template
+    assert "Ghost &lt;b&gt;" in decision.template_html
+
+
+@pytest.mark.parametrize("error", [
+    "Tool execution failed with HTTP status 500. Response: model not found",
+    "Firestore query failed: deadline exceeded",
+])
+def test_other_errors_are_not_templated(error):
+    assert not tiering.is_not_found({"error": error})
+    assert tiering.DEFAULT_POLICY.decide({"error": error}).template is None
+
+
+def test_flat_policy_is_the_unset_default():
+    assert tiering.load_policy(None) is tiering.FLAT_POLICY
+    assert tiering.load_policy("default") is tiering.DEFAULT_POLICY
+    decision = tiering.FLAT_POLICY.decide({"error": "Customer 'X' not found in Firestore."})
+    assert decision.template is None and decision.chart
+    # manifests written before tiering stay valid
+    assert tiering.FLAT_POLICY.fingerprint() == DEFAULT_MODEL
+
+
+def test_policy_file_round_trip(tmp_path):
+    path = tmp_path / "tiering.json"
+    path.write_text(json.dumps(tiering.DEFAULT_POLICY.to_dict()))
+    loaded = tiering.load_policy(str(path))
+    assert loaded.fingerprint() == tiering.DEFAULT_POLICY.fingerprint()
+    assert loaded.fingerprint().startswith("tiered-")
+
+
+def test_tier_without_every_stage_model_is_rejected():
+    with pytest.raises(ValueError, match="no model for chart, styling"):
+        tiering.TieringPolicy([tiering.Tier("x", {}, {"report": DEFAULT_MODEL})])
+    with pytest.raises(ValueError):
+        tiering.TieringPolicy([])
@@ -0,0 +1,95 @@
+import pytest
+from google.genai.types import FunctionDeclaration
+
+import tools
+from fakes import FakeFirestore, make_customer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tools.time, "monotonic", clock)
+    return clock
+
+
+def registry_with(handler, cache_ttl=10, postprocess=None):
+    registry = tools.ToolRegistry()
+    registry.register(FunctionDeclaration(name="t", description="test tool"), cache_ttl=cache_ttl,
+                      postprocess=postprocess).add_path("fetch", handler)
+    return registry
+
+
+def test_cache_hit_until_ttl_expires(clock):
+    fetched = []
+    registry = registry_with(lambda args, timeout: fetched.append(args) or {"value": len(fetched)})
+    assert registry.call("t", {"k": 1}).path == "fetch"
+    hit = registry.call("t", {"k": 1})
+    assert (hit.path, hit.cached, hit.response) == ("cache", True, {"value": 1})
+    assert registry.call("t", {"k": 2}).path == "fetch"  # different args, different key
+    clock.now += 10.5
+    assert registry.call("t", {"k": 1}).response == {"value": 3}
+
+
+def test_cache_hit_does_not_extend_the_ttl_or_rerun_postprocess(clock):
+    postprocessed = []
+    registry = registry_with(lambda args, timeout: {"value": 1},
+                             postprocess=lambda response, args: postprocessed.append(1) or {**response, "extra": True})
+    registry.call("t", {})
+    clock.now += 6
+    assert registry.call("t", {}).response == {"value": 1, "extra": True}
+    clock.now += 6  # 12 s after the fetch: expired although hit 6 s ago
+    assert registry.call("t", {}).path == "fetch"
+    assert len(postprocessed) == 2
+
+
+def test_errors_are_never_cached(clock):
+    calls = []
+    registry = registry_with(lambda args, timeout: calls.append(1) or {"error": "boom"})
+    registry.call("t", {})
+    assert registry.call("t", {}).path == "fetch"
+    assert len(calls) == 2
+
+
+def test_cached_responses_are_copies(clock):
+    registry = registry_with(lambda args, timeout: {"items": [1]})
+    registry.call("t", {}).response["items"].append(2)
+    assert registry.call("t", {}).response == {"items": [1]}
+
+
+def test_failing_path_falls_through_to_the_next():
+    def broken(args, timeout):
+        raise ConnectionError("unreachable")
+
+    registry = registry_with(broken, cache_ttl=0)
+    registry.get("t").add_path("http", lambda args, timeout: {"ok": True})
+    result = registry.call("t", {})
+    assert (result.path, result.response) == ("http", {"ok": True})
+
+
+def test_every_path_failing_reports_all_errors():
+    def broken(args, timeout):
+        raise ConnectionError("unreachable")
+
+    result = registry_with(broken).call("t", {})
+    assert result.path is None and "fetch: unreachable" in result.response["error"]
+    assert "Unknown tool" in tools.ToolRegistry().call("nope", {}).response["error"]
+
+
+def test_customer_data_registry_reads_firestore_first_and_adds_features():
+    remote = []
+    registry = tools.customer_data_registry(FakeFirestore({"ACME": make_customer("ACME")}),
+                                            remote_handler=lambda args, timeout: remote.append(args) or {}, cache_ttl=0)
+    found = registry.call("getCustomerData", {"customer_name": "ACME"})
+    assert found.path == "firestore" and found.response["precomputed_features"]["deal_count"] == 12
+    missing = registry.call("getCustomerData", {"customer_name": "Ghost"})
+    assert missing.response["error"] == "Customer 'Ghost' not found in Firestore."
+    assert "precomputed_features" not in missing.response
+    assert remote == []
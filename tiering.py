@@ -0,0 +1,187 @@
+"""
+Pipeline-level model tiering and early exit.
+
+Without tiering (the default, FLAT_POLICY) every customer gets the same
+gemini-2.5-flash calls, whatever the account's size or how much data it has.
+A TieringPolicy looks at the
+getCustomerData result (the customer document with its precomputed_features
+and portfolio_summary) as soon as the tool returns, and decides:
+
+  * the tier: ordered rules on document fields, first match wins, e.g. deal
+    volume (sum of price_achieved) or history length (deal_count)
+  * the model per stage: "report" (Agent 1's answer), "chart" (Agent 2 chart
+    code, only when there is no speculative chart) and "styling"
+  * whether to draw a chart at all (not below min_chart_points deals)
+  * a templated report for "not found" tool results, with no further model calls
+
+Agent 1's first call (choosing the tool) happens before the document is known
+and uses policy.plan_model.
+
+    policy = tiering.load_policy("tiering.json")     # or TIERING_POLICY=tiering.json; "default" = DEFAULT_POLICY
+    decision = policy.decide(tool_payload, customer_name)
+    decision.models["report"], decision.chart, decision.template
+
+Policy file (JSON, same shape as TieringPolicy.to_dict()):
+
+    {"plan_model": "gemini-2.5-flash", "min_chart_points": 3, "template_not_found": true,
+     "tiers": [{"name": "key", "when": {"deal_volume": 1000000},
+                "models": {"report": "gemini-2.5-pro", "chart": "gemini-2.5-flash", "styling": "gemini-2.5-flash"}},
+               {"name": "small", "when": {}, "models": {...}}]}
+"""
+import hashlib
+import html
+import json
+import os
+import re
+from collections import namedtuple
+
+import tracing
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+LITE_MODEL = "gemini-2.5-flash-lite"
+STAGES = ("report", "chart", "styling")
+MIN_CHART_POINTS = 3
+TIERING_POLICY = os.environ.get("TIERING_POLICY")  # path to a policy JSON, "default", or unset / "flat"
+
+# app.py's / tools.py's missing-document message, or the HTTP path's error for a 404 response
+NOT_FOUND_RE = re.compile(r"^Customer '.*' not found in Firestore\.$|^Tool execution failed with HTTP status 404\b", re.DOTALL)
+
+# when: {metric: minimum}, every minimum must be met; an empty `when` matches everyone
+Tier = namedtuple("Tier", ["name", "when", "models"])
+TierDecision = namedtuple("TierDecision", ["tier", "models", "chart", "template", "template_html", "metrics"])
+
+NOT_FOUND_TEMPLATE = """**Negotiation Strategy Report: {customer_name}**
+
+* **Status:** No customer record was found for "{customer_name}", so no strategy was generated.
+* **Data service response:** {error}
+* **Next steps:** Check the spelling of the customer name, or add the customer's purchase history, target price and cost price to the `customers` collection and generate the report again.
+"""
+
+NOT_FOUND_HTML = """<div class="report-content">
+<p><strong>Negotiation Strategy Report: {customer_name}</strong></p>
+<ul>
+<li><strong>Status:</strong> No customer record was found for <mark>{customer_name}</mark>, so no strategy was generated.</li>
+<li><strong>Data service response:</strong> {error}</li>
+<li><strong>Next steps:</strong> Check the spelling of the customer name, or add the customer's purchase history, target price and cost price to the <code>customers</code> collection and generate the report again.</li>
+</ul>
+</div>"""
+
+
+# --- customer metrics ---
+def _numbers(values: dict) -> dict:
+    return {key: value for key, value in (values or {}).items()
+            if isinstance(value, (int, float)) and not isinstance(value, bool)}
+
+
+def customer_metrics(payload: dict) -> dict:
+    """
+    Numbers the tier rules can test: top-level numeric document fields, portfolio_summary,
+    precomputed_features (deal_count = history length, mean_price, ...) and
+    deal_volume = deal_count x mean_price (the sum of price_achieved).
+    """
+    if not isinstance(payload, dict) or "error" in payload:
+        return {}
+    metrics = {**_numbers(payload), **_numbers(payload.get("portfolio_summary")),
+               **_numbers(payload.get("precomputed_features"))}
+    metrics.setdefault("deal_count", len(payload.get("purchase_history") or []))
+    if metrics.get("mean_price") is not None:
+        metrics["deal_volume"] = round(metrics["deal_count"] * metrics["mean_price"], 2)
+    return metrics
+
+
+def is_not_found(payload: dict) -> bool:
+    """getCustomerData error for a missing document (Firestore path or HTTP 404)."""
+    return isinstance(payload, dict) and "error" in payload and bool(NOT_FOUND_RE.search(str(payload["error"])))
+
+
+def tag_span(decision: TierDecision):
+    """Tier on the current span (agent1.run), so traces can be grouped by tier."""
+    current = tracing.current_span()
+    if current is not None:
+        current.set_attribute("tier", decision.tier)
+        current.set_attribute("tier.chart", decision.chart)
+
+
+# --- policy ---
+class TieringPolicy:
+    def __init__(self, tiers: list, plan_model: str = DEFAULT_MODEL, min_chart_points: int = MIN_CHART_POINTS,
+                 template_not_found: bool = True):
+        if not tiers:
+            raise ValueError("A tiering policy needs at least one tier")
+        for tier in tiers:
+            missing = [stage for stage in STAGES if not tier.models.get(stage)]
+            if missing:
+                raise ValueError(f"Tier '{tier.name}' has no model for {', '.join(missing)}")
+        self.tiers = list(tiers)
+        self.plan_model = plan_model
+        self.min_chart_points = min_chart_points
+        self.template_not_found = template_not_found
+
+    def tier_for(self, metrics: dict) -> Tier:
+        """First tier whose minimums are all met; the last tier when none matches."""
+        for tier in self.tiers:
+            if all(metrics.get(key) is not None and metrics[key] >= minimum for key, minimum in tier.when.items()):
+                return tier
+        return self.tiers[-1]
+
+    def decide(self, payload: dict, customer_name: str = None) -> TierDecision:
+        if self.template_not_found and is_not_found(payload):
+            name = customer_name or "Unknown customer"
+            error = str(payload["error"])
+            return TierDecision("not_found", {}, False, NOT_FOUND_TEMPLATE.format(customer_name=name, error=error),
+                                NOT_FOUND_HTML.format(customer_name=html.escape(name), error=html.escape(error)), {})
+        metrics = customer_metrics(payload)
+        tier = self.tier_for(metrics)
+        chart = metrics.get("deal_count", 0) >= self.min_chart_points
+        return TierDecision(tier.name, dict(tier.models), chart, None, None, metrics)
+
+    def to_dict(self) -> dict:
+        return {"plan_model": self.plan_model, "min_chart_points": self.min_chart_points,
+                "template_not_found": self.template_not_found,
+                "tiers": [tier._asdict() for tier in self.tiers]}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TieringPolicy":
+        tiers = [Tier(tier["name"], tier.get("when") or {}, tier["models"]) for tier in data["tiers"]]
+        return cls(tiers, data.get("plan_model", DEFAULT_MODEL), data.get("min_chart_points", MIN_CHART_POINTS),
+                   data.get("template_not_found", True))
+
+    def fingerprint(self) -> str:
+        """
+        For the batch manifest's "model" entry: the model name when every call uses one model
+        and nothing is skipped (manifests from before tiering stay valid), else a hash of the policy.
+        """
+        models = {self.plan_model} | {model for tier in self.tiers for model in tier.models.values()}
+        if len(models) == 1 and not self.min_chart_points and not self.template_not_found:
+            return models.pop()
+        canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"))
+        return f"tiered-{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:12]}"
+
+
+# opt-in (TIERING_POLICY=default): key accounts and the plan call keep today's model,
+# small accounts with little data go to flash-lite throughout
+DEFAULT_POLICY = TieringPolicy(
+    tiers=[
+        Tier("key", {"deal_volume": 1_000_000}, {"report": DEFAULT_MODEL, "chart": DEFAULT_MODEL, "styling": DEFAULT_MODEL}),
+        Tier("standard", {"deal_count": 6}, {"report": DEFAULT_MODEL, "chart": LITE_MODEL, "styling": LITE_MODEL}),
+        Tier("small", {}, {"report": LITE_MODEL, "chart": LITE_MODEL, "styling": LITE_MODEL}),
+    ],
+    plan_model=DEFAULT_MODEL,
+)
+
+# the pipeline as it was before tiering: one model everywhere, always a chart
+FLAT_POLICY = TieringPolicy([Tier("all", {}, dict.fromkeys(STAGES, DEFAULT_MODEL))], DEFAULT_MODEL,
+                            min_chart_points=0, template_not_found=False)
+
+
+def load_policy(spec: str = None) -> TieringPolicy:
+    """None / "flat" -> FLAT_POLICY, "default" -> DEFAULT_POLICY, anything else is a policy JSON file."""
+    if not spec or spec == "flat":
+        return FLAT_POLICY
+    if spec == "default":
+        return DEFAULT_POLICY
+    with open(spec, encoding="utf-8") as f:
+        return TieringPolicy.from_dict(json.load(f))
+
+
+ACTIVE_POLICY = load_policy(TIERING_POLICY)
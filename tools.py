@@ -0,0 +1,250 @@
+"""
+Tool registry: function declarations mapped to handlers.
+
+Every tool has a timeout, an optional TTL result cache and an ordered list of
+execution paths. A call uses the cache when it can, otherwise the first
+registered path; a path that raises (unreachable, timed out) falls through to
+the next one:
+
+  cache     - earlier results for the same args (error results are never cached)
+  firestore - in-process read through a Firestore client the caller already
+              holds (Streamlit, batch runs): no HTTP hop to Cloud Run
+  http      - the public data service on Cloud Run
+
+    registry = tools.customer_data_registry(db_client=db, service_url=URL)
+    config = {'tools': [registry.tool()]}
+    result = registry.call(call.name, dict(call.args))   # ToolResult(response, path, cached, seconds)
+"""
+import asyncio
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import requests
+from google.genai.types import FunctionDeclaration, Tool
+
+import analytics
+import feature_store
+import tracing
+
+DEFAULT_TIMEOUT = 10
+CACHE_SIZE = 1024
+
+ToolResult = namedtuple("ToolResult", ["response", "path", "cached", "seconds"])
+ToolPath = namedtuple("ToolPath", ["name", "handler", "async_handler"])
+
+
+class RegisteredTool:
+    def __init__(self, declaration: FunctionDeclaration, timeout: float = DEFAULT_TIMEOUT, cache_ttl: float = 0,
+                 postprocess=None):
+        self.declaration = declaration
+        self.name = declaration.name
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.postprocess = postprocess
+        self.paths = []
+        self._cache = OrderedDict()  # key -> (expires_at, response), LRU order
+        self._lock = threading.Lock()
+
+    def add_path(self, name: str, handler=None, async_handler=None):
+        """handler(args, timeout) -> dict; async_handler is the coroutine variant used by call_async."""
+        self.paths.append(ToolPath(name, handler, async_handler))
+        return self
+
+    # --- cache ---
+    @staticmethod
+    def cache_key(args: dict) -> str:
+        return json.dumps(args, sort_keys=True, default=str)
+
+    def cached(self, key: str):
+        if not self.cache_ttl:
+            return None
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return copy.deepcopy(entry[1])
+
+    def store(self, key: str, response: dict):
+        if not self.cache_ttl or not isinstance(response, dict) or "error" in response:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, copy.deepcopy(response))
+            self._cache.move_to_end(key)
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def invalidate(self, args: dict = None):
+        with self._lock:
+            if args is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(self.cache_key(args), None)
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools = {}
+
+    def register(self, declaration: FunctionDeclaration, timeout: float = DEFAULT_TIMEOUT, cache_ttl: float = 0,
+                 postprocess=None) -> RegisteredTool:
+        """postprocess(response, args) -> response runs once per fresh result, before caching."""
+        registered = RegisteredTool(declaration, timeout, cache_ttl, postprocess)
+        self._tools[registered.name] = registered
+        return registered
+
+    def get(self, name: str) -> RegisteredTool:
+        return self._tools.get(name)
+
+    def tool(self) -> Tool:
+        """google.genai Tool with every registered declaration, for `config={'tools': [...]}`."""
+        return Tool(function_declarations=[registered.declaration for registered in self._tools.values()])
+
+    def _finish(self, registered: RegisteredTool, key: str, args: dict, response: dict, path: str,
+                started: float) -> ToolResult:
+        # a cache hit is already postprocessed; storing it again would push its expiry forward
+        if path != "cache":
+            if registered.postprocess and isinstance(response, dict) and "error" not in response:
+                response = registered.postprocess(response, args)
+            registered.store(key, response)
+        current = tracing.current_span()
+        if current is not None:
+            current.set_attribute("tool.path", path)
+        return ToolResult(response, path, path == "cache", time.perf_counter() - started)
+
+    def _failed(self, name: str, errors: list, started: float) -> ToolResult:
+        message = "; ".join(errors) or "no execution path registered"
+        return ToolResult({"error": f"Tool execution failed with unknown error: {message}"}, None, False,
+                          time.perf_counter() - started)
+
+    def call(self, name: str, args: dict) -> ToolResult:
+        started = time.perf_counter()
+        registered = self._tools.get(name)
+        if registered is None:
+            return ToolResult({"error": f"Unknown tool '{name}'"}, None, False, 0.0)
+        key = registered.cache_key(args)
+        hit = registered.cached(key)
+        if hit is not None:
+            return self._finish(registered, key, args, hit, "cache", started)
+
+        errors = []
+        for path in registered.paths:
+            if path.handler is None:
+                continue
+            try:
+                response = path.handler(args, registered.timeout)
+            except Exception as e:
+                print(f"Tool {name}: {path.name} path failed: {e}")
+                errors.append(f"{path.name}: {e}")
+                continue
+            return self._finish(registered, key, args, response, path.name, started)
+        return self._failed(name, errors, started)
+
+    async def call_async(self, name: str, args: dict) -> ToolResult:
+        """call() for asyncio: async handlers are awaited, blocking ones run in a worker thread."""
+        started = time.perf_counter()
+        registered = self._tools.get(name)
+        if registered is None:
+            return ToolResult({"error": f"Unknown tool '{name}'"}, None, False, 0.0)
+        key = registered.cache_key(args)
+        hit = registered.cached(key)
+        if hit is not None:
+            return self._finish(registered, key, args, hit, "cache", started)
+
+        errors = []
+        for path in registered.paths:
+            if path.async_handler is not None:
+                pending = path.async_handler(args, registered.timeout)
+            elif path.handler is not None:
+                pending = asyncio.to_thread(path.handler, args, registered.timeout)
+            else:
+                continue
+            try:
+                response = await asyncio.wait_for(pending, registered.timeout)
+            except Exception as e:
+                print(f"Tool {name}: {path.name} path failed: {e!r}")
+                errors.append(f"{path.name}: {e!r}")
+                continue
+            return self._finish(registered, key, args, response, path.name, started)
+        return self._failed(name, errors, started)
+
+
+# --- getCustomerData ---
+CUSTOMER_DATA_TIMEOUT = 10
+CUSTOMER_DATA_CACHE_TTL = 60
+
+CUSTOMER_DATA_DECLARATION = FunctionDeclaration(
+    name="getCustomerData",
+    description="Retrieves comprehensive customer negotiation data, including purchase history, negotiation style, and pricing targets, needed to prepare a sales strategy.",
+    parameters={
+        "type": "OBJECT",
+        "properties": {
+            "customer_name": {
+                "type": "STRING",
+                "description": "The full name of the customer for whom the negotiation data is needed (e.g., 'Customer A')."
+            }
+        },
+        "required": ["customer_name"]
+    },
+)
+
+
+def firestore_customer_data(db_client, collection: str = "customers"):
+    """Local path: read the document directly, same JSON shape as the data service."""
+    def handler(args: dict, timeout: float) -> dict:
+        customer_name = args.get("customer_name")
+        if not customer_name:
+            return {"error": "Missing required parameter: customer_name"}
+        print(f"\n[Tool Execution: Reading Firestore '{collection}/{customer_name}' directly]")
+        snapshot = db_client.collection(collection).document(customer_name).get(timeout=timeout)
+        if not snapshot.exists:
+            return {"error": f"Customer '{customer_name}' not found in Firestore.", "data": {}}
+        # timestamps -> strings, as they would arrive over HTTP
+        return json.loads(json.dumps(snapshot.to_dict(), default=str))
+    return handler
+
+
+def http_customer_data(service_url: str):
+    """Remote path: the Cloud Run data service."""
+    def handler(args: dict, timeout: float) -> dict:
+        customer_name = args.get("customer_name")
+        print(f"\n[Tool Execution: Calling Cloud Function at: {service_url}?customer_name={customer_name}]")
+        try:
+            # traceparent lets the Cloud Run spans join this trace
+            response = requests.get(service_url, params={"customer_name": customer_name}, timeout=timeout,
+                                    headers=tracing.inject())
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.HTTPError as err:
+            print(f"HTTP Error: {err.response.status_code}")
+            return {"error": f"Tool execution failed with HTTP status {err.response.status_code}. Response: {err.response.text}"}
+    return handler
+
+
+def enrich_customer_data(payload: dict, args: dict) -> dict:
+    """precomputed_features + portfolio_summary, computed once per fetched document."""
+    payload = analytics.attach_features(payload)
+    return feature_store.attach_summary(payload, args.get("customer_name"))
+
+
+def customer_data_registry(db_client=None, service_url: str = None, remote_handler=None, async_remote_handler=None,
+                           timeout: float = CUSTOMER_DATA_TIMEOUT, cache_ttl: float = CUSTOMER_DATA_CACHE_TTL) -> ToolRegistry:
+    """
+    getCustomerData: Firestore directly when db_client is given, then the data service
+    (service_url, or custom remote_handler / async_remote_handler).
+    """
+    registry = ToolRegistry()
+    registered = registry.register(CUSTOMER_DATA_DECLARATION, timeout, cache_ttl, postprocess=enrich_customer_data)
+    if db_client is not None:
+        registered.add_path("firestore", firestore_customer_data(db_client))
+    if remote_handler is None and service_url:
+        remote_handler = http_customer_data(service_url)
+    if remote_handler is not None or async_remote_handler is not None:
+        registered.add_path("http", remote_handler, async_remote_handler)
+    return registry
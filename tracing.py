@@ -0,0 +1,179 @@
+"""
+Per-stage tracing for the agent pipeline and the data service.
+
+Spans use OpenTelemetry-compatible IDs (128-bit trace id, 64-bit span id) and
+attribute names, and the trace context crosses the HTTP hop to Cloud Run in a
+W3C `traceparent` header. Finished spans go to a pluggable exporter; the default
+one drops them, so tracing costs nothing unless enabled:
+
+    TRACE_EXPORTER=console python agent_app.py     # one JSON line per span
+    tracing.set_exporter(tracing.InMemoryExporter()) # tests / benchmarks
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import namedtuple
+
+SpanContext = namedtuple("SpanContext", ["trace_id", "span_id"])
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class Span:
+    def __init__(self, name: str, parent: SpanContext = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns = None
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_time_ns or time.time_ns()
+        return (end - self.start_time_ns) / 1e6
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def record_exception(self, error: Exception):
+        self.status = "ERROR"
+        self.attributes["exception.type"] = type(error).__name__
+        self.attributes["exception.message"] = str(error)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time_ns": self.start_time_ns,
+            "end_time_ns": self.end_time_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# --- exporters ---
+class NoopExporter:
+    def export(self, span: Span):
+        pass
+
+
+class ConsoleExporter:
+    def export(self, span: Span):
+        print(json.dumps(span.to_dict(), default=str), flush=True)
+
+
+class InMemoryExporter:
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+
+
+_EXPORTERS = {"none": NoopExporter, "console": ConsoleExporter}
+_exporter = _EXPORTERS.get(os.environ.get("TRACE_EXPORTER", "none"), NoopExporter)()
+
+
+def set_exporter(exporter):
+    global _exporter
+    _exporter = exporter
+
+
+def get_exporter():
+    return _exporter
+
+
+# --- spans ---
+def current_span() -> Span:
+    return _current_span.get()
+
+
+@contextlib.contextmanager
+def span(name: str, parent: SpanContext = None, **attributes):
+    """
+    Time a block. Nested spans pick up the enclosing span as parent; pass
+    `parent=extract(headers)` to continue a trace from another process.
+    """
+    if parent is None and _current_span.get() is not None:
+        parent = _current_span.get().context
+    current = Span(name, parent, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_time_ns = time.time_ns()
+        try:
+            _exporter.export(current)
+        except Exception as e:
+            print(f"Trace export failed: {e}")
+
+
+def traced(name: str, **attributes):
+    """Decorator form of `span` for whole functions (coroutine functions included)."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_usage(target: Span, response, model: str = None):
+    """Attach Gemini token counts (OpenTelemetry GenAI attribute names) to a span."""
+    if model:
+        target.set_attribute("gen_ai.request.model", model)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    target.set_attribute("gen_ai.usage.input_tokens", getattr(usage, "prompt_token_count", None))
+    target.set_attribute("gen_ai.usage.output_tokens", getattr(usage, "candidates_token_count", None))
+
+
+# --- propagation (W3C trace context) ---
+def inject(headers: dict = None) -> dict:
+    headers = dict(headers or {})
+    current = _current_span.get()
+    if current is not None:
+        headers["traceparent"] = f"00-{current.trace_id}-{current.span_id}-01"
+    return headers
+
+
+def extract(headers) -> SpanContext:
+    match = _TRACEPARENT_RE.match((headers.get("traceparent") or "").strip().lower())
+    return SpanContext(match.group(1), match.group(2)) if match else None
@@ -0,0 +1,210 @@
+"""
+Token and cost accounting for Gemini calls.
+
+Every `generate_content` call records its `usage_metadata` (prompt, output,
+thinking and cached tokens), its latency and the size of each prompt section
+(system instruction, tool payload, report text, ...) into the ledger of the
+report currently being generated:
+
+    with usage.collect("ACME TECH") as ledger:
+        run_agent_chat(...); run_visualization_agent(...)
+    print(usage.format_report(ledger.to_dict()))
+
+    usage.record(model_span, response, MODEL_NAME,
+                 {"system_instruction": SYSTEM_INSTRUCTION, "tool_payload": payload})
+
+The API only reports one prompt token count per call, so per-section tokens are
+estimated by splitting it in proportion to each section's character count.
+Costs use list prices (PRICES_PER_MILLION, USD) and are estimates.
+"""
+import contextlib
+import contextvars
+import json
+import threading
+
+import tracing
+
+# (input, output) USD per 1M tokens; thinking tokens are billed as output
+PRICES_PER_MILLION = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+
+_current_ledger = contextvars.ContextVar("usage_ledger", default=None)
+
+
+# --- prompt sections ---
+def section_size(value) -> int:
+    """Characters a prompt section adds: text, ints (already a size), dicts/lists or SDK objects as JSON."""
+    if value is None:
+        return 0
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return len(value)
+    if hasattr(value, "model_dump_json"):
+        return len(value.model_dump_json(exclude_none=True))
+    return len(json.dumps(value, default=str))
+
+
+def prompt_sections(prompt: str, **parts) -> dict:
+    """Sections of a single templated prompt: the named parts plus 'instructions' (everything else)."""
+    sizes = {name: section_size(value) for name, value in parts.items()}
+    return {"instructions": max(len(prompt) - sum(sizes.values()), 0), **sizes}
+
+
+def cost_usd(model: str, input_tokens: int, output_tokens: int) -> float:
+    prices = PRICES_PER_MILLION.get(model)
+    if prices is None:
+        return None
+    return round((input_tokens * prices[0] + output_tokens * prices[1]) / 1e6, 6)
+
+
+# --- ledger ---
+class ReportUsage:
+    """Model calls of one report (or one comparison). Thread- and task-safe."""
+
+    def __init__(self, label: str = None):
+        self.label = label
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add(self, call: dict):
+        with self._lock:
+            self.calls.append(call)
+
+    def totals(self) -> dict:
+        with self._lock:
+            calls = list(self.calls)
+        return _totals(calls)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            calls = list(self.calls)
+        return {"label": self.label, **_totals(calls), "calls": calls}
+
+
+def _totals(calls: list) -> dict:
+    totals = {"model_calls": len(calls), "input_tokens": 0, "output_tokens": 0, "thoughts_tokens": 0,
+              "cached_tokens": 0, "cost_usd": 0.0, "model_seconds": 0.0, "by_stage": {}, "by_section": {}}
+    for call in calls:
+        for key in ("input_tokens", "output_tokens", "thoughts_tokens", "cached_tokens"):
+            totals[key] += call[key]
+        totals["cost_usd"] += call["cost_usd"] or 0.0
+        totals["model_seconds"] += call["seconds"]
+        stage = totals["by_stage"].setdefault(call["stage"], {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+        stage["calls"] += 1
+        stage["input_tokens"] += call["input_tokens"]
+        stage["output_tokens"] += call["output_tokens"] + call["thoughts_tokens"]
+        stage["seconds"] = round(stage["seconds"] + call["seconds"], 3)
+        for name, section in call["sections"].items():
+            entry = totals["by_section"].setdefault(name, {"chars": 0, "tokens": 0})
+            entry["chars"] += section["chars"]
+            entry["tokens"] += section["tokens"]
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    totals["model_seconds"] = round(totals["model_seconds"], 3)
+    return totals
+
+
+@contextlib.contextmanager
+def collect(label: str = None):
+    """Route usage.record calls in this block (threads/tasks started inside included) to a new ReportUsage."""
+    ledger = ReportUsage(label)
+    token = _current_ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _current_ledger.reset(token)
+
+
+def current_ledger() -> ReportUsage:
+    return _current_ledger.get()
+
+
+def record(model_span: tracing.Span, response, model: str, sections: dict = None) -> dict:
+    """
+    Record one generate_content response. Also sets the span's gen_ai.* attributes
+    (tracing.record_usage); the stage and latency come from the span.
+    """
+    tracing.record_usage(model_span, response, model)
+    metadata = getattr(response, "usage_metadata", None)
+    input_tokens = getattr(metadata, "prompt_token_count", None) or 0
+    output_tokens = getattr(metadata, "candidates_token_count", None) or 0
+    thoughts_tokens = getattr(metadata, "thoughts_token_count", None) or 0
+
+    sizes = {name: section_size(value) for name, value in (sections or {}).items()}
+    total_chars = sum(sizes.values())
+    call = {
+        "stage": model_span.attributes.get("stage", model_span.name),
+        "model": model,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "thoughts_tokens": thoughts_tokens,
+        "cached_tokens": getattr(metadata, "cached_content_token_count", None) or 0,
+        "cost_usd": cost_usd(model, input_tokens, output_tokens + thoughts_tokens),
+        "seconds": round(model_span.duration_ms / 1000, 3),
+        "sections": {
+            name: {"chars": chars, "tokens": round(input_tokens * chars / total_chars) if total_chars else 0}
+            for name, chars in sizes.items()
+        },
+    }
+    if call["cost_usd"] is not None:
+        model_span.set_attribute("gen_ai.usage.cost_usd", call["cost_usd"])
+    ledger = _current_ledger.get()
+    if ledger is not None:
+        ledger.add(call)
+    return call
+
+
+# --- batch aggregation / output ---
+def summarize_batch(reports: list) -> dict:
+    """Batch totals over ReportUsage.to_dict() results, plus the reports sorted by prompt size."""
+    totals = _totals([call for report in reports for call in report["calls"]])
+    per_report = sorted(({key: value for key, value in report.items() if key != "calls"} for report in reports),
+                        key=lambda report: report["input_tokens"], reverse=True)
+    count = len(reports)
+    totals["reports"] = count
+    totals["mean_cost_usd"] = round(totals["cost_usd"] / count, 6) if count else 0.0
+    totals["mean_input_tokens"] = round(totals["input_tokens"] / count) if count else 0
+    return {**totals, "per_report": per_report}
+
+
+def _largest_section(report: dict) -> str:
+    sections = report.get("by_section") or {}
+    if not sections:
+        return "-"
+    name, entry = max(sections.items(), key=lambda item: item[1]["tokens"])
+    return f"{name} ({entry['tokens']})"
+
+
+def format_report(report: dict) -> str:
+    """Per-call table for one ReportUsage.to_dict()."""
+    lines = [f"💰 Token usage: {report['label'] or 'report'}",
+             f"{'stage':<20}{'in tok':>9}{'out tok':>9}{'think':>7}{'sec':>7}{'cost $':>11}  sections (est. tokens)"]
+    for call in report["calls"]:
+        sections = ", ".join(f"{name}={section['tokens']}" for name, section in call["sections"].items())
+        cost = f"{call['cost_usd']:.6f}" if call["cost_usd"] is not None else "-"
+        lines.append(f"{call['stage']:<20}{call['input_tokens']:>9}{call['output_tokens']:>9}{call['thoughts_tokens']:>7}"
+                     f"{call['seconds']:>7.2f}{cost:>11}  {sections}")
+    lines.append(f"{'total':<20}{report['input_tokens']:>9}{report['output_tokens']:>9}{report['thoughts_tokens']:>7}"
+                 f"{report['model_seconds']:>7.2f}{report['cost_usd']:>11.6f}")
+    return "\n".join(lines)
+
+
+def format_batch(summary: dict, limit: int = 20) -> str:
+    """CLI summary of summarize_batch(): largest prompts first."""
+    lines = [f"\n💰 Token usage: {summary['reports']} reports, {summary['model_calls']} model calls, "
+             f"{summary['input_tokens']} in / {summary['output_tokens'] + summary['thoughts_tokens']} out tokens, "
+             f"${summary['cost_usd']:.4f} (mean ${summary['mean_cost_usd']:.4f}/report)",
+             f"{'report':<32}{'calls':>6}{'in tok':>9}{'out tok':>9}{'model s':>9}{'cost $':>11}  largest section"]
+    for report in summary["per_report"][:limit]:
+        lines.append(f"{(report['label'] or '-')[:31]:<32}{report['model_calls']:>6}{report['input_tokens']:>9}"
+                     f"{report['output_tokens'] + report['thoughts_tokens']:>9}{report['model_seconds']:>9.2f}"
+                     f"{report['cost_usd']:>11.6f}  {_largest_section(report)}")
+    if len(summary["per_report"]) > limit:
+        lines.append(f"... {len(summary['per_report']) - limit} more")
+    sections = ", ".join(f"{name}={entry['tokens']}" for name, entry in
+                         sorted(summary["by_section"].items(), key=lambda item: item[1]["tokens"], reverse=True))
+    lines.append(f"prompt tokens by section (est.): {sections}")
+    return "\n".join(lines)